@@ -14,6 +14,7 @@ from .agent import VisualEventExtractor, AnswerGenerator
 
 from service.search_service import KeyframeQueryService
 from service.model_service import ModelService
+from service.encode_batcher import TextEncodeBatcher
 from schema.response import KeyframeServiceReponse
 
 
@@ -57,11 +58,13 @@ class KeyframeSearchAgent:
         data_folder: str,
         objects_data: dict[str, list[str]],
         asr_data: dict[str, str | list[dict[str,str]]],
-        top_k: int = 10
+        top_k: int = 10,
+        text_encoder: TextEncodeBatcher | None = None
     ):
         self.llm = llm
         self.keyframe_service = keyframe_service
         self.model_service = model_service
+        self.text_encoder = text_encoder or TextEncodeBatcher(model_service)
         self.data_folder = data_folder
         self.top_k = top_k
 
@@ -90,7 +93,7 @@ class KeyframeSearchAgent:
         print(f"{search_query=}")
         print(f"{suggested_objects=}")
 
-        embedding = self.model_service.embedding(search_query).tolist()[0]
+        embedding = (await self.text_encoder.embedding(search_query)).tolist()[0]
         top_k_keyframes = await self.keyframe_service.search_by_text(
             text_embedding=embedding,
             top_k=self.top_k,
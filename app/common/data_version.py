@@ -0,0 +1,63 @@
+import os
+import time
+from typing import Callable, Optional
+
+
+def bump_data_version(path: Optional[str]) -> None:
+    """
+    Stamp a new data version after a migration reloads keyframes / embeddings,
+    so running servers drop results cached against the old data.
+    """
+    if not path:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(time.time_ns()))
+    os.replace(tmp_path, path)
+
+
+def read_data_version(path: Optional[str]) -> Optional[str]:
+    if not path:
+        return None
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+class DataVersionWatcher:
+    """
+    Watch the data version file and run `on_change` when a migration stamps a new version.
+    Checked lazily on cache lookups: one stat() per call, the file is only read when its mtime changes.
+    """
+
+    def __init__(self, path: Optional[str], on_change: Callable[[], None]):
+        self.path = path
+        self.on_change = on_change
+        self._mtime = self._stat()
+        self.version = read_data_version(path)
+
+    def _stat(self) -> Optional[int]:
+        if not self.path:
+            return None
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def check(self) -> bool:
+        """Return True (after calling on_change) if the data version changed since the last check."""
+        if not self.path:
+            return False
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        version = read_data_version(self.path)
+        if version == self.version:
+            return False
+        self.version = version
+        self.on_change()
+        return True
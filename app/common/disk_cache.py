@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+
+class SqliteKV:
+    """
+    Tiny persistent key -> blob store (one SQLite table, WAL mode), shared by the on-disk
+    tiers of the text-embedding and translation caches.
+    """
+
+    def __init__(self, path: str, table: str):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        self._db.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, bytes]:
+        if not keys or self._db is None:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})", keys
+            ).fetchall()
+        return {k: v for k, v in rows}
+
+    def set_many(self, items: list[tuple[str, bytes]]) -> None:
+        if not items or self._db is None:
+            return
+        with self._lock:
+            self._db.executemany(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?)", items)
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
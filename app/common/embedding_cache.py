@@ -0,0 +1,101 @@
+import hashlib
+import re
+from typing import Any, Optional
+import numpy as np
+
+from common.cache import LRUCache
+from common.disk_cache import SqliteKV
+
+
+def normalize_query_text(text: str) -> str:
+    # chỉ gộp khoảng trắng: tokenizer của một số model phân biệt hoa/thường
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class TextEmbeddingCache:
+    """
+    Two-tier cache of text embeddings keyed by (model name, pretrained tag, encoder, normalized text):
+    an in-process LRU in front of an optional SQLite file that survives restarts.
+    `encoder` identifies the runtime producing the vectors (see text_encoder_identity), so switching
+    between the full model and an exported fp32/int8 artifact does not serve the other one's vectors.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        pretrained: str,
+        maxsize: int = 4096,
+        path: Optional[str] = None,
+        encoder: str = 'open_clip',
+    ):
+        self.model_name = model_name
+        self.pretrained = pretrained
+        self.encoder = encoder
+        self.memory: LRUCache[np.ndarray] = LRUCache("text_embeddings", maxsize=maxsize)
+
+        self.path = path
+        self.disk = SqliteKV(path, "text_embedding_vectors") if path else None
+
+        self.disk_hits = 0
+        self.disk_misses = 0
+
+    def key(self, text: str) -> str:
+        raw = f"{self.model_name}\x00{self.pretrained}\x00{normalize_query_text(text)}"
+        if self.encoder != 'open_clip':
+            # model open_clip đầy đủ giữ khoá cũ -> không mất cache đã có trên đĩa
+            raw = f"{raw}\x00{self.encoder}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get_many(self, texts: list[str], memory: bool = True, disk: bool = True) -> list[Optional[np.ndarray]]:
+        """
+        Cached embedding of each text (None on miss); disk hits are promoted to memory.
+        memory=False / disk=False skip a tier: the SQLite read blocks, so async callers look up
+        memory on the event loop and leave the disk tier to the inference pool.
+        """
+        keys = [self.key(t) for t in texts]
+        out: list[Optional[np.ndarray]] = [self.memory.get(k) if memory else None for k in keys]
+        if not disk:
+            return out
+
+        missing = [i for i, v in enumerate(out) if v is None]
+        if missing and self.disk is not None:
+            found = self.disk.get_many([keys[i] for i in missing])
+            for i in missing:
+                blob = found.get(keys[i])
+                if blob is None:
+                    self.disk_misses += 1
+                    continue
+                self.disk_hits += 1
+                vec = np.frombuffer(blob, dtype=np.float32)
+                self.memory.set(keys[i], vec)
+                out[i] = vec
+        return out
+
+    def set_many(self, texts: list[str], embeddings: np.ndarray) -> None:
+        rows = []
+        for text, emb in zip(texts, embeddings):
+            vec = np.array(emb, dtype=np.float32)
+            vec.setflags(write=False)
+            k = self.key(text)
+            self.memory.set(k, vec)
+            rows.append((k, vec.tobytes()))
+        if self.disk is not None:
+            self.disk.set_many(rows)
+
+    def close(self) -> None:
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self) -> dict[str, Any]:
+        stats = self.memory.stats()
+        stats.update({
+            "model": f"{self.model_name}/{self.pretrained}",
+            "encoder": self.encoder,
+            "disk_path": self.path,
+            "disk_hits": self.disk_hits,
+            "disk_misses": self.disk_misses,
+        })
+        # hit rate tổng: memory + disk trên số lần tra
+        lookups = self.memory.hits + self.memory.misses
+        stats["overall_hit_rate"] = round((self.memory.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+        return stats
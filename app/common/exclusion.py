@@ -0,0 +1,137 @@
+import itertools
+from typing import Any, Iterable, Optional
+import numpy as np
+
+from common.cache import LRUCache
+
+# mỗi lần thay đổi một set nhận stamp mới (toàn cục) -> cache truy vấn biết khi nào exclusion đã khác
+_versions = itertools.count(1)
+
+
+# bitset dày chỉ phủ id < DENSE_ID_LIMIT (16 MB bool); id lớn hơn (không có trong collection,
+# hoặc input độc hại như exclude_ids=10^11) nằm trong mảng thưa, tra bằng np.isin
+DENSE_ID_LIMIT = 1 << 24
+
+
+class ExclusionSet:
+    """
+    Bitset over keyframe ids (bit i set = id i excluded).
+    Membership tests for a whole hit list are one vectorized gather, so the cost of
+    filtering does not depend on how many ids are excluded. Ids >= DENSE_ID_LIMIT are kept in
+    a small sorted array instead, so memory never scales with the largest id a client sends.
+    """
+
+    def __init__(self, ids: Optional[Iterable[int]] = None):
+        self.bits = np.zeros(0, dtype=bool)
+        self.sparse = np.zeros(0, dtype=np.int64)
+        self.count = 0
+        self.version = next(_versions)
+        if ids is not None:
+            self.add(ids)
+
+    def _recount(self) -> None:
+        self.count = int(self.bits.sum()) + len(self.sparse)
+        self.version = next(_versions)
+
+    def add(self, ids: Iterable[int]) -> int:
+        arr = np.fromiter((int(i) for i in ids), dtype=np.int64)
+        arr = arr[arr >= 0]
+        if arr.size == 0:
+            return self.count
+        big = arr >= DENSE_ID_LIMIT
+        if big.any():
+            self.sparse = np.union1d(self.sparse, arr[big])
+            arr = arr[~big]
+        if arr.size:
+            top = int(arr.max()) + 1
+            if top > self.bits.size:
+                grown = np.zeros(min(DENSE_ID_LIMIT, max(top, self.bits.size * 2)), dtype=bool)
+                grown[:self.bits.size] = self.bits
+                self.bits = grown
+            self.bits[arr] = True
+        self._recount()
+        return self.count
+
+    def remove(self, ids: Iterable[int]) -> int:
+        arr = np.fromiter((int(i) for i in ids), dtype=np.int64)
+        self.bits[arr[(arr >= 0) & (arr < self.bits.size)]] = False
+        if len(self.sparse):
+            self.sparse = np.setdiff1d(self.sparse, arr)
+        self._recount()
+        return self.count
+
+    def union(self, ids: Optional[Iterable[int]]) -> 'ExclusionSet':
+        """Copy of this set with `ids` added (the session set itself is not modified)."""
+        out = ExclusionSet()
+        out.bits = self.bits.copy()
+        out.sparse = self.sparse.copy()
+        out.count = self.count
+        if ids:
+            out.add(ids)
+        return out
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, key: int) -> bool:
+        if 0 <= key < self.bits.size:
+            return bool(self.bits[key])
+        return key >= DENSE_ID_LIMIT and bool(np.isin(key, self.sparse))
+
+    def keep_mask(self, ids: np.ndarray) -> np.ndarray:
+        """Boolean mask over `ids`: True for ids that are NOT excluded."""
+        ids = np.asarray(ids, dtype=np.int64)
+        inside = (ids >= 0) & (ids < self.bits.size)
+        keep = np.ones(ids.shape, dtype=bool)
+        keep[inside] = ~self.bits[ids[inside]]
+        if len(self.sparse):
+            keep &= ~np.isin(ids, self.sparse)
+        return keep
+
+    def to_list(self) -> list[int]:
+        return np.flatnonzero(self.bits).tolist() + self.sparse.tolist()
+
+
+class ExclusionStore:
+    """
+    Server-side exclusion sets per analyst session, so clients do not resend
+    thousands of "already seen" ids with every query.
+    """
+
+    def __init__(self, max_sessions: int = 1024, ttl: Optional[float] = 86400):
+        self.sessions: LRUCache[ExclusionSet] = LRUCache("exclusion_sessions", maxsize=max_sessions, ttl=ttl)
+
+    def get(self, session_id: Optional[str]) -> Optional[ExclusionSet]:
+        if not session_id:
+            return None
+        # peek: tra session không tính vào hit/miss của cache
+        return self.sessions.peek(session_id)
+
+    def add(self, session_id: str, ids: Iterable[int]) -> int:
+        excl = self.sessions.peek(session_id) or ExclusionSet()
+        count = excl.add(ids)
+        self.sessions.set(session_id, excl)
+        return count
+
+    def remove(self, session_id: str, ids: Iterable[int]) -> int:
+        excl = self.sessions.peek(session_id)
+        if excl is None:
+            return 0
+        count = excl.remove(ids)
+        self.sessions.set(session_id, excl)
+        return count
+
+    def clear(self, session_id: str) -> None:
+        self.sessions.set(session_id, ExclusionSet())
+
+    def stats(self) -> dict[str, Any]:
+        return self.sessions.stats()
+
+
+def merge_exclusions(exclusion: Optional[ExclusionSet], exclude_ids: Optional[list[int]]) -> Optional[ExclusionSet]:
+    """Combine a session exclusion set with per-request ids; None if nothing is excluded."""
+    if exclusion is not None and len(exclusion):
+        return exclusion.union(exclude_ids) if exclude_ids else exclusion
+    if exclude_ids:
+        return ExclusionSet(exclude_ids)
+    return None
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+T = TypeVar('T')
+
+
+class BoundedExecutor:
+    """
+    Run blocking calls on a dedicated thread pool without blocking the event loop.
+
+    At most `max_in_flight` calls are admitted at the same time; the others wait
+    on a semaphore. Queue time (waiting for a slot) and run time are recorded so
+    saturation can be seen from the health endpoint.
+    """
+
+    def __init__(self, name: str, max_workers: int = 4, max_in_flight: int | None = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight or max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.queue_ms_total = 0.0
+        self.queue_ms_max = 0.0
+        self.run_ms_total = 0.0
+        self.run_ms_max = 0.0
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        enqueued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started = time.perf_counter()
+        queue_ms = (started - enqueued) * 1000
+        self.queue_ms_total += queue_ms
+        self.queue_ms_max = max(self.queue_ms_max, queue_ms)
+        self.in_flight += 1
+        try:
+            future = self._pool.submit(partial(fn, *args, **kwargs))
+        except BaseException:
+            self._finish(started, failed=True)
+            raise
+        # slot chỉ được trả khi worker thực sự xong, không phải khi coroutine bị huỷ (vd. wait_for hết hạn):
+        # call còn chạy dở vẫn giữ slot -> pool không nhận thêm việc vào hàng đợi vô hạn
+        future.add_done_callback(partial(self._on_done, loop, started))
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def _on_done(self, loop: asyncio.AbstractEventLoop, started: float, future: Future) -> None:
+        # chạy trên thread worker -> chuyển về event loop (asyncio.Semaphore không thread-safe)
+        failed = future.cancelled() or future.exception() is not None
+        try:
+            loop.call_soon_threadsafe(self._finish, started, failed)
+        except RuntimeError:
+            # loop đã đóng (shutdown)
+            pass
+
+    def _finish(self, started: float, failed: bool) -> None:
+        run_ms = (time.perf_counter() - started) * 1000
+        self.run_ms_total += run_ms
+        self.run_ms_max = max(self.run_ms_max, run_ms)
+        self.completed += 1
+        if failed:
+            self.failed += 1
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict[str, Any]:
+        done = max(1, self.completed)
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "queue_ms_avg": round(self.queue_ms_total / done, 3),
+            "queue_ms_max": round(self.queue_ms_max, 3),
+            "run_ms_avg": round(self.run_ms_total / done, 3),
+            "run_ms_max": round(self.run_ms_max, 3),
+        }
+
+    def shutdown(self, wait: bool = False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -1 +1 @@
-from .base import MilvusBaseRepository, MongoBaseRepository
\ No newline at end of file
+from .base import VectorBaseRepository, MilvusBaseRepository, MongoBaseRepository
\ No newline at end of file
@@ -1,5 +1,5 @@
 from typing import TypeVar, Any, Generic, Type
-from abc import ABC
+from abc import ABC, abstractmethod
 from beanie import Document 
 from pymilvus import Collection as MilvusCollection
 
@@ -30,7 +30,34 @@ class MongoBaseRepository(Generic[BeanieDocument]):
         return await self.collection.find_all().to_list(length=None)
 
 
-class MilvusBaseRepository(ABC):
+class VectorBaseRepository(ABC):
+    """
+    Interface chung cho các vector backend (Milvus, usearch, ...).
+    Kết quả trả về là MilvusSearchResponse, distance càng lớn càng giống.
+    """
+    # True nếu backend lọc được group_nums/video_nums ngay trong ANN
+    supports_video_filter: bool = False
+
+    @abstractmethod
+    async def search_by_embedding(self, request) -> Any: ...
+
+    @abstractmethod
+    async def search_by_embeddings(self, request) -> list[Any]: ...
+
+    @abstractmethod
+    async def search_by_img_id(self, search_request, exclude_ids: list[int] | None = None) -> Any: ...
+
+    @abstractmethod
+    async def search_similar(self, imgid: int, top_k: int, exclude_ids: list[int] | None = None, exclusion: Any = None) -> Any: ...
+
+    @abstractmethod
+    def get_total(self) -> int: ...
+
+    @abstractmethod
+    def get_search_stats(self) -> dict[str, Any]: ...
+
+
+class MilvusBaseRepository(VectorBaseRepository):
     
     def __init__(
         self,
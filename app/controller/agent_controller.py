@@ -14,6 +14,7 @@ import json
 from agent.main_agent import KeyframeSearchAgent
 from service.search_service import KeyframeQueryService
 from service.model_service import ModelService
+from service.encode_batcher import TextEncodeBatcher
 from llama_index.core.llms import LLM
 
 
@@ -25,6 +26,7 @@ class AgentController:
         keyframe_service: KeyframeQueryService,
         model_service: ModelService,
         data_folder: str,
+        text_encoder: Optional[TextEncodeBatcher] = None,
         objects_data_path: Optional[Path] = None,
         asr_data_path: Optional[Path] = None,
         top_k: int = 200
@@ -37,6 +39,7 @@ class AgentController:
             llm=llm,
             keyframe_service=keyframe_service,
             model_service=model_service,
+            text_encoder=text_encoder,
             data_folder=data_folder,
             objects_data=objects_data,
             asr_data=asr_data,
@@ -1,4 +1,5 @@
 from pathlib import Path
+import asyncio
 import math
 import os
 import sys
@@ -10,11 +11,15 @@ ROOT_DIR = os.path.abspath(
 
 sys.path.insert(0, ROOT_DIR)
 
-from service import ModelService, KeyframeQueryService, TranslationService
-from schema.response import KeyframeDisplay
+import numpy as np
+
+from service import ModelService, KeyframeQueryService, TranslationService, TextEncodeBatcher, ImageEncoder
+from schema.response import KeyframeDisplay, KeyframeBatchDisplay
 from schema.request import (
     ImageSearchRequest,
-    UnifiedSearchRequest
+    UnifiedSearchRequest,
+    BatchSearchRequest,
+    ExclusionUpdateRequest
 )
 
 class QueryController:
@@ -24,10 +29,15 @@ class QueryController:
         object_classes_path: Path,
         model_service: ModelService,
         keyframe_service: KeyframeQueryService,
-        translate_service: TranslationService
+        translate_service: TranslationService,
+        text_encoder: TextEncodeBatcher | None = None,
+        image_encoder: ImageEncoder | None = None
     ):
         self.object_classes_path = object_classes_path
         self.model_service = model_service
+        # encode qua micro-batcher để các request đồng thời dùng chung một forward pass
+        self.text_encoder = text_encoder or TextEncodeBatcher(model_service)
+        self.image_encoder = image_encoder or ImageEncoder(model_service)
         self.keyframe_service = keyframe_service
         self.translate_service = translate_service
         self.total = self.keyframe_service.get_total()
@@ -37,17 +47,75 @@ class QueryController:
         return {'frames': results}
             
     async def image_search(self, search_request: ImageSearchRequest) -> KeyframeDisplay:
-        results = await self.keyframe_service.image_search(search_request)
-        return KeyframeDisplay(total_page=math.ceil(self.total / search_request.size), results=results)
+        return await self.keyframe_service.image_search(search_request)
     
+    async def encode_query(self, text: str, req: UnifiedSearchRequest) -> tuple[np.ndarray, dict[str, list[float]]]:
+        """
+        Dịch một lần rồi encode song song bằng model chính và mọi model phụ có trọng số > 0.
+        """
+        text = await self.translate_service.atranslate(text)
+        weights = self.keyframe_service.model_weights(req)
+        extras = [m for name, m in self.keyframe_service.extra_models.items() if weights[name] > 0]
+        embs = await asyncio.gather(
+            self.text_encoder.embedding(text),
+            *(m.text_encoder.embedding(text) for m in extras)
+        )
+        return embs[0][0], {m.name: emb.tolist()[0] for m, emb in zip(extras, embs[1:])}
+
     async def unified_search(self, req: UnifiedSearchRequest) -> KeyframeDisplay:
+        # trang tiếp theo / truy vấn lặp lại đã có trong cache -> không cần dịch/encode lại
+        cached = await self.keyframe_service.cached_unified_search(req)
+        if cached is not None:
+            return cached
+
         emb = None
+        extra_embs = None
+
+        if req.query:
+            text_emb, extra_embs = await self.encode_query(req.query, req)
+            emb = text_emb.tolist()
+        return await self.keyframe_service.unified_search(emb, req, extra_embs=extra_embs)
+
+    async def upload_image_search(self, images: list[bytes], req: UnifiedSearchRequest) -> KeyframeDisplay:
+        """
+        Query by uploaded images. The image centroid is the vector signal of the usual unified search
+        (ASR/OCR/object/video filters still apply); a text query, if given, is averaged in.
+        Later pages go through /keyframe/search with the returned cursor.
+        """
+        key_extra = f"image:{ImageEncoder.digest(images)}"
+        cached = await self.keyframe_service.cached_unified_search(req, key_extra=key_extra)
+        if cached is not None:
+            return cached
 
+        emb = await self.image_encoder.query_embedding(images)
+        extra_embs = None
         if req.query:
-            emb = self.model_service.embedding(
-                self.translate_service.translate(req.query)
-            ).tolist()[0]
-        items = await self.keyframe_service.unified_search(emb, req)
+            # model phụ chỉ có tín hiệu text (ảnh được encode bằng model chính)
+            text_emb, extra_embs = await self.encode_query(req.query, req)
+            text_emb = text_emb / max(float(np.linalg.norm(text_emb)), 1e-12)
+            emb = (emb + text_emb) / 2
+        return await self.keyframe_service.unified_search(emb.tolist(), req, key_extra=key_extra, extra_embs=extra_embs)
+
+    def clear_caches(self) -> dict:
+        self.keyframe_service.invalidate_caches()
+        return {'cleared': ['result_sets', 'unified_queries']}
+
+    def add_exclusions(self, session_id: str, req: ExclusionUpdateRequest) -> dict:
+        count = self.keyframe_service.exclusions.add(session_id, req.ids)
+        return {'session': session_id, 'excluded': count}
+
+    def remove_exclusions(self, session_id: str, req: ExclusionUpdateRequest) -> dict:
+        count = self.keyframe_service.exclusions.remove(session_id, req.ids)
+        return {'session': session_id, 'excluded': count}
+
+    def clear_exclusions(self, session_id: str) -> dict:
+        self.keyframe_service.exclusions.clear(session_id)
+        return {'session': session_id, 'excluded': 0}
+
+    async def batch_search(self, req: BatchSearchRequest) -> KeyframeBatchDisplay:
+        texts = await self.translate_service.atranslate_many(req.queries)
+        embs = (await self.text_encoder.embeddings(texts)).tolist()
+        items = await self.keyframe_service.batch_search(embs, req)
         total = math.ceil(self.total / req.size)
 
-        return KeyframeDisplay(total_page=total, results=items)
\ No newline at end of file
+        return KeyframeBatchDisplay(total_page=total, results=items)
\ No newline at end of file
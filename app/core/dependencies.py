@@ -16,8 +16,8 @@ sys.path.insert(0, ROOT_DIR)
 
 
 from controller.query_controller import QueryController
-from service import ModelService, KeyframeQueryService, TranslationService
-from core.settings import KeyFrameIndexMilvusSetting, MongoDBSettings, AppSettings
+from service import ModelService, KeyframeQueryService, TranslationService, TextEncodeBatcher, ImageEncoder
+from core.settings import KeyFrameIndexMilvusSetting, MongoDBSettings, AppSettings, InferenceSettings
 from factory.factory import ServiceFactory
 from core.logger import SimpleLogger
 
@@ -47,6 +47,10 @@ def get_milvus_settings():
     """Get Milvus settings (cached)"""
     return KeyFrameIndexMilvusSetting()
 
+@lru_cache()
+def get_inference_settings():
+    return InferenceSettings()
+
 @lru_cache()
 def get_mongo_settings():
     """Get MongoDB settings (cached)"""
@@ -70,6 +74,7 @@ def get_agent_controller(
     llm = get_llm()
     keyframe_service = service_factory.get_keyframe_query_service()
     model_service = service_factory.get_model_service()
+    text_encoder = service_factory.get_text_encoder()
 
     data_folder = app_settings.DATA_FOLDER
     objects_data_path = Path(app_settings.FRAME2OBJECT)
@@ -79,6 +84,7 @@ def get_agent_controller(
         llm=llm,
         keyframe_service=keyframe_service,
         model_service=model_service,
+        text_encoder=text_encoder,
         data_folder=data_folder,
         objects_data_path=objects_data_path,
         asr_data_path=asr_data_path,
@@ -102,6 +108,26 @@ def get_model_service(service_factory: ServiceFactory = Depends(get_service_fact
             detail=f"Model service initialization failed: {str(e)}"
         )
     
+def get_text_encoder(service_factory: ServiceFactory = Depends(get_service_factory)) -> TextEncodeBatcher:
+    text_encoder = service_factory.get_text_encoder()
+    if text_encoder is None:
+        logger.error("Text encoder not available from factory")
+        raise HTTPException(
+            status_code=503,
+            detail="Text encoder not available"
+        )
+    return text_encoder
+
+def get_image_encoder(service_factory: ServiceFactory = Depends(get_service_factory)) -> ImageEncoder:
+    image_encoder = service_factory.get_image_encoder()
+    if image_encoder is None:
+        logger.error("Image encoder not available from factory")
+        raise HTTPException(
+            status_code=503,
+            detail="Image encoder not available"
+        )
+    return image_encoder
+
 def get_keyframe_service(service_factory: ServiceFactory = Depends(get_service_factory)) -> KeyframeQueryService:
     """Get keyframe query service from ServiceFactory"""
     try:
@@ -179,6 +205,8 @@ def get_milvus_repository(service_factory: ServiceFactory = Depends(get_service_
 
 def get_query_controller(
     model_service: ModelService = Depends(get_model_service),
+    text_encoder: TextEncodeBatcher = Depends(get_text_encoder),
+    image_encoder: ImageEncoder = Depends(get_image_encoder),
     keyframe_service: KeyframeQueryService = Depends(get_keyframe_service),
     translate_service: TranslationService = Depends(get_translate_service),
     app_settings: AppSettings = Depends(get_app_settings)
@@ -192,6 +220,8 @@ def get_query_controller(
         controller = QueryController(
             object_classes_path=object_classes_path,
             model_service=model_service,
+            text_encoder=text_encoder,
+            image_encoder=image_encoder,
             keyframe_service=keyframe_service,
             translate_service=translate_service,
         )
@@ -15,10 +15,11 @@ ROOT_DIR = os.path.abspath(
 sys.path.insert(0, ROOT_DIR)
 
 
-from core.settings import MongoDBSettings, KeyFrameIndexMilvusSetting, AppSettings
+from core.settings import MongoDBSettings, KeyFrameIndexMilvusSetting, AppSettings, IndexPathSettings, CacheSettings, InferenceSettings, TranslationSettings, MultiModelSettings, FullTextSettings
 from models.keyframe import Keyframe
 from models.speech_caption import SpeechCaption
 from factory.factory import ServiceFactory
+from repository.keyframe_meta import KeyframeMetaTable
 from core.logger import SimpleLogger
 
 mongo_client: AsyncIOMotorClient = None
@@ -26,6 +27,30 @@ service_factory: ServiceFactory = None
 logger = SimpleLogger(__name__)
 
 
+async def load_keyframe_meta(index_settings: IndexPathSettings) -> KeyframeMetaTable | None:
+    """
+    Nạp bảng metadata keyframe: ưu tiên snapshot trên đĩa, không có thì đọc Mongo một lần (và ghi snapshot).
+    """
+    if not index_settings.KEYFRAME_META_ENABLED:
+        return None
+
+    path = index_settings.KEYFRAME_META_PATH
+    if path and os.path.exists(path):
+        table = KeyframeMetaTable.load(path)
+        logger.info(f"Loaded keyframe metadata snapshot ({len(table)} rows) from {path}")
+        return table
+
+    table = await KeyframeMetaTable.from_mongo(Keyframe.get_pymongo_collection())
+    if len(table) == 0:
+        logger.warning("Keyframe collection is empty, metadata lookups fall back to MongoDB")
+        return None
+    logger.info(f"Loaded keyframe metadata ({len(table)} rows) from MongoDB")
+    if path:
+        table.save(path)
+        logger.info(f"Wrote keyframe metadata snapshot to {path}")
+    return table
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -37,6 +62,12 @@ async def lifespan(app: FastAPI):
         mongo_settings = MongoDBSettings()
         milvus_settings = KeyFrameIndexMilvusSetting()
         appsetting = AppSettings()
+        index_settings = IndexPathSettings()
+        cache_settings = CacheSettings()
+        inference_settings = InferenceSettings()
+        translation_settings = TranslationSettings()
+        multi_model_settings = MultiModelSettings()
+        fulltext_settings = FullTextSettings()
         global mongo_client
         mongo_connection_string = (
             f"mongodb://{mongo_settings.MONGO_USER}:{mongo_settings.MONGO_PASSWORD}"
@@ -54,6 +85,8 @@ async def lifespan(app: FastAPI):
             document_models=[Keyframe, SpeechCaption]
         )
         logger.info("Beanie initialized successfully")
+
+        keyframe_meta = await load_keyframe_meta(index_settings)
         
         global service_factory
         milvus_search_params = {
@@ -68,12 +101,59 @@ async def lifespan(app: FastAPI):
             milvus_user="",  
             milvus_password="",  
             milvus_search_params=milvus_search_params,
+            milvus_search_workers=milvus_settings.SEARCH_WORKERS,
+            milvus_max_concurrent_searches=milvus_settings.MAX_CONCURRENT_SEARCHES,
+            vector_backend=index_settings.VECTOR_BACKEND,
+            usearch_index_path=index_settings.USEARCH_INDEX_PATH,
+            metric_type=milvus_settings.METRIC_TYPE,
+            embedding_store_path=index_settings.EMBEDDING_STORE_PATH,
+            result_set_cache_size=cache_settings.RESULT_SET_CACHE_SIZE,
+            result_set_ttl=cache_settings.RESULT_SET_TTL,
+            result_set_max_hits=cache_settings.RESULT_SET_MAX_HITS,
+            expr_exclude_limit=milvus_settings.EXPR_EXCLUDE_LIMIT,
+            rerank_k=milvus_settings.RERANK_K,
+            exclusion_sessions=cache_settings.EXCLUSION_SESSIONS,
+            exclusion_ttl=cache_settings.EXCLUSION_TTL,
+            query_cache_size=cache_settings.QUERY_CACHE_SIZE,
+            query_cache_ttl=cache_settings.QUERY_CACHE_TTL,
+            data_version_path=cache_settings.DATA_VERSION_PATH,
+            text_embedding_cache_size=cache_settings.TEXT_EMBEDDING_CACHE_SIZE,
+            text_embedding_cache_path=cache_settings.TEXT_EMBEDDING_CACHE_PATH,
+            encode_max_batch=inference_settings.ENCODE_MAX_BATCH,
+            encode_max_wait_ms=inference_settings.ENCODE_MAX_WAIT_MS,
+            inference_workers=inference_settings.INFERENCE_WORKERS,
+            torch_num_threads=inference_settings.TORCH_NUM_THREADS,
+            torch_interop_threads=inference_settings.TORCH_INTEROP_THREADS,
+            translate_workers=inference_settings.TRANSLATE_WORKERS,
+            translate_timeout=inference_settings.TRANSLATE_TIMEOUT,
+            translation_backend=translation_settings.TRANSLATION_BACKEND,
+            translation_dictionary_path=translation_settings.TRANSLATION_DICTIONARY_PATH,
+            translation_target=translation_settings.TRANSLATION_TARGET,
+            translation_skip_langs=translation_settings.TRANSLATION_SKIP_LANGS,
+            translation_cache_size=translation_settings.TRANSLATION_CACHE_SIZE,
+            translation_cache_path=translation_settings.TRANSLATION_CACHE_PATH,
+            extra_models=multi_model_settings.EXTRA_MODELS,
+            text_encoder_path=inference_settings.TEXT_ENCODER_PATH,
+            shared_weights_path=inference_settings.SHARED_WEIGHTS_PATH,
+            image_preprocess_workers=inference_settings.IMAGE_PREPROCESS_WORKERS,
+            image_inference_workers=inference_settings.IMAGE_INFERENCE_WORKERS,
+            image_max_concurrent=inference_settings.IMAGE_MAX_CONCURRENT,
+            image_max_pixels=inference_settings.IMAGE_UPLOAD_MAX_PIXELS,
+            keyframe_meta=keyframe_meta,
+            video_index_path=index_settings.VIDEO_INDEX_PATH,
+            coarse_top_videos=index_settings.COARSE_TOP_VIDEOS,
+            fts_index_dir=fulltext_settings.FTS_INDEX_DIR,
+            trigram_threshold=fulltext_settings.FTS_TRIGRAM_THRESHOLD,
             model_name=appsetting.MODEL_NAME,
             pretrained=appsetting.PRETRAINED,
             mongo_collection=Keyframe,
             data_folder=appsetting.DATA_FOLDER
         )
         logger.info("Service factory initialized successfully")
+
+        # dò backend full-text một lần -> fts_search không phải thử $search/$text thất bại mỗi query
+        fts_backends = await service_factory.get_mongo_keyframe_repo().probe_fts()
+        logger.info(f"Full-text backends: {fts_backends}")
         
         app.state.service_factory = service_factory
         app.state.mongo_client = mongo_client
@@ -90,6 +170,10 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down application...")
     
     try:
+        if service_factory:
+            service_factory.shutdown()
+            logger.info("Service factory worker pools stopped")
+
         if mongo_client:
             mongo_client.close()
             logger.info("MongoDB connection closed")
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import BaseModel, Field
+from typing import Literal
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -13,18 +14,103 @@ class MongoDBSettings(BaseSettings):
 
 
 class IndexPathSettings(BaseSettings):
-    FAISS_INDEX_PATH: str | None  
-    USEARCH_INDEX_PATH: str | None
+    VECTOR_BACKEND: Literal['milvus', 'usearch'] = 'milvus'
+    FAISS_INDEX_PATH: str | None = None
+    USEARCH_INDEX_PATH: str | None = None
+    USEARCH_DTYPE: Literal['f32', 'f16', 'i8'] = 'f32'
+    EMBEDDING_STORE_PATH: str | None = None
+    KEYFRAME_META_ENABLED: bool = True
+    KEYFRAME_META_PATH: str | None = None  # snapshot .npy; không có -> nạp từ Mongo lúc khởi động
+    VIDEO_INDEX_PATH: str | None = None    # embedding theo video (.npz) cho coarse-to-fine search
+    COARSE_TOP_VIDEOS: int = 0             # >0: text query chỉ tìm keyframe trong top video; 0 = quét toàn bộ
 
 class KeyFrameIndexMilvusSetting(BaseSettings):
     COLLECTION_NAME: str = "keyframe"
     HOST: str = 'localhost'
     PORT: str = '19530'
     METRIC_TYPE: str = 'COSINE'
-    INDEX_TYPE: str = 'FLAT'
+    INDEX_TYPE: str = 'FLAT'  # FLAT | IVF_FLAT | IVF_SQ8 | IVF_PQ | HNSW | BIN_FLAT | BIN_IVF_FLAT
+    INDEX_PARAMS: dict = {}   # build params, mặc định theo INDEX_TYPE (xem embedding_migration.py)
+    RERANK_K: int = 0         # >0: chấm lại top RERANK_K ứng viên bằng vector float32 (cần EMBEDDING_STORE_PATH)
     BATCH_SIZE: int =10000
     SEARCH_PARAMS: dict = {}
+    SEARCH_WORKERS: int = 4
+    MAX_CONCURRENT_SEARCHES: int = 8
+    EXPR_EXCLUDE_LIMIT: int = 256
     
+class CacheSettings(BaseSettings):
+    # result set (ranking đã hợp nhất) cho cursor pagination
+    RESULT_SET_CACHE_SIZE: int = 256
+    RESULT_SET_TTL: float = 900
+    RESULT_SET_MAX_HITS: int = 2000
+    # exclusion set theo session (id đã xem)
+    EXCLUSION_SESSIONS: int = 1024
+    EXCLUSION_TTL: float = 86400
+    # cache theo truy vấn đã chuẩn hoá (bỏ qua dịch/encode/Milvus/FTS khi lặp lại)
+    QUERY_CACHE_SIZE: int = 512
+    QUERY_CACHE_TTL: float = 1800
+    # file stamp do migration ghi; đổi -> xoá result set + query cache
+    DATA_VERSION_PATH: str | None = None
+    # cache embedding text CLIP: LRU trong RAM + SQLite trên đĩa (tuỳ chọn, giữ qua restart)
+    TEXT_EMBEDDING_CACHE_SIZE: int = 4096
+    TEXT_EMBEDDING_CACHE_PATH: str | None = None
+
+class InferenceSettings(BaseSettings):
+    # micro-batching cho encode text: gom request đồng thời tối đa ENCODE_MAX_WAIT_MS hoặc ENCODE_MAX_BATCH text
+    ENCODE_MAX_BATCH: int = 32
+    ENCODE_MAX_WAIT_MS: float = 5.0
+    # forward pass chạy trên pool riêng; torch nhả GIL nên thread pool là đủ
+    INFERENCE_WORKERS: int = 1
+    TORCH_NUM_THREADS: int | None = None  # None -> mặc định của torch
+    TORCH_INTEROP_THREADS: int | None = None
+    # dịch chạy trên pool riêng; quá hạn -> dùng text gốc
+    TRANSLATE_WORKERS: int = 4
+    TRANSLATE_TIMEOUT: float = 5.0
+    # text encoder đã export (.onnx / .pt TorchScript) từ migration/export_text_encoder.py; None -> open_clip đầy đủ
+    TEXT_ENCODER_PATH: str | None = None
+    # snapshot weights open_clip, nạp bằng mmap -> N worker dùng chung một bản trong RAM
+    SHARED_WEIGHTS_PATH: str | None = None
+    # tìm kiếm bằng ảnh upload: giới hạn kích thước + pool riêng để không chặn truy vấn text
+    IMAGE_UPLOAD_MAX_FILES: int = 8
+    IMAGE_UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+    IMAGE_UPLOAD_MAX_PIXELS: int = 25_000_000  # sau giải mã (JPEG đã thu nhỏ bằng draft)
+    IMAGE_PREPROCESS_WORKERS: int = 4
+    IMAGE_INFERENCE_WORKERS: int = 1
+    IMAGE_MAX_CONCURRENT: int = 2
+
+class TranslationSettings(BaseSettings):
+    # google | dictionary | identity | package.module:ClassName (TranslationBackend tự viết, vd. model local)
+    TRANSLATION_BACKEND: str = 'google'
+    TRANSLATION_DICTIONARY_PATH: str | None = None
+    TRANSLATION_TARGET: str = 'en'
+    # ngôn ngữ không cần dịch (mặc định = ngôn ngữ đích)
+    TRANSLATION_SKIP_LANGS: list[str] = ['en']
+    TRANSLATION_CACHE_SIZE: int = 4096
+    TRANSLATION_CACHE_PATH: str | None = None
+
+class FullTextSettings(BaseSettings):
+    # thư mục index full-text in-process (asr/, ocr/) do migration/fts_migration.py ghi; None -> chỉ dùng Mongo
+    FTS_INDEX_DIR: str | None = None
+    FTS_FOLD_DIACRITICS: bool = True   # "hà nội" khớp "ha noi" (áp dụng lúc build index)
+    FTS_BM25_K1: float = 1.2
+    FTS_BM25_B: float = 0.75
+    FTS_TRIGRAM_THRESHOLD: float = 0.5  # OCR fuzzy: tỉ lệ trigram của query phải có trong text
+
+class ExtraModelSetting(BaseModel):
+    name: str
+    model_name: str
+    pretrained: str
+    collection_name: str | None = None     # VECTOR_BACKEND=milvus
+    usearch_index_path: str | None = None  # VECTOR_BACKEND=usearch
+    metric_type: str = 'COSINE'
+    search_params: dict | None = None      # nprobe/ef...; None -> SEARCH_PARAMS của collection chính
+    force_quick_gelu: bool = True          # True cho checkpoint OpenAI; False cho SigLIP, ...
+    weight: float = 1.0
+
+class MultiModelSettings(BaseSettings):
+    # JSON, vd. [{"name": "siglip", "model_name": "...", "pretrained": "...", "collection_name": "keyframe_siglip", "weight": 0.8}]
+    EXTRA_MODELS: list[ExtraModelSetting] = []
+
 class AppSettings(BaseSettings):
     DATA_FOLDER: str
     ID2INDEX_PATH: str
@@ -11,11 +11,29 @@ sys.path.insert(0, ROOT_DIR)
 
 from repository.mongo import KeyframeRepository
 from repository.milvus import KeyframeVectorRepository
-from service import KeyframeQueryService, ModelService, TranslationService
+from repository.usearch_index import KeyframeUsearchRepository
+from repository.embedding_store import EmbeddingStore
+from repository.keyframe_meta import KeyframeMetaTable
+from repository.video_index import VideoIndex
+from repository.bm25_index import BM25Index
+from repository.trigram_index import TrigramIndex
+from common.executor import BoundedExecutor
+from common.cache import LRUCache
+from common.exclusion import ExclusionStore
+from common.embedding_cache import TextEmbeddingCache
+from service import KeyframeQueryService, ModelService, TranslationService, TextEncodeBatcher, ImageEncoder, EmbeddingModel
+from service.text_encoder import load_text_encoder, text_encoder_identity
+from service.shared_weights import load_shared_model, snapshot_meta_path
+from service.translator_service import load_backend
 from models.keyframe import Keyframe
+from core.settings import ExtraModelSetting
+from core.logger import SimpleLogger
 import open_clip
+import torch
 from pymilvus import connections, Collection as MilvusCollection
 
+logger = SimpleLogger(__name__)
+
 
 class ServiceFactory:
     def __init__(
@@ -31,32 +49,168 @@ class ServiceFactory:
         data_folder: str,
         milvus_db_name: str = "default",
         milvus_alias: str = "default",
+        milvus_search_workers: int = 4,
+        milvus_max_concurrent_searches: int = 8,
+        vector_backend: str = "milvus",
+        usearch_index_path: str | None = None,
+        metric_type: str = "COSINE",
+        embedding_store_path: str | None = None,
+        result_set_cache_size: int = 256,
+        result_set_ttl: float = 900,
+        result_set_max_hits: int = 2000,
+        expr_exclude_limit: int = 256,
+        rerank_k: int = 0,
+        exclusion_sessions: int = 1024,
+        exclusion_ttl: float = 86400,
+        keyframe_meta: KeyframeMetaTable | None = None,
+        video_index_path: str | None = None,
+        coarse_top_videos: int = 0,
+        fts_index_dir: str | None = None,
+        trigram_threshold: float = 0.5,
+        query_cache_size: int = 512,
+        query_cache_ttl: float = 1800,
+        data_version_path: str | None = None,
+        text_embedding_cache_size: int = 4096,
+        text_embedding_cache_path: str | None = None,
+        encode_max_batch: int = 32,
+        encode_max_wait_ms: float = 5.0,
+        inference_workers: int = 1,
+        torch_num_threads: int | None = None,
+        torch_interop_threads: int | None = None,
+        translate_workers: int = 4,
+        translate_timeout: float = 5.0,
+        translation_backend: str = "google",
+        translation_dictionary_path: str | None = None,
+        translation_target: str = "en",
+        translation_skip_langs: list[str] | None = None,
+        translation_cache_size: int = 4096,
+        translation_cache_path: str | None = None,
+        text_encoder_path: str | None = None,
+        shared_weights_path: str | None = None,
+        image_preprocess_workers: int = 4,
+        image_inference_workers: int = 1,
+        image_max_concurrent: int = 2,
+        image_max_pixels: int | None = None,
+        extra_models: list[ExtraModelSetting] | None = None,
         mongo_collection=Keyframe,
     ):
-        self._mongo_keyframe_repo = KeyframeRepository(collection=mongo_collection)
-        self._milvus_keyframe_repo = self._init_milvus_repo(
-            search_params=milvus_search_params,
-            collection_name=milvus_collection_name,
-            host=milvus_host,
-            port=milvus_port,
-            user=milvus_user,
-            password=milvus_password,
-            db_name=milvus_db_name,
-            alias=milvus_alias
+        self._fts_executor = BoundedExecutor(name="fts", max_workers=2)
+        self._fts_index_dir = fts_index_dir
+        self._mongo_keyframe_repo = KeyframeRepository(
+            collection=mongo_collection,
+            fts_indexes=self._init_fts_indexes(fts_index_dir),
+            executor=self._fts_executor,
+            ocr_trigram=self._init_ocr_trigram(fts_index_dir),
+            trigram_threshold=trigram_threshold
+        )
+        self._vector_search_executor = BoundedExecutor(
+            name="milvus-search",
+            max_workers=milvus_search_workers,
+            max_in_flight=milvus_max_concurrent_searches
         )
+        self._embedding_store = self._init_embedding_store(embedding_store_path)
+        self._expr_exclude_limit = expr_exclude_limit
+        self._rerank_k = rerank_k
+        self._milvus_alias = milvus_alias
+        # model phụ dùng chung params search (nprobe/ef) nếu không tự khai báo
+        self._milvus_search_params = milvus_search_params
+        if vector_backend == "usearch":
+            if not usearch_index_path:
+                raise ValueError("USEARCH_INDEX_PATH must be set when VECTOR_BACKEND=usearch")
+            self._milvus_keyframe_repo = KeyframeUsearchRepository(
+                index_path=usearch_index_path,
+                metric_type=metric_type,
+                executor=self._vector_search_executor,
+                embedding_store=self._embedding_store,
+                rerank_k=rerank_k,
+                keyframe_meta=keyframe_meta
+            )
+        else:
+            self._connect_milvus(
+                host=milvus_host,
+                port=milvus_port,
+                user=milvus_user,
+                password=milvus_password,
+                db_name=milvus_db_name,
+                alias=milvus_alias
+            )
+            self._milvus_keyframe_repo = self._init_milvus_repo(
+                search_params=milvus_search_params,
+                collection_name=milvus_collection_name
+            )
+
+        self._video_index_path = video_index_path
+        self._metric_type = metric_type
+        self._video_index = self._init_video_index(video_index_path, keyframe_meta, metric_type)
 
-        self._model_service = self._init_model_service(model_name, pretrained)
-        self._translate_service = TranslationService()
+        self._text_embedding_cache = TextEmbeddingCache(
+            model_name=model_name,
+            pretrained=pretrained,
+            maxsize=text_embedding_cache_size,
+            path=text_embedding_cache_path,
+            encoder=text_encoder_identity(text_encoder_path)
+        )
+        self._configure_torch_threads(torch_num_threads, torch_interop_threads)
+        self._torch_num_threads = torch_num_threads
+        self._model_service = self._init_model_service(
+            model_name, pretrained, self._text_embedding_cache, text_encoder_path, shared_weights_path
+        )
+        self._inference_executor = BoundedExecutor(name="clip-inference", max_workers=inference_workers)
+        self._text_encoder = TextEncodeBatcher(
+            model_service=self._model_service,
+            max_batch=encode_max_batch,
+            max_wait_ms=encode_max_wait_ms,
+            runner=self._inference_executor.run
+        )
+        self._image_encoder = ImageEncoder(
+            model_service=self._model_service,
+            preprocess_executor=BoundedExecutor(name="image-preprocess", max_workers=image_preprocess_workers),
+            inference_executor=BoundedExecutor(
+                name="clip-image",
+                max_workers=image_inference_workers,
+                max_in_flight=image_max_concurrent
+            ),
+            max_pixels=image_max_pixels
+        )
+        self._translate_service = TranslationService(
+            backend=load_backend(translation_backend, translation_dictionary_path),
+            executor=BoundedExecutor(name="translate", max_workers=translate_workers),
+            timeout=translate_timeout,
+            target=translation_target,
+            skip_langs=translation_skip_langs,
+            cache_size=translation_cache_size,
+            cache_path=translation_cache_path
+        )
+        self._extra_models = [
+            self._init_extra_model(
+                setting,
+                vector_backend=vector_backend,
+                keyframe_meta=keyframe_meta,
+                cache_size=text_embedding_cache_size,
+                cache_path=text_embedding_cache_path,
+                encode_max_batch=encode_max_batch,
+                encode_max_wait_ms=encode_max_wait_ms
+            )
+            for setting in extra_models or []
+        ]
         self._keyframe_query_service = KeyframeQueryService(
             keyframe_mongo_repo=self._mongo_keyframe_repo,
             keyframe_vector_repo=self._milvus_keyframe_repo,
-            data_folder=data_folder
+            data_folder=data_folder,
+            result_set_cache=LRUCache("result_sets", maxsize=result_set_cache_size, ttl=result_set_ttl),
+            result_set_max_hits=result_set_max_hits,
+            exclusion_store=ExclusionStore(max_sessions=exclusion_sessions, ttl=exclusion_ttl),
+            keyframe_meta=keyframe_meta,
+            query_cache=LRUCache("unified_queries", maxsize=query_cache_size, ttl=query_cache_ttl),
+            data_version_path=data_version_path,
+            extra_models=self._extra_models,
+            video_index=self._video_index,
+            coarse_top_videos=coarse_top_videos,
+            reload_hooks=[self._reload_fts_indexes, self._reload_ocr_trigram, self._reload_video_index]
         )
 
-    def _init_milvus_repo(
+    def _connect_milvus(
         self,
-        search_params: dict,
-        collection_name: str,
         host: str,
         port: str,
         user: str,
@@ -78,14 +232,178 @@ class ServiceFactory:
             conn_params["password"] = password
 
         connections.connect(alias=alias, **conn_params)
-        collection = MilvusCollection(collection_name, using=alias)
 
-        return KeyframeVectorRepository(collection=collection, search_params=search_params)
+    def _init_milvus_repo(self, search_params: dict, collection_name: str):
+        collection = MilvusCollection(collection_name, using=self._milvus_alias)
+
+        return KeyframeVectorRepository(
+            collection=collection,
+            search_params=search_params,
+            executor=self._vector_search_executor,
+            embedding_store=self._embedding_store,
+            expr_exclude_limit=self._expr_exclude_limit,
+            rerank_k=self._rerank_k
+        )
+
+    def _init_extra_model(
+        self,
+        setting: ExtraModelSetting,
+        vector_backend: str,
+        keyframe_meta: KeyframeMetaTable | None,
+        cache_size: int,
+        cache_path: str | None,
+        encode_max_batch: int,
+        encode_max_wait_ms: float
+    ) -> EmbeddingModel:
+        # embedding store / re-rank gắn với model chính -> collection phụ search trực tiếp
+        if vector_backend == "usearch":
+            if not setting.usearch_index_path:
+                raise ValueError(f"Extra model {setting.name}: usearch_index_path must be set when VECTOR_BACKEND=usearch")
+            vector_repo = KeyframeUsearchRepository(
+                index_path=setting.usearch_index_path,
+                metric_type=setting.metric_type,
+                executor=self._vector_search_executor,
+                keyframe_meta=keyframe_meta
+            )
+        else:
+            if not setting.collection_name:
+                raise ValueError(f"Extra model {setting.name}: collection_name must be set when VECTOR_BACKEND=milvus")
+            vector_repo = KeyframeVectorRepository(
+                collection=MilvusCollection(setting.collection_name, using=self._milvus_alias),
+                search_params={
+                    "metric_type": setting.metric_type,
+                    "params": self._milvus_search_params.get("params", {}) if setting.search_params is None else setting.search_params
+                },
+                executor=self._vector_search_executor,
+                expr_exclude_limit=self._expr_exclude_limit
+            )
+
+        embedding_cache = TextEmbeddingCache(
+            model_name=setting.model_name,
+            pretrained=setting.pretrained,
+            maxsize=cache_size,
+            path=cache_path,
+            # activation khác -> vector khác, không dùng lại cache của cấu hình kia
+            encoder='open_clip' if setting.force_quick_gelu else 'open_clip:gelu'
+        )
+        model_service = self._init_model_service(
+            setting.model_name, setting.pretrained, embedding_cache, force_quick_gelu=setting.force_quick_gelu
+        )
+        # mỗi model một pool inference -> các model encode song song
+        inference_executor = BoundedExecutor(name=f"clip-inference-{setting.name}", max_workers=1)
+        text_encoder = TextEncodeBatcher(
+            model_service=model_service,
+            max_batch=encode_max_batch,
+            max_wait_ms=encode_max_wait_ms,
+            runner=inference_executor.run
+        )
+        return EmbeddingModel(
+            name=setting.name,
+            model_service=model_service,
+            text_encoder=text_encoder,
+            vector_repo=vector_repo,
+            inference_executor=inference_executor,
+            weight=setting.weight
+        )
+
+    def _init_embedding_store(self, path: str | None):
+        if not path or not os.path.exists(path):
+            return None
+        return EmbeddingStore(path)
+
+    def _init_fts_indexes(self, index_dir: str | None) -> dict[str, BM25Index]:
+        indexes = {}
+        for source in ('asr', 'ocr'):
+            path = os.path.join(index_dir, source) if index_dir else None
+            if BM25Index.exists(path):
+                indexes[source] = BM25Index.load(path)
+                logger.info(f"Loaded {source} BM25 index ({len(indexes[source])} docs) from {path}")
+        return indexes
 
-    def _init_model_service(self, model_name: str, pretrained: str):
-        model, _, preprocess = open_clip.create_model_and_transforms(model_name, pretrained=pretrained, force_quick_gelu=True)
+    def _reload_fts_indexes(self) -> None:
+        # fts_migration ghi lại index rồi bump DATA_VERSION -> nạp bản mới (memmap, rẻ); lỗi thì giữ bản cũ
+        try:
+            self._mongo_keyframe_repo.fts_indexes = self._init_fts_indexes(self._fts_index_dir)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Keeping the current BM25 indexes, reload failed: {e}")
+
+    def _init_ocr_trigram(self, index_dir: str | None) -> TrigramIndex | None:
+        path = os.path.join(index_dir, 'ocr_trigram') if index_dir else None
+        if not TrigramIndex.exists(path):
+            return None
+        index = TrigramIndex.load(path)
+        logger.info(f"Loaded OCR trigram index ({len(index)} keyframes) from {path}")
+        return index
+
+    def _reload_ocr_trigram(self) -> None:
+        try:
+            self._mongo_keyframe_repo.ocr_trigram = self._init_ocr_trigram(self._fts_index_dir)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Keeping the current OCR trigram index, reload failed: {e}")
+
+    def _init_video_index(self, path: str | None, keyframe_meta: KeyframeMetaTable | None, metric_type: str):
+        if path and os.path.exists(path):
+            video_index = VideoIndex.load(path)
+            logger.info(f"Loaded video index ({len(video_index)} videos) from {path}")
+        elif path and self._embedding_store is not None and keyframe_meta is not None:
+            # chưa có file từ migration -> dựng từ embedding store + bảng metadata rồi lưu lại
+            rows = keyframe_meta.rows
+            video_index = VideoIndex.build(self._embedding_store.matrix, rows['key'], rows['group_num'], rows['video_num'])
+            video_index.save(path)
+            logger.info(f"Built video index ({len(video_index)} videos) to {path}")
+        else:
+            return None
+        return video_index.attach(self._embedding_store, metric_type, self._vector_search_executor)
+
+    def _reload_video_index(self) -> None:
+        # embedding_migration ghi lại file video index -> nạp bản mới; không dựng lại trên server
+        path = self._video_index_path
+        if not path or not os.path.exists(path):
+            return
+        try:
+            video_index = VideoIndex.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Keeping the current video index, reload failed: {e}")
+            return
+        logger.info(f"Reloaded video index ({len(video_index)} videos) from {path}")
+        self._video_index = video_index.attach(self._embedding_store, self._metric_type, self._vector_search_executor)
+        self._keyframe_query_service.video_index = self._video_index
+
+    def _configure_torch_threads(self, num_threads: int | None, interop_threads: int | None):
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        if interop_threads:
+            try:
+                torch.set_num_interop_threads(interop_threads)
+            except RuntimeError:
+                # chỉ đặt được trước khi torch chạy tác vụ song song đầu tiên
+                pass
+
+    def _init_model_service(
+        self,
+        model_name: str,
+        pretrained: str,
+        embedding_cache: TextEmbeddingCache | None = None,
+        text_encoder_path: str | None = None,
+        shared_weights_path: str | None = None,
+        force_quick_gelu: bool = True
+    ):
         tokenizer = open_clip.get_tokenizer(model_name)
-        return ModelService(model=model, preprocess=preprocess, tokenizer=tokenizer)
+        if text_encoder_path:
+            # chỉ cần text tower lúc query -> không nạp model open_clip đầy đủ
+            text_encoder = load_text_encoder(text_encoder_path, model_name, pretrained, num_threads=self._torch_num_threads)
+            return ModelService(model=None, preprocess=None, tokenizer=tokenizer, embedding_cache=embedding_cache, text_encoder=text_encoder)
+
+        if shared_weights_path and os.path.exists(shared_weights_path) and os.path.exists(snapshot_meta_path(shared_weights_path)):
+            # weights memory-map từ snapshot -> các worker dùng chung page cache
+            model, preprocess = load_shared_model(shared_weights_path, model_name, pretrained)
+            return ModelService(model=model, preprocess=preprocess, tokenizer=tokenizer, embedding_cache=embedding_cache)
+
+        if shared_weights_path:
+            # worker không tự export (nhiều worker ghi cùng lúc); snapshot do main.py ghi trước khi fork
+            logger.warning(f"Shared weights snapshot {shared_weights_path} not found, loading a private copy of the model (start with main.py to write it)")
+        model, _, preprocess = open_clip.create_model_and_transforms(model_name, pretrained=pretrained, force_quick_gelu=force_quick_gelu)
+        return ModelService(model=model, preprocess=preprocess, tokenizer=tokenizer, embedding_cache=embedding_cache)
 
     def get_mongo_keyframe_repo(self):
         return self._mongo_keyframe_repo
@@ -93,11 +411,40 @@ class ServiceFactory:
     def get_milvus_keyframe_repo(self):
         return self._milvus_keyframe_repo
 
+    def get_embedding_store(self):
+        return self._embedding_store
+
     def get_model_service(self):
         return self._model_service
 
+    def get_inference_stats(self):
+        return self._inference_executor.stats()
+
+    def get_image_encoder(self):
+        return self._image_encoder
+
+    def get_text_encoder(self):
+        return self._text_encoder
+
+    def get_video_index(self):
+        return self._video_index
+
+    def get_extra_models(self):
+        return self._extra_models
+
     def get_keyframe_query_service(self):
         return self._keyframe_query_service
     
     def get_translate_service(self):
         return self._translate_service
+
+    def shutdown(self):
+        self._text_encoder.stop()
+        self._inference_executor.shutdown()
+        self._image_encoder.shutdown()
+        self._translate_service.shutdown()
+        self._vector_search_executor.shutdown()
+        self._fts_executor.shutdown()
+        self._text_embedding_cache.close()
+        for extra in self._extra_models:
+            extra.shutdown()
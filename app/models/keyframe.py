@@ -21,5 +21,9 @@ class Keyframe(Document):
         indexes = [
             [("objects.name", 1)],                                  # tìm theo tên object
             [("objects.name", 1), ("objects.count", 1)],            # tìm theo tên + số lượng
-            [("video_num", 1), ("group_num", 1), ("keyframe_num", 1)]
+            [("video_num", 1), ("group_num", 1), ("keyframe_num", 1)],
+            # covering index cho tra metadata theo key (projection chỉ gồm các field này)
+            [("key", 1), ("group_num", 1), ("video_num", 1), ("keyframe_num", 1)],
+            # covering index cho tra key theo khoảng keyframe_num của một video (ASR time range)
+            [("group_num", 1), ("video_num", 1), ("keyframe_num", 1), ("key", 1)],
         ]
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""
+In-process BM25 full-text index for ASR captions and keyframe OCR, built by migration/fts_migration.py.
+
+Layout of an index directory (arrays are memory-mapped, shared by worker processes):
+    meta.json       k1, b, fold, doc count, average length
+    vocab.json      term -> term id
+    offsets.npy     (T + 1,) int64   postings of term t: [offsets[t], offsets[t + 1])
+    docs.npy        (P,) int32       doc ids, ascending within a term
+    impacts.npy     (P,) float32     precomputed BM25 contribution of the term to the doc
+    max_impact.npy  (T,) float32     largest impact per term (MaxScore upper bound)
+    doc_info.npy    (N,) structured  key (OCR) or group_num/video_num/start/end (ASR)
+
+Queries use MaxScore pruning: terms whose combined upper bound cannot reach the current k-th score
+never generate candidates, so frequent low-idf terms cost a binary search per candidate instead of
+a full posting-list scan.
+"""
+
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Iterable, Optional
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+OCR_DOC_DTYPE = np.dtype([('key', '<i8')])
+ASR_DOC_DTYPE = np.dtype([
+    ('group_num', '<i4'),
+    ('video_num', '<i4'),
+    ('start', '<f4'),
+    ('end', '<f4'),
+])
+
+
+def fold_diacritics(text: str) -> str:
+    # "Hà Nội" -> "ha noi"; đ/Đ không phải dấu kết hợp nên đổi riêng
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    return ''.join(c for c in unicodedata.normalize('NFD', text) if not unicodedata.combining(c))
+
+
+def tokenize(text: str, fold: bool = True) -> list[str]:
+    text = unicodedata.normalize('NFC', text or '').lower()
+    if fold:
+        text = fold_diacritics(text)
+    return TOKEN_PATTERN.findall(text)
+
+
+class BM25Index:
+    def __init__(
+        self,
+        vocab: dict[str, int],
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        impacts: np.ndarray,
+        max_impact: np.ndarray,
+        doc_info: np.ndarray,
+        meta: dict[str, Any],
+    ):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.impacts = impacts
+        self.max_impact = max_impact
+        self.doc_info = doc_info
+        self.meta = meta
+        self.fold = bool(meta.get('fold', True))
+
+    def __len__(self) -> int:
+        return len(self.doc_info)
+
+    @classmethod
+    def build(
+        cls,
+        texts: Iterable[str],
+        doc_info: np.ndarray,
+        fold: bool = True,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> 'BM25Index':
+        """texts[i] is the text of document i, described by doc_info[i]."""
+        postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text, fold)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        n = len(lengths)
+        lengths_arr = np.asarray(lengths, dtype=np.float32)
+        avgdl = float(lengths_arr.mean()) if n else 0.0
+        norm = k1 * (1 - b + b * lengths_arr / (avgdl or 1.0))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        docs_parts, impact_parts = [], []
+        max_impact = np.zeros(len(terms), dtype=np.float32)
+        for t, term in enumerate(terms):
+            plist = postings[term]
+            d = np.fromiter((p[0] for p in plist), dtype=np.int32, count=len(plist))
+            tf = np.fromiter((p[1] for p in plist), dtype=np.float32, count=len(plist))
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            impact = (idf * tf * (k1 + 1) / (tf + norm[d])).astype(np.float32)
+            docs_parts.append(d)
+            impact_parts.append(impact)
+            max_impact[t] = impact.max()
+            offsets[t + 1] = offsets[t] + len(plist)
+
+        return cls(
+            vocab={term: t for t, term in enumerate(terms)},
+            offsets=offsets,
+            docs=np.concatenate(docs_parts) if docs_parts else np.empty(0, dtype=np.int32),
+            impacts=np.concatenate(impact_parts) if impact_parts else np.empty(0, dtype=np.float32),
+            max_impact=max_impact,
+            doc_info=np.asarray(doc_info),
+            meta={'k1': k1, 'b': b, 'fold': fold, 'num_docs': n, 'avgdl': avgdl, 'num_terms': len(terms)},
+        )
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        # ghi từng file qua tên tạm rồi rename; meta.json sau cùng
+        for name, arr in (
+            ('offsets', self.offsets),
+            ('docs', self.docs),
+            ('impacts', self.impacts),
+            ('max_impact', self.max_impact),
+            ('doc_info', self.doc_info),
+        ):
+            tmp_path = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp_path, np.ascontiguousarray(arr))
+            os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+        for name, obj in (('vocab', self.vocab), ('meta', self.meta)):
+            tmp_path = os.path.join(path, f"{name}.json.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(obj, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(path, f"{name}.json"))
+
+    @classmethod
+    def load(cls, path: str) -> 'BM25Index':
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(path, 'vocab.json'), encoding='utf-8') as f:
+            vocab = json.load(f)
+
+        def array(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+
+        return cls(vocab, array('offsets'), array('docs'), array('impacts'), array('max_impact'), array('doc_info'), meta)
+
+    @staticmethod
+    def exists(path: Optional[str]) -> bool:
+        return bool(path) and os.path.exists(os.path.join(path, 'meta.json'))
+
+    def _postings(self, t: int) -> tuple[np.ndarray, np.ndarray]:
+        lo, hi = int(self.offsets[t]), int(self.offsets[t + 1])
+        return self.docs[lo:hi], self.impacts[lo:hi]
+
+    @staticmethod
+    def _impact_of(docs: np.ndarray, impacts: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        # tra ngẫu nhiên trên posting list đã sắp theo doc id
+        pos = np.searchsorted(docs, candidates)
+        pos_clipped = np.minimum(pos, len(docs) - 1)
+        hit = (pos < len(docs)) & (docs[pos_clipped] == candidates)
+        return np.where(hit, impacts[pos_clipped], 0.0).astype(np.float32)
+
+    def _score(self, lists: list[tuple[np.ndarray, np.ndarray]], candidates: np.ndarray) -> np.ndarray:
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        for docs, impacts in lists:
+            scores += self._impact_of(docs, impacts, candidates)
+        return scores
+
+    def search(self, text: str, limit: int) -> list[tuple[int, float]]:
+        """[(doc id, BM25 score)] of the best `limit` documents, best first."""
+        term_ids = sorted({self.vocab[t] for t in tokenize(text, self.fold) if t in self.vocab})
+        if not term_ids or limit <= 0:
+            return []
+
+        # thứ tự tăng dần theo upper bound: tiền tố đầu là các term "không thiết yếu"
+        term_ids.sort(key=lambda t: float(self.max_impact[t]))
+        lists = [self._postings(t) for t in term_ids]
+        bounds = np.cumsum([float(self.max_impact[t]) for t in term_ids])
+
+        # ngưỡng ban đầu: điểm đầy đủ của top `limit` doc theo term có upper bound lớn nhất
+        top_docs, top_impacts = lists[-1]
+        seed_n = min(limit, len(top_docs))
+        seed = np.asarray(top_docs[np.argpartition(-top_impacts, seed_n - 1)[:seed_n]], dtype=np.int32)
+        seed_scores = self._score(lists, seed)
+        threshold = float(np.partition(seed_scores, len(seed_scores) - limit)[len(seed_scores) - limit]) if len(seed_scores) >= limit else 0.0
+
+        # doc chỉ xuất hiện trong các term có tổng upper bound < ngưỡng không thể vào top
+        essential_from = int(np.searchsorted(bounds, threshold, side='left'))
+        if threshold <= 0:
+            essential_from = 0
+        candidates = np.unique(np.concatenate([np.asarray(lists[i][0]) for i in range(essential_from, len(lists))] + [seed]))
+
+        scores = self._score(lists, candidates)
+        n = min(limit, len(candidates))
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.lexsort((candidates[top], -scores[top]))]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def search_keys(self, text: str, limit: int) -> list[tuple[int, float]]:
+        """OCR index: [(keyframe key, score)]."""
+        return [(int(self.doc_info['key'][d]), s) for d, s in self.search(text, limit)]
+
+    def search_segments(self, text: str, limit: int) -> list[dict]:
+        """ASR index: same shape as fts_search(..., return_type='segments')."""
+        out = []
+        for d, s in self.search(text, limit):
+            row = self.doc_info[d]
+            out.append({
+                'group_num': int(row['group_num']),
+                'video_num': int(row['video_num']),
+                'start': float(row['start']),
+                'end': float(row['end']),
+                'score': s,
+            })
+        return out
+
+    def stats(self) -> dict:
+        return {
+            'docs': int(self.meta.get('num_docs', len(self))),
+            'terms': int(self.meta.get('num_terms', len(self.vocab))),
+            'fold': self.fold,
+        }
@@ -0,0 +1,80 @@
+"""
+Read-only keyframe embedding store: the full (N, dim) matrix as a memory-mapped .npy file.
+Row i is the embedding of keyframe id i (the same ids inserted into Milvus), so lookups are O(1)
+and zero-copy; worker processes share the pages through the OS page cache.
+"""
+
+import os
+from typing import Optional
+import numpy as np
+
+
+class EmbeddingStore:
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Embedding store not found: {path}")
+        self.path = path
+        self.matrix = np.load(path, mmap_mode='r')
+        if self.matrix.ndim != 2:
+            raise ValueError(f"Embedding store must be a 2D matrix, got shape {self.matrix.shape}")
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def get(self, key: int) -> Optional[np.ndarray]:
+        """Return a read-only view of the embedding of `key`, or None if out of range."""
+        if key < 0 or key >= len(self):
+            return None
+        return self.matrix[key]
+
+    def get_many(self, keys: list[int]) -> np.ndarray:
+        """Return a (len(keys), dim) float32 copy. Keys must be valid ids."""
+        return np.asarray(self.matrix[np.asarray(keys, dtype=np.int64)], dtype=np.float32)
+
+    @staticmethod
+    def write(path: str, embeddings: np.ndarray, batch_size: int = 10000) -> None:
+        """
+        Write `embeddings` (row i = keyframe id i) to `path`.
+        Writes to a temp file then renames, so running servers never see a half-written matrix.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npy"
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=embeddings.shape)
+        for i in range(0, embeddings.shape[0], batch_size):
+            out[i:i + batch_size] = embeddings[i:i + batch_size]
+        out.flush()
+        del out
+        os.replace(tmp_path, path)
+
+
+def rerank_hits(
+    store: EmbeddingStore,
+    query: np.ndarray,
+    hit_ids: list[int],
+    top_k: int,
+    metric_type: str = 'COSINE',
+) -> list[tuple[int, float]]:
+    """
+    Exact re-rank of ANN candidates with full-precision vectors from the store.
+    Return [(id, score)] sorted by score desc (higher = more similar, like Milvus COSINE/IP).
+    """
+    ids = [i for i in hit_ids if 0 <= i < len(store)]
+    if not ids:
+        return []
+    vectors = store.get_many(ids)
+    q = np.asarray(query, dtype=np.float32).reshape(-1)
+
+    if metric_type == 'L2':
+        scores = -np.sum((vectors - q) ** 2, axis=1)
+    else:
+        scores = vectors @ q
+        if metric_type == 'COSINE':
+            norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(q) or 1.0)
+            scores = scores / np.where(norms == 0, 1.0, norms)
+
+    order = np.argsort(-scores, kind='stable')[:top_k]
+    return [(ids[i], float(scores[i])) for i in order]
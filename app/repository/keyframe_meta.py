@@ -0,0 +1,170 @@
+"""
+In-memory keyframe metadata table: key -> (group_num, video_num, keyframe_num).
+The mapping is static after migration, so path building, group/video filtering and paging are
+vectorized NumPy lookups instead of Mongo round trips. Loaded from a .npy snapshot (memory-mapped)
+written by keyframe_migration.py, or from Mongo at startup.
+"""
+
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+from typing import Iterable, List, Optional
+import numpy as np
+
+from schema.interface import MongoSearchResult, MongoSearchRequest
+from repository.mongo import MAX_PAGE_SIZE, evenly_spaced
+
+META_DTYPE = np.dtype([
+    ('key', '<i8'),
+    ('group_num', '<i4'),
+    ('video_num', '<i4'),
+    ('keyframe_num', '<i4'),
+])
+
+
+class KeyframeMetaTable:
+    def __init__(self, rows: np.ndarray):
+        rows = np.asarray(rows)
+        if rows.dtype != META_DTYPE:
+            rows = rows.astype(META_DTYPE)
+        self.rows = rows
+
+        # key gần như liên tục 0..N-1 -> mảng vị trí dày đặc, tra O(1) vector hoá
+        max_key = int(rows['key'].max()) if len(rows) else -1
+        self.pos = np.full(max_key + 1, -1, dtype=np.int64)
+        self.pos[rows['key']] = np.arange(len(rows), dtype=np.int64)
+
+        # thứ tự duyệt mặc định (group, video, keyframe) như $sort bên Mongo
+        self.sorted_rows = rows[np.lexsort((rows['keyframe_num'], rows['video_num'], rows['group_num']))]
+        # mã (group, video, keyframe) đơn điệu theo sorted_rows -> searchsorted cho truy vấn khoảng
+        self.sort_codes = self.encode(self.sorted_rows['group_num'], self.sorted_rows['video_num'], self.sorted_rows['keyframe_num'])
+
+    @staticmethod
+    def encode(group_nums, video_nums, keyframe_nums) -> np.ndarray:
+        g = np.asarray(group_nums, dtype=np.int64)
+        v = np.asarray(video_nums, dtype=np.int64)
+        kf = np.clip(np.asarray(keyframe_nums, dtype=np.int64), 0, (1 << 24) - 1)
+        return (g << 44) | (v << 24) | kf
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> 'KeyframeMetaTable':
+        rows = np.array(
+            [(int(r['key']), int(r['group_num']), int(r['video_num']), int(r['keyframe_num'])) for r in records],
+            dtype=META_DTYPE,
+        )
+        return cls(rows)
+
+    @classmethod
+    def load(cls, path: str) -> 'KeyframeMetaTable':
+        return cls(np.load(path, mmap_mode='r'))
+
+    @classmethod
+    async def from_mongo(cls, collection) -> 'KeyframeMetaTable':
+        docs = await collection.find(
+            {}, {"_id": 0, "key": 1, "group_num": 1, "video_num": 1, "keyframe_num": 1}
+        ).to_list(length=None)
+        return cls.from_records(docs)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npy"
+        np.save(tmp_path, np.ascontiguousarray(self.rows))
+        os.replace(tmp_path, path)
+
+    def _lookup(self, keys: Iterable[int]) -> np.ndarray:
+        """Row position of each key, -1 for unknown keys."""
+        keys = np.asarray(keys if isinstance(keys, np.ndarray) else list(keys), dtype=np.int64)
+        valid = (keys >= 0) & (keys < self.pos.size)
+        pos = np.full(keys.shape, -1, dtype=np.int64)
+        pos[valid] = self.pos[keys[valid]]
+        return pos
+
+    def positions(self, keys: Iterable[int]) -> np.ndarray:
+        """Row positions of `keys` in order; unknown keys are dropped."""
+        pos = self._lookup(keys)
+        return pos[pos >= 0]
+
+    def scope_mask(self, rows: np.ndarray, group_nums: Optional[List[int]], video_nums: Optional[List[int]]) -> np.ndarray:
+        """Cùng ngữ nghĩa với video_filter() bên Mongo: cặp (g, -1) = cả group g."""
+        g, v = rows['group_num'], rows['video_num']
+        if group_nums and video_nums:
+            mask = np.zeros(len(rows), dtype=bool)
+            for gg, vv in zip(group_nums, video_nums):
+                m = g == gg
+                if vv != -1:
+                    m &= v == vv
+                mask |= m
+            return mask
+        if group_nums:
+            return np.isin(g, group_nums)
+        if video_nums:
+            return np.isin(v, video_nums)
+        return np.ones(len(rows), dtype=bool)
+
+    def keys_in_scope(self, keys: Iterable[int], group_nums: Optional[List[int]], video_nums: Optional[List[int]]) -> np.ndarray:
+        """Bool mask over `keys`: True if the key exists and lies in the requested groups/videos."""
+        pos = self._lookup(keys)
+        found = pos >= 0
+        mask = np.zeros(pos.shape, dtype=bool)
+        mask[found] = self.scope_mask(self.rows[pos[found]], group_nums, video_nums)
+        return mask
+
+    def filter_keys(self, keys: List[int], group_nums: Optional[List[int]], video_nums: Optional[List[int]]) -> List[int]:
+        if not keys or not (group_nums or video_nums):
+            return keys
+        arr = np.asarray(keys, dtype=np.int64)
+        return arr[self.keys_in_scope(arr, group_nums, video_nums)].tolist()
+
+    def key_ids_in_time_ranges(self, ranges: List[tuple[int, int, int, int]], per_range_limit: int = 100) -> List[int]:
+        """Equivalent of KeyframeRepository.key_ids_in_time_ranges: all ranges resolved with one searchsorted."""
+        if not ranges:
+            return []
+        arr = np.asarray(ranges, dtype=np.int64).reshape(-1, 4)
+        lo = np.searchsorted(self.sort_codes, self.encode(arr[:, 0], arr[:, 1], arr[:, 2]), side='left')
+        hi = np.searchsorted(self.sort_codes, self.encode(arr[:, 0], arr[:, 1], arr[:, 3]), side='right')
+        keys = self.sorted_rows['key']
+
+        out: List[int] = []
+        seen = set()
+        for a, b in zip(lo.tolist(), hi.tolist()):
+            for ix in evenly_spaced(max(0, b - a), per_range_limit):
+                k = int(keys[a + ix])
+                if k not in seen:
+                    seen.add(k)
+                    out.append(k)
+        return out
+
+    @staticmethod
+    def to_results(rows: np.ndarray) -> List[MongoSearchResult]:
+        return [
+            MongoSearchResult(key=int(k), group_num=int(g), video_num=int(v), keyframe_num=int(f))
+            for k, g, v, f in zip(rows['key'], rows['group_num'], rows['video_num'], rows['keyframe_num'])
+        ]
+
+    def get_keyframes_by_keys(self, keys: List[int]) -> List[MongoSearchResult]:
+        return self.to_results(self.rows[self.positions(keys)])
+
+    def get_keyframe(self, search_request: MongoSearchRequest) -> List[MongoSearchResult]:
+        """Equivalent of KeyframeRepository.get_keyframe, answered from memory."""
+        if search_request.keys:
+            rows = self.rows[self.positions(search_request.keys)]
+        else:
+            rows = self.sorted_rows
+
+        mask = self.scope_mask(rows, search_request.group_nums, search_request.video_nums)
+        if search_request.keyframe_nums:
+            mask &= np.isin(rows['keyframe_num'], search_request.keyframe_nums)
+
+        page = max(1, (search_request.page or 1))
+        size = min(MAX_PAGE_SIZE, max(1, (search_request.size or 50)))
+        skip = (page - 1) * size
+        return self.to_results(rows[mask][skip:skip + size])
@@ -14,56 +14,238 @@ ROOT_DIR = os.path.abspath(
 sys.path.insert(0, ROOT_DIR)
 
 from typing import cast, Optional, List, Tuple
+import numpy as np
 from common.repository import MilvusBaseRepository
-from pymilvus import Collection as MilvusCollection
+from common.executor import BoundedExecutor
+from common.exclusion import ExclusionSet, merge_exclusions
+from repository.embedding_store import EmbeddingStore, rerank_hits
+from pymilvus import Collection as MilvusCollection, DataType
 from pymilvus.client.search_result import SearchResult
-from schema.interface import  MilvusSearchRequest, MilvusSearchResult, MilvusSearchResponse
+from schema.interface import  MilvusSearchRequest, MilvusBatchSearchRequest, MilvusSearchResult, MilvusSearchResponse
 from schema.request import ImageSearchRequest
 
+# Milvus giới hạn topk mỗi lần search
+MAX_TOPK = 16384
+
+
+def video_filter_expr(group_nums: Optional[List[int]], video_nums: Optional[List[int]]) -> Optional[str]:
+    """
+    Boolean expr trên scalar field group_num/video_num, cùng ngữ nghĩa với video_filter() bên Mongo:
+    cặp (g, -1) nghĩa là cả group g.
+    """
+    if group_nums and video_nums:
+        pairs = []
+        for g, v in zip(group_nums, video_nums):
+            if v != -1:
+                pairs.append(f"(group_num == {int(g)} and video_num == {int(v)})")
+            else:
+                pairs.append(f"(group_num == {int(g)})")
+        return "(" + " or ".join(pairs) + ")"
+    if group_nums:
+        return f"group_num in {[int(g) for g in group_nums]}"
+    if video_nums:
+        return f"video_num in {[int(v) for v in video_nums]}"
+    return None
+
+
+def and_exprs(*exprs: Optional[str]) -> Optional[str]:
+    parts = [e for e in exprs if e]
+    return " and ".join(parts) if parts else None
+
+
 class KeyframeVectorRepository(MilvusBaseRepository):
     def __init__(
         self, 
         collection: MilvusCollection,
-        search_params: dict
+        search_params: dict,
+        executor: Optional[BoundedExecutor] = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+        expr_exclude_limit: int = 256,
+        rerank_k: int = 0
     ):
         super().__init__(collection)
         self.search_params = search_params
-    
-    async def search_by_embedding(
+        self.metric_type = search_params.get("metric_type", "COSINE")
+        self.embedding_store = embedding_store
+
+        # index nén (IVF_SQ8/IVF_PQ/HNSW/BIN_*): lấy rerank_k ứng viên rồi chấm lại bằng vector float32 gốc
+        self.rerank_k = rerank_k if embedding_store is not None else 0
+
+        # collection BINARY_VECTOR (BIN_FLAT/BIN_IVF_FLAT): query được nhị phân hoá, metric HAMMING
+        self.binary = any(f.dtype == DataType.BINARY_VECTOR for f in collection.schema.fields)
+
+        # collection được migrate kèm scalar group_num/video_num -> lọc group/video ngay trong ANN
+        field_names = {f.name for f in collection.schema.fields}
+        self.supports_video_filter = {"group_num", "video_num"} <= field_names
+        if self.binary and embedding_store is None:
+            raise ValueError("Binary vector collections need EMBEDDING_STORE_PATH (image lookup and re-ranking)")
+        # khoảng cách HAMMING không cùng thang điểm với các repo khác -> binary luôn chấm lại bằng float32
+        if self.binary:
+            self.rerank_k = max(self.rerank_k, 1)
+        # exclusion nhỏ hơn ngưỡng -> expr "id not in [...]"; lớn hơn -> post-filter bằng bitset
+        self.expr_exclude_limit = expr_exclude_limit
+        # pymilvus chỉ có API đồng bộ -> chạy trên thread pool riêng để không chặn event loop
+        self.executor = executor or BoundedExecutor(name="milvus-search")
+
+    async def _raw_search(
         self,
-        request: MilvusSearchRequest
-    ):
-        expr = None
-        if request.exclude_ids:
-            expr = f"id not in {request.exclude_ids}"
-        
-        search_results= cast(SearchResult, self.collection.search(
-            data=[request.embedding],
+        data: list,
+        limit: int,
+        expr: Optional[str] = None,
+    ) -> list[list[MilvusSearchResult]]:
+        param = self.search_params
+        if self.binary:
+            data = [np.packbits(np.asarray(d, dtype=np.float32) > 0).tobytes() for d in data]
+            param = {**self.search_params, "metric_type": "HAMMING"}
+
+        search_results = cast(SearchResult, await self.executor.run(
+            self.collection.search,
+            data=data,
             anns_field="embedding",
-            param=self.search_params,
-            limit=request.top_k,
-            expr=expr ,
+            param=param,
+            limit=limit,
+            expr=expr,
             output_fields=["id"],
             _async=False
         ))
+        # HAMMING / L2: nhỏ = giống -> đổi dấu để giữ quy ước distance lớn = giống (như usearch, rerank_hits)
+        sign = -1.0 if self.binary or self.metric_type == 'L2' else 1.0
+        return [
+            [MilvusSearchResult(id_=hit.id, distance=sign * hit.distance) for hit in hits]
+            for hits in search_results
+        ]
+
+    async def _search_filtered(
+        self,
+        data: list,
+        top_k: int,
+        exclusion: Optional[ExclusionSet] = None,
+        expr: Optional[str] = None,
+    ) -> list[list[MilvusSearchResult]]:
+        """
+        ANN search loại bỏ các id trong exclusion, expr (nếu có) là filter scalar đẩy xuống Milvus.
+        - Ít id: đẩy xuống Milvus bằng expr như trước.
+        - Nhiều id: không dựng chuỗi expr khổng lồ; lấy dư kết quả rồi lọc bằng bitset,
+          tăng gấp đôi limit khi chưa đủ top_k. Chi phí phụ thuộc số id bị loại nằm trong top,
+          không phụ thuộc độ dài danh sách exclude.
+        """
+        if exclusion is None or len(exclusion) == 0:
+            return await self._raw_search(data, top_k, expr=expr)
+
+        if len(exclusion) <= self.expr_exclude_limit:
+            return await self._raw_search(data, top_k, expr=and_exprs(f"id not in {exclusion.to_list()}", expr))
+
+        limit = min(MAX_TOPK, top_k * 2)
+        while True:
+            rows = await self._raw_search(data, limit, expr=expr)
+            filtered = []
+            exhausted = True
+            for hits in rows:
+                ids = np.fromiter((h.id_ for h in hits), dtype=np.int64, count=len(hits))
+                keep = exclusion.keep_mask(ids)
+                kept = [h for h, k in zip(hits, keep) if k]
+                filtered.append(kept)
+                # hàng này chưa đủ và Milvus còn kết quả -> cần lấy sâu hơn
+                if len(kept) < top_k and len(hits) >= limit:
+                    exhausted = False
+            if exhausted or limit >= MAX_TOPK:
+                return [kept[:top_k] for kept in filtered]
+            limit = min(MAX_TOPK, limit * 2)
+
+    def _rerank_rows(self, data: list, rows: list[list[MilvusSearchResult]], top_k: int) -> list[list[MilvusSearchResult]]:
+        return [
+            [MilvusSearchResult(id_=i, distance=score) for i, score in
+             rerank_hits(self.embedding_store, query, [int(h.id_) for h in hits], top_k, self.metric_type)]
+            for query, hits in zip(data, rows)
+        ]
 
+    async def _search(
+        self,
+        data: list,
+        top_k: int,
+        exclusion: Optional[ExclusionSet] = None,
+        expr: Optional[str] = None,
+    ) -> list[list[MilvusSearchResult]]:
+        if self.rerank_k <= 0:
+            return await self._search_filtered(data, top_k, exclusion, expr)
+
+        # số ứng viên re-rank không vượt giới hạn topk của Milvus
+        rows = await self._search_filtered(data, min(MAX_TOPK, max(top_k, self.rerank_k)), exclusion, expr)
+        return await self.executor.run(self._rerank_rows, data, rows, top_k)
+    
+    def _video_expr(self, request) -> Optional[str]:
+        if not self.supports_video_filter:
+            return None
+        return video_filter_expr(request.group_nums, request.video_nums)
 
-        results = []
-        for hits in search_results:
-            for hit in hits:
-                result = MilvusSearchResult(
-                    id_=hit.id,
-                    distance=hit.distance,
-                )
-                results.append(result)
+    async def search_by_embedding(
+        self,
+        request: MilvusSearchRequest
+    ):
+        exclusion = merge_exclusions(request.exclusion, request.exclude_ids)
+        rows = await self._search([request.embedding], request.top_k, exclusion, self._video_expr(request))
+        results = rows[0]
         
         return MilvusSearchResponse(
             results=results,
             total_found=len(results),
         )
+
+    async def search_by_embeddings(
+        self,
+        request: MilvusBatchSearchRequest
+    ) -> list[MilvusSearchResponse]:
+        """
+        Search N embeddings in a single collection.search call.
+        Return N responses, in the same order as request.embeddings.
+        """
+        exclusion = merge_exclusions(request.exclusion, request.exclude_ids)
+        rows = await self._search(request.embeddings, request.top_k, exclusion, self._video_expr(request))
+        return [MilvusSearchResponse(results=results, total_found=len(results)) for results in rows]
     
+    async def _get_embedding(self, imgid: int) -> Optional[list[float]]:
+        if self.embedding_store is not None:
+            emb = self.embedding_store.get(imgid)
+            if emb is not None:
+                return emb.tolist()
+        if self.binary:
+            # collection chỉ giữ bản nhị phân (bytes), không dùng làm query float được
+            return None
+
+        q = await self.executor.run(
+            self.collection.query,
+            expr=f"id == {imgid}",
+            output_fields=["embedding"]
+        )
+        if not q:
+            return None
+        return q[0]["embedding"]
+
+    async def search_similar(
+        self,
+        imgid: int,
+        top_k: int,
+        exclude_ids: Optional[list[int]] = None,
+        exclusion: Optional[ExclusionSet] = None,
+    ) -> MilvusSearchResponse:
+        """
+        Top-k hàng xóm của imgid (không phân trang), dùng để dựng result set cho cursor.
+        """
+        query_emb = await self._get_embedding(imgid)
+        if query_emb is None:
+            return MilvusSearchResponse(results=[], total_found=0)
+
+        excludes = set(exclude_ids or [])
+        excludes.add(imgid)
+        return await self.search_by_embedding(
+            MilvusSearchRequest(embedding=query_emb, top_k=top_k, exclude_ids=list(excludes), exclusion=exclusion)
+        )
+
     def get_total(self):
         return self.collection.num_entities
+
+    def get_search_stats(self):
+        return self.executor.stats()
     
     async def search_by_img_id(
         self,
@@ -72,50 +254,13 @@ class KeyframeVectorRepository(MilvusBaseRepository):
     ):
         """
         Tìm hàng xóm của ảnh có id = imgid bằng chính embedding của nó.
-        - page: bắt đầu từ 0
+        - page: bắt đầu từ 1
         - size: số lượng kết quả mỗi trang
         Trả về list [neighbor_id] sắp xếp theo score giảm dần.
         """
-
-        # 1) Lấy embedding của imgid
-        q = self.collection.query(
-            expr=f"id == {search_request.imgid}",
-            output_fields=["embedding"]
-        )
-        if not q:
-            return []
-
-        query_emb = q[0]["embedding"]
-
-        # 2) Xây expr loại chính nó + các id cần exclude (nếu có)
-        excludes = set(exclude_ids or [])
-        excludes.add(search_request.imgid)
-        expr_parts = []
-        if excludes:
-            expr_parts.append(f"id not in {list(excludes)}")
-        expr = " and ".join(expr_parts) if expr_parts else None
-
         skip = (search_request.page - 1) * search_request.size
-        self.search_params['offset'] = skip
-        
-        search_res = self.collection.search(
-            data=[query_emb],
-            anns_field="embedding",
-            param=self.search_params,  
-            limit=search_request.size,
-            expr=expr,
-            output_fields=["id"],        # không cần lấy embedding khi duyệt hàng xóm
-            _async=False
-        )
-
-        results = []
-        for hits in search_res:
-            for hit in hits:
-                result = MilvusSearchResult(
-                    id_=hit.id,
-                    distance=hit.distance,
-                )
-                results.append(result)
+        res = await self.search_similar(search_request.imgid, skip + search_request.size, exclude_ids)
+        results = res.results[skip:]
         return MilvusSearchResponse(
             results=results,
             total_found=len(results),
@@ -12,72 +12,284 @@ ROOT_DIR = os.path.abspath(
 
 sys.path.insert(0, ROOT_DIR)
 
+import asyncio
+import re
+from bisect import bisect_left, bisect_right
 from typing import List, Tuple, Literal, Optional, Any
+from pymongo.errors import OperationFailure
 from models.keyframe import Keyframe
 from models.speech_caption import SpeechCaption
 from common.repository import MongoBaseRepository
 from schema.interface import MongoSearchResult, MongoSearchRequest
 from schema.request import ObjFilter
+from common.executor import BoundedExecutor
+from repository.bm25_index import BM25Index
+from repository.trigram_index import TrigramIndex
+from core.logger import SimpleLogger
+
+logger = SimpleLogger(__name__)
 MAX_PAGE_SIZE = 200
+# số range ASR mỗi query $or khi tra keyframe theo khoảng thời gian
+RANGE_QUERY_BATCH = 200
+# trùng với covering index trong Keyframe.Settings.indexes
+KEY_META_INDEX = [("key", 1), ("group_num", 1), ("video_num", 1), ("keyframe_num", 1)]
+KEY_META_PROJECTION = {"_id": 0, "key": 1, "group_num": 1, "video_num": 1, "keyframe_num": 1}
+
+
+def video_filter(group_nums: Optional[List[int]], video_nums: Optional[List[int]]) -> dict:
+    """
+    Điều kiện $match theo group/video. Cặp (g, -1) nghĩa là cả group g.
+    """
+    q: dict = {}
+    if group_nums and video_nums:
+        pairs = []
+        for g, v in zip(group_nums, video_nums):
+            if v != -1:
+                pairs.append({"group_num": g, "video_num": v})
+            else:
+                pairs.append({"group_num": g})
+        q["$and"] = [{"$or": pairs}]
+    elif group_nums:
+        q["group_num"] = {"$in": group_nums}
+    elif video_nums:
+        q["video_num"] = {"$in": video_nums}
+    return q
+
+
+def evenly_spaced(n: int, limit: int) -> List[int]:
+    """
+    Chỉ số cách đều trong 0..n-1 (tối đa limit điểm, có cả hai đầu), tăng dần.
+    """
+    if n <= limit:
+        return list(range(n))
+    if limit <= 1:
+        return [0] if limit == 1 else []
+    return sorted({round(i * (n - 1) / (limit - 1)) for i in range(limit)})
+
+
 class KeyframeRepository(MongoBaseRepository[Keyframe]):
-    
+    # source ('asr' | 'ocr') -> backend đã dò lúc khởi động; trống -> thử lần lượt như cũ
+    fts_backends: dict[str, str] = {}
+    # False sau lần đầu hint KEY_META_INDEX bị từ chối (DB cũ chưa có covering index) -> không thử lại
+    key_meta_hint: bool = True
+
+    def __init__(
+        self,
+        collection=Keyframe,
+        fts_indexes: Optional[dict[str, BM25Index]] = None,
+        executor: Optional[BoundedExecutor] = None,
+        ocr_trigram: Optional[TrigramIndex] = None,
+        trigram_threshold: float = 0.5,
+    ):
+        super().__init__(collection)
+        # index BM25 in-process theo source; có index thì fts_search không cần Mongo
+        self.fts_indexes = fts_indexes or {}
+        self.fts_executor = executor
+        # trigram OCR: tìm gần đúng / chuỗi con thay cho $regex quét toàn collection
+        self.ocr_trigram = ocr_trigram
+        self.trigram_threshold = trigram_threshold
+
+    async def _find_by_keys(self, keys: List[int], q: Optional[dict] = None) -> dict[int, dict]:
+        """
+        key -> doc metadata, qua covering index (không đọc document); q là điều kiện lọc thêm.
+        """
+        if not keys:
+            return {}
+        col = Keyframe.get_pymongo_collection()
+        query = {**(q or {}), "key": {"$in": list(keys)}}
+        if self.key_meta_hint:
+            try:
+                docs = await col.find(query, KEY_META_PROJECTION).hint(KEY_META_INDEX).to_list(length=None)
+                return {int(d["key"]): d for d in docs}
+            except OperationFailure as e:
+                # covering index chưa được tạo (DB cũ) -> từ giờ để planner tự chọn index key
+                logger.warning(f"Index {KEY_META_INDEX} unavailable, key lookups run without the hint: {e}")
+                self.key_meta_hint = False
+        docs = await col.find(query, KEY_META_PROJECTION).to_list(length=None)
+        return {int(d["key"]): d for d in docs}
+
     async def get_keyframe(self, search_request: MongoSearchRequest):
         col = Keyframe.get_pymongo_collection()
 
         # --- $match ---
-        q: dict = {}
+        q: dict = video_filter(search_request.group_nums, search_request.video_nums)
         if search_request.keyframe_nums:
             q["keyframe_num"] = {"$in": search_request.keyframe_nums}
 
-        and_conds = []
-        if search_request.group_nums and search_request.video_nums:
-            pairs = []
-            for g, v in zip(search_request.group_nums, search_request.video_nums):
-                if v != -1:
-                    pairs.append({"group_num": g, "video_num": v})
-                else:
-                    pairs.append({"group_num": g})
-            and_conds.append({"$or": pairs})
-        elif search_request.group_nums:
-            q["group_num"] = {"$in": search_request.group_nums}
-        elif search_request.video_nums:
-            q["video_num"] = {"$in": search_request.video_nums}
-
-        if and_conds:
-            q["$and"] = and_conds
-
         page = max(1, (search_request.page or 1))
         size = min(MAX_PAGE_SIZE, max(1, (search_request.size or 50)))
         skip = (page - 1) * size
 
-        pipeline = [{"$match": q}]
-
         if search_request.keys:
-            # chỉ lấy các doc có trong keys & sắp theo thứ tự keys truyền vào
-            pipeline += [
-                {"$match": {"key": {"$in": search_request.keys}}},
-                {"$addFields": {"__order": {"$indexOfArray": [search_request.keys, "$key"]}}},
-                {"$match": {"__order": {"$ne": -1}}},
-                {"$sort": {"__order": 1}},
-            ]
-        else:
-            pipeline += [{"$sort": {"group_num": 1, "video_num": 1, "keyframe_num": 1}}]
+            # giữ thứ tự keys truyền vào; sắp lại phía client bằng dict thay vì $indexOfArray trên server
+            keys = list(dict.fromkeys(search_request.keys))
+            if q:
+                # có filter: chỉ lấy key khớp (covered) để biết trang nào, rồi mới cắt
+                matched = await self._find_by_keys(keys, q)
+                page_keys = [k for k in keys if k in matched][skip:skip + size]
+                by_key = {k: matched[k] for k in page_keys}
+            else:
+                # không filter: cắt trang trước -> chỉ gửi/tra size key
+                page_keys = keys[skip:skip + size]
+                by_key = await self._find_by_keys(page_keys)
+            return [MongoSearchResult(**by_key[k]) for k in page_keys if k in by_key]
 
-        pipeline += [
+        pipeline = [
+            {"$match": q},
+            {"$sort": {"group_num": 1, "video_num": 1, "keyframe_num": 1}},
             {"$skip": skip},
             {"$limit": size},
+            {"$project": KEY_META_PROJECTION},
+        ]
+
+        docs = await col.aggregate(pipeline).to_list(length=None)
+        return [MongoSearchResult(**d) for d in docs]
+    
+    async def get_keyframes_by_keys(self, keys: List[int]) -> List[MongoSearchResult]:
+        """
+        Lấy metadata của đúng các key truyền vào, theo thứ tự keys (không phân trang).
+        """
+        by_key = await self._find_by_keys(list(dict.fromkeys(keys)))
+        return [MongoSearchResult(**by_key[k]) for k in dict.fromkeys(keys) if k in by_key]
+
+    async def filter_keys_by_video(
+        self,
+        keys: List[int],
+        group_nums: Optional[List[int]],
+        video_nums: Optional[List[int]],
+    ) -> List[int]:
+        """
+        Giữ lại các key thuộc group/video yêu cầu, giữ nguyên thứ tự của keys.
+        """
+        if not keys or not (group_nums or video_nums):
+            return keys
+        keep = await self._find_by_keys(keys, video_filter(group_nums, video_nums))
+        return [k for k in keys if k in keep]
+
+    def _fts_target(self, source: Literal['asr', 'ocr'], field_override: Optional[str] = None):
+        # Chọn collection & field mặc định
+        if source == 'asr':
+            return SpeechCaption.get_pymongo_collection(), field_override or 'text'
+        return Keyframe.get_pymongo_collection(), field_override or 'ocr'
+
+    async def probe_fts(self, atlas_index: str = 'default') -> dict[str, str]:
+        """
+        Dò backend full-text có sẵn cho từng nguồn (một lần lúc khởi động):
+        'atlas' (Atlas Search index), 'text' (text index chứa field) hoặc 'regex' (quét collection).
+        fts_search sau đó gọi thẳng backend này thay vì thử lần lượt mỗi query.
+        """
+        backends: dict[str, str] = {}
+        for source in ('asr', 'ocr'):
+            if source in self.fts_indexes:
+                backends[source] = 'bm25'
+                continue
+            col, field = self._fts_target(source)
+            backend = 'regex'
+            try:
+                indexes = await col.aggregate([{"$listSearchIndexes": {"name": atlas_index}}]).to_list(length=None)
+                if any(ix.get("queryable", ix.get("status") == "READY") for ix in indexes):
+                    backend = 'atlas'
+            except Exception:
+                # không phải Atlas (hoặc server cũ) -> không có $search
+                pass
+            if backend == 'regex':
+                try:
+                    info = await col.index_information()
+                    if any(field in ix.get("weights", {}) or "$**" in ix.get("weights", {}) for ix in info.values()):
+                        backend = 'text'
+                except Exception:
+                    pass
+            if backend == 'regex' and source == 'ocr' and self.ocr_trigram is not None:
+                backend = 'trigram'
+            if backend == 'regex':
+                logger.warning(f"No full-text index for {source} ({col.name}.{field}): queries fall back to a $regex collection scan")
+            backends[source] = backend
+        self.fts_backends = backends
+        return backends
+
+    async def _fts_bm25(self, source: str, text: str, return_type: str, limit: int) -> List[Any]:
+        index = self.fts_indexes[source]
+        if return_type == 'ids':
+            fn, n = index.search_keys, limit
+        else:
+            fn, n = index.search_segments, min(limit, 1000)
+        if self.fts_executor is None:
+            return fn(text, n)
+        return await self.fts_executor.run(fn, text, n)
+
+    async def ocr_trigram_search(
+        self,
+        text: str,
+        limit: int = 5000,
+        threshold: Optional[float] = None,
+        substring: bool = False,
+    ) -> Optional[List[Tuple[int, float]]]:
+        """
+        OCR gần đúng (substring=False) hoặc chuỗi con (substring=True) qua index trigram:
+        [(key, score)] giảm dần; None khi chưa build index trigram hoặc query quá ngắn (< 3 ký tự)
+        -> caller dùng đường FTS / $regex.
+        """
+        if self.ocr_trigram is None or not self.ocr_trigram.accepts(text):
+            return None
+        threshold = self.trigram_threshold if threshold is None else threshold
+        if self.fts_executor is None:
+            return self.ocr_trigram.search(text, limit, threshold, substring)
+        return await self.fts_executor.run(self.ocr_trigram.search, text, limit, threshold, substring)
+
+    async def _fts_atlas(self, col, field: str, text: str, return_type: str, limit: int, atlas_index: str) -> List[Any]:
+        if return_type == 'ids':
+            pipeline = [
+                {"$search": {"index": atlas_index, "text": {"path": field, "query": text}}},
+                {"$limit": limit},
+                {"$project": {"_id": 0, "key": 1, "score": {"$meta": "searchScore"}}},
+            ]
+            docs = await col.aggregate(pipeline).to_list(length=None)
+            return [(int(d["key"]), float(d["score"])) for d in docs if "key" in d]
+        pipeline = [
+            {"$search": {"index": atlas_index, "text": {"path": field, "query": text}}},
+            {"$limit": min(limit, 1000)},  # giữ behavior cũ cho segments
             {"$project": {
                 "_id": 0,
-                "key": 1,
-                "video_num": 1,
                 "group_num": 1,
-                "keyframe_num": 1
+                "video_num": 1,
+                "start": 1,
+                "end": 1,
+                "score": {"$meta": "searchScore"},
             }},
         ]
+        return await col.aggregate(pipeline).to_list(length=None)
+
+    async def _fts_text(self, col, text: str, return_type: str, limit: int) -> List[Any]:
+        q = {"$text": {"$search": text}}
+        if return_type == 'ids':
+            proj = {"_id": 0, "key": 1, "score": {"$meta": "textScore"}}
+            cur = col.find(q, proj).sort([("score", {"$meta": "textScore"})]).limit(limit)
+            docs = await cur.to_list(length=None)
+            return [(int(d["key"]), float(d["score"])) for d in docs if "key" in d]
+        proj = {
+            "_id": 0,
+            "group_num": 1,
+            "video_num": 1,
+            "start": 1,
+            "end": 1,
+            "score": {"$meta": "textScore"},
+        }
+        cur = col.find(q, proj).sort([("score", {"$meta": "textScore"})]).limit(min(limit, 1000))
+        return await cur.to_list(length=None)
+
+    async def _fts_regex(self, col, field: str, text: str, return_type: str, limit: int) -> List[Any]:
+        rx = {"$regex": re.escape(text), "$options": "i"}
+        if return_type == 'ids':
+            docs = await col.find({field: rx}, {"_id": 0, "key": 1}).limit(limit).to_list(length=None)
+            return [(int(d["key"]), 1.0) for d in docs if "key" in d]
+        docs = await col.find(
+            {field: rx},
+            {"_id": 0, "group_num": 1, "video_num": 1, "start": 1, "end": 1}
+        ).limit(min(limit, 1000)).to_list(length=None)
+        for d in docs:
+            d["score"] = 1.0
+        return docs
 
-        docs = await col.aggregate(pipeline).to_list(length=None)
-        return [MongoSearchResult(**d) for d in docs]
-    
     async def fts_search(
         self,
         source: Literal['asr', 'ocr'],
@@ -101,87 +313,45 @@ class KeyframeRepository(MongoBaseRepository[Keyframe]):
         - atlas_index: tên index Atlas Search.
         - field_override: override field tìm kiếm (mặc định: asr->'text', ocr->'ocr').
 
-        Thứ tự tìm kiếm:
+        Có index BM25 in-process cho source -> dùng luôn (cùng định dạng kết quả).
+        Backend đã dò bởi probe_fts() được gọi thẳng. Chưa dò thì thử lần lượt:
         1) Atlas Search ($search)
         2) Mongo $text với meta score
         3) Regex fallback (không có score -> 1.0)
         """
-        # Chọn collection & field mặc định
-        if source == 'asr':
-            col = SpeechCaption.get_pymongo_collection()
-            field = field_override or 'text'
-        else:
-            col = Keyframe.get_pymongo_collection()
-            field = field_override or 'ocr'
-
-        # ========== 1) Atlas Search ==========
-        try:
-            if return_type == 'ids':
-                pipeline = [
-                    {"$search": {"index": atlas_index, "text": {"path": field, "query": text}}},
-                    {"$limit": limit},
-                    {"$project": {"_id": 0, "key": 1, "score": {"$meta": "searchScore"}}},
-                ]
-                docs = await col.aggregate(pipeline).to_list(length=None)
-                if docs:
-                    return [(int(d["key"]), float(d["score"])) for d in docs if "key" in d]
-            else:  # segments
-                pipeline = [
-                    {"$search": {"index": atlas_index, "text": {"path": field, "query": text}}},
-                    {"$limit": min(limit, 1000)},  # giữ behavior cũ cho segments
-                    {"$project": {
-                        "_id": 0,
-                        "group_num": 1,
-                        "video_num": 1,
-                        "start": 1,
-                        "end": 1,
-                        "score": {"$meta": "searchScore"},
-                    }},
-                ]
-                docs = await col.aggregate(pipeline).to_list(length=None)
-                if docs:
+        if source in self.fts_indexes and field_override is None:
+            return await self._fts_bm25(source, text, return_type, limit)
+
+        col, field = self._fts_target(source, field_override)
+        probed = self.fts_backends.get(source)
+
+        if probed in (None, 'atlas'):
+            try:
+                docs = await self._fts_atlas(col, field, text, return_type, limit, atlas_index)
+                if docs or probed:
                     return docs
-        except Exception:
-            pass
-
-        # ========== 2) $text meta score ==========
-        try:
-            q = {"$text": {"$search": text}}
-            if return_type == 'ids':
-                proj = {"_id": 0, "key": 1, "score": {"$meta": "textScore"}}
-                cur = col.find(q, proj).sort([("score", {"$meta": "textScore"})]).limit(limit)
-                docs = await cur.to_list(length=None)
-                if docs:
-                    return [(int(d["key"]), float(d["score"])) for d in docs if "key" in d]
-            else:
-                proj = {
-                    "_id": 0,
-                    "group_num": 1,
-                    "video_num": 1,
-                    "start": 1,
-                    "end": 1,
-                    "score": {"$meta": "textScore"},
-                }
-                cur = col.find(q, proj).sort([("score", {"$meta": "textScore"})]).limit(min(limit, 1000))
-                docs = await cur.to_list(length=None)
-                if docs:
+            except Exception as e:
+                if probed:
+                    logger.warning(f"Atlas Search failed for {source} ({e}), falling back")
+
+        if probed in (None, 'atlas', 'text'):
+            try:
+                docs = await self._fts_text(col, text, return_type, limit)
+                if docs or probed == 'text':
                     return docs
-        except Exception:
-            pass
+            except Exception as e:
+                if probed:
+                    logger.warning(f"$text search failed for {source} ({e}), falling back")
 
-        # ========== 3) Regex fallback ==========
-        rx = {"$regex": text, "$options": "i"}
-        if return_type == 'ids':
-            docs = await col.find({field: rx}, {"_id": 0, "key": 1}).limit(limit).to_list(length=None)
-            return [(int(d["key"]), 1.0) for d in docs if "key" in d]
-        else:
-            docs = await col.find(
-                {field: rx},
-                {"_id": 0, "group_num": 1, "video_num": 1, "start": 1, "end": 1}
-            ).limit(min(limit, 1000)).to_list(length=None)
-            for d in docs:
-                d["score"] = 1.0
-            return docs
+        if source == 'ocr' and return_type == 'ids' and self.ocr_trigram is not None and field_override is None:
+            # cùng ngữ nghĩa chuỗi con không phân biệt hoa/thường như $regex, nhưng không quét collection
+            pairs = await self.ocr_trigram_search(text, limit, substring=True)
+            if pairs is not None:
+                return pairs
+
+        if probed not in ('regex', 'trigram'):
+            logger.warning(f"{source} query {text!r} falls through to a $regex scan of {col.name}")
+        return await self._fts_regex(col, field, text, return_type, limit)
 
     async def key_ids_in_time_ranges(
         self,
@@ -193,74 +363,49 @@ class KeyframeRepository(MongoBaseRepository[Keyframe]):
         return ~evenly spaced keyframe keys within these ranges,
         ordered by keyframe_num asc per range (de-duplicated across ranges).
         """
+        if not ranges:
+            return []
+
+        # gộp các range chồng nhau theo video -> ít mệnh đề $or, không đọc trùng doc
+        merged: dict[tuple[int, int], list[list[int]]] = {}
+        for g, v, kfs, kfe in sorted((int(g), int(v), int(s), int(e)) for g, v, s, e in ranges):
+            spans = merged.setdefault((g, v), [])
+            if spans and kfs <= spans[-1][1] + 1:
+                spans[-1][1] = max(spans[-1][1], kfe)
+            else:
+                spans.append([kfs, kfe])
+        clauses = [
+            {"group_num": g, "video_num": v, "keyframe_num": {"$gte": kfs, "$lte": kfe}}
+            for (g, v), spans in merged.items() for kfs, kfe in spans
+        ]
+
+        # vài query song song thay vì 2 round trip / range
         col = Keyframe.get_pymongo_collection()
+        batches = [clauses[i:i + RANGE_QUERY_BATCH] for i in range(0, len(clauses), RANGE_QUERY_BATCH)]
+        results = await asyncio.gather(*(
+            col.find({"$or": batch}, {"_id": 0, "key": 1, "group_num": 1, "video_num": 1, "keyframe_num": 1}).to_list(length=None)
+            for batch in batches
+        ))
+
+        frames: dict[tuple[int, int], list[tuple[int, int]]] = {}
+        for docs in results:
+            for d in docs:
+                frames.setdefault((int(d["group_num"]), int(d["video_num"])), []).append((int(d["keyframe_num"]), int(d["key"])))
+        for rows in frames.values():
+            rows.sort()
+        kf_nums = {gv: [kf for kf, _ in rows] for gv, rows in frames.items()}
+
         out: List[int] = []
         seen = set()
-
         for g, v, kfs, kfe in ranges:
-            q = {
-                "group_num": g,
-                "video_num": v,
-                "keyframe_num": {"$gte": int(kfs), "$lte": int(kfe)}
-            }
-
-            # Đếm trước để chọn số bucket hợp lệ
-            try:
-                n = await col.count_documents(q)
-            except Exception:
-                n = 0
-
-            if n == 0:
+            rows = frames.get((int(g), int(v)))
+            if not rows:
                 continue
-
-            buckets = max(1, min(per_range_limit, n))
-
-            # --- Cách 1: server-side ($bucketAuto) ---
-            try:
-                pipeline = [
-                    {"$match": q},
-                    {"$sort": {"keyframe_num": 1}},
-                    {
-                        "$bucketAuto": {
-                            "groupBy": "$keyframe_num",
-                            "buckets": buckets,
-                            "output": {
-                                "doc": {"$first": "$$ROOT"}  # lấy phần tử đầu của mỗi bucket
-                            },
-                        }
-                    },
-                    {"$replaceRoot": {"newRoot": "$doc"}},
-                    {"$project": {"_id": 0, "key": 1, "keyframe_num": 1}},
-                    {"$sort": {"keyframe_num": 1}},
-                ]
-                docs = await col.aggregate(pipeline).to_list(length=None)
-
-            except Exception:
-                # --- Cách 2: fallback client-side sampling theo linspace ---
-                docs_all = await col.find(
-                    q, {"_id": 0, "key": 1, "keyframe_num": 1}
-                ).sort([("keyframe_num", 1)]).to_list(length=None)
-
-                m = len(docs_all)
-                if m <= per_range_limit:
-                    docs = docs_all
-                else:
-                    # chọn chỉ số cách đều 0..m-1 thành per_range_limit điểm
-                    idxs = [
-                        round(i * (m - 1) / (per_range_limit - 1))
-                        for i in range(per_range_limit)
-                    ]
-                    # loại trùng chỉ số nếu có
-                    seen_idx = set()
-                    docs = []
-                    for ix in idxs:
-                        if ix not in seen_idx:
-                            seen_idx.add(ix)
-                            docs.append(docs_all[ix])
-
+            nums = kf_nums[(int(g), int(v))]
+            in_range = rows[bisect_left(nums, int(kfs)):bisect_right(nums, int(kfe))]
             # Gom kết quả, khử trùng lặp cross-range
-            for d in docs:
-                k = int(d["key"])
+            for ix in evenly_spaced(len(in_range), per_range_limit):
+                k = in_range[ix][1]
                 if k not in seen:
                     seen.add(k)
                     out.append(k)
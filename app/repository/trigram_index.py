@@ -0,0 +1,184 @@
+"""
+Character trigram index over keyframe OCR text for approximate and substring matching,
+built next to the BM25 indexes by migration/fts_migration.py (FTS_INDEX_DIR/ocr_trigram).
+
+Text is lowercased, diacritic-folded and whitespace-collapsed before trigrams are taken, so
+"Hà Nội", "HA NOI" and "ha  noi" index the same. A query's score for a keyframe is the fraction of
+the query's trigrams found in its OCR text (1.0 = every trigram present), which tolerates broken
+words and misread characters; substring mode additionally checks exact containment.
+
+Layout (arrays are memory-mapped):
+    meta.json     doc count, fold flag
+    vocab.json    trigram -> id
+    offsets.npy   (T + 1,) int64
+    docs.npy      (P,) int32       doc ids, ascending within a trigram
+    keys.npy      (N,) int64       keyframe key of each doc
+    text_offsets.npy / text.bin    normalized OCR text of each doc (UTF-8), for substring checks
+"""
+
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+import json
+import math
+import re
+import unicodedata
+from typing import Iterable, Optional
+import numpy as np
+
+from repository.bm25_index import fold_diacritics
+
+
+def normalize_ocr(text: str, fold: bool = True) -> str:
+    text = unicodedata.normalize('NFC', text or '').lower()
+    if fold:
+        text = fold_diacritics(text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    def __init__(
+        self,
+        vocab: dict[str, int],
+        offsets: np.ndarray,
+        docs: np.ndarray,
+        keys: np.ndarray,
+        text_offsets: np.ndarray,
+        text: np.ndarray,
+        meta: dict,
+    ):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.keys = keys
+        self.text_offsets = text_offsets
+        self.text = text
+        self.meta = meta
+        self.fold = bool(meta.get('fold', True))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, keys: Iterable[int], texts: Iterable[str], fold: bool = True) -> 'TrigramIndex':
+        postings: dict[str, list[int]] = {}
+        key_list, blobs = [], []
+        for doc_id, (key, text) in enumerate(zip(keys, texts)):
+            norm = normalize_ocr(text, fold)
+            key_list.append(int(key))
+            blobs.append(norm.encode('utf-8'))
+            for gram in trigrams(norm):
+                postings.setdefault(gram, []).append(doc_id)
+
+        grams = sorted(postings)
+        offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[g]) for g in grams])
+        docs = np.fromiter((d for g in grams for d in postings[g]), dtype=np.int32, count=int(offsets[-1]))
+        text_offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+        text_offsets[1:] = np.cumsum([len(b) for b in blobs])
+
+        return cls(
+            vocab={g: i for i, g in enumerate(grams)},
+            offsets=offsets,
+            docs=docs,
+            keys=np.asarray(key_list, dtype=np.int64),
+            text_offsets=text_offsets,
+            text=np.frombuffer(b''.join(blobs), dtype=np.uint8),
+            meta={'fold': fold, 'num_docs': len(key_list), 'num_trigrams': len(grams)},
+        )
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name, arr in (
+            ('offsets', self.offsets),
+            ('docs', self.docs),
+            ('keys', self.keys),
+            ('text_offsets', self.text_offsets),
+            ('text', self.text),
+        ):
+            tmp_path = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp_path, np.ascontiguousarray(arr))
+            os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+        for name, obj in (('vocab', self.vocab), ('meta', self.meta)):
+            tmp_path = os.path.join(path, f"{name}.json.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(obj, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(path, f"{name}.json"))
+
+    @classmethod
+    def load(cls, path: str) -> 'TrigramIndex':
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(path, 'vocab.json'), encoding='utf-8') as f:
+            vocab = json.load(f)
+
+        def array(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+
+        return cls(vocab, array('offsets'), array('docs'), array('keys'), array('text_offsets'), array('text'), meta)
+
+    @staticmethod
+    def exists(path: Optional[str]) -> bool:
+        return bool(path) and os.path.exists(os.path.join(path, 'meta.json'))
+
+    def doc_text(self, doc_id: int) -> str:
+        lo, hi = int(self.text_offsets[doc_id]), int(self.text_offsets[doc_id + 1])
+        return bytes(self.text[lo:hi]).decode('utf-8')
+
+    def accepts(self, text: str) -> bool:
+        """False for queries shorter than 3 normalized characters ("TV", "A1"): they have no trigrams."""
+        return bool(trigrams(normalize_ocr(text, self.fold)))
+
+    def search(self, text: str, limit: int, threshold: float = 0.5, substring: bool = False) -> list[tuple[int, float]]:
+        """
+        [(keyframe key, score)] best first. score = fraction of the query's trigrams present in the OCR text;
+        only keyframes with score >= threshold are returned. substring=True keeps only exact
+        (normalized) substring matches. Queries shorter than 3 characters have no trigrams and return [].
+        """
+        query = normalize_ocr(text, self.fold)
+        grams = trigrams(query)
+        if not grams or limit <= 0:
+            return []
+
+        ids = [self.vocab[g] for g in grams if g in self.vocab]
+        # số trigram tối thiểu phải khớp để đạt ngưỡng
+        need = len(grams) if substring else max(1, math.ceil(threshold * len(grams) - 1e-9))
+        if len(ids) < need:
+            return []
+
+        postings = np.concatenate([self.docs[self.offsets[t]:self.offsets[t + 1]] for t in ids])
+        cand, counts = np.unique(postings, return_counts=True)
+        keep = counts >= need
+        cand, scores = cand[keep], counts[keep].astype(np.float32) / len(grams)
+
+        # nhiều trigram khớp trước; hoà thì doc ngắn hơn (ít nhiễu hơn) lên trước
+        lengths = self.text_offsets[cand + 1] - self.text_offsets[cand]
+        order = np.lexsort((lengths, -scores))
+        cand, scores = cand[order], scores[order]
+
+        if substring:
+            out = []
+            for d, s in zip(cand.tolist(), scores.tolist()):
+                if query in self.doc_text(d):
+                    out.append((int(self.keys[d]), s))
+                    if len(out) >= limit:
+                        break
+            return out
+        return [(int(self.keys[d]), float(s)) for d, s in zip(cand[:limit].tolist(), scores[:limit].tolist())]
+
+    def stats(self) -> dict:
+        return {
+            'docs': int(self.meta.get('num_docs', len(self))),
+            'trigrams': int(self.meta.get('num_trigrams', len(self.vocab))),
+            'fold': self.fold,
+        }
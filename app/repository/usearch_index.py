@@ -0,0 +1,183 @@
+"""
+In-process vector repository backed by a memory-mapped usearch index file.
+Drop-in replacement for KeyframeVectorRepository on single-node deployments (no etcd/minio/milvus).
+"""
+
+
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+from typing import Optional
+import numpy as np
+from usearch.index import Index
+from common.repository import VectorBaseRepository
+from common.executor import BoundedExecutor
+from common.exclusion import ExclusionSet, merge_exclusions
+from repository.embedding_store import EmbeddingStore, rerank_hits
+from repository.keyframe_meta import KeyframeMetaTable
+from schema.interface import MilvusSearchRequest, MilvusBatchSearchRequest, MilvusSearchResult, MilvusSearchResponse
+from schema.request import ImageSearchRequest
+
+
+# Milvus METRIC_TYPE -> usearch metric
+USEARCH_METRICS = {
+    'COSINE': 'cos',
+    'IP': 'ip',
+    'L2': 'l2sq',
+}
+
+
+class KeyframeUsearchRepository(VectorBaseRepository):
+    def __init__(
+        self,
+        index_path: str,
+        metric_type: str = 'COSINE',
+        executor: Optional[BoundedExecutor] = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+        rerank_k: int = 0,
+        keyframe_meta: Optional[KeyframeMetaTable] = None
+    ):
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"usearch index not found: {index_path}")
+
+        # view=True -> memory-map file, các worker dùng chung page cache
+        self.index = Index.restore(index_path, view=True)
+        if self.index is None:
+            raise ValueError(f"Invalid usearch index file: {index_path}")
+
+        self.index_path = index_path
+        self.metric_type = metric_type
+        self.executor = executor or BoundedExecutor(name="usearch-search")
+        self.embedding_store = embedding_store
+        # index lượng tử hoá (f16/i8): chấm lại rerank_k ứng viên bằng vector float32 gốc
+        self.rerank_k = rerank_k if embedding_store is not None else 0
+        # usearch không có scalar field -> lọc group/video bằng bảng metadata trong RAM
+        self.keyframe_meta = keyframe_meta
+        self.supports_video_filter = keyframe_meta is not None
+
+    def _to_score(self, distances: np.ndarray) -> np.ndarray:
+        # usearch trả distance (nhỏ = giống); quy về similarity giống Milvus (lớn = giống)
+        if self.metric_type == 'L2':
+            return -distances
+        return 1.0 - distances
+
+    def _search(
+        self,
+        embeddings: np.ndarray,
+        limit: int,
+        exclusion: Optional[ExclusionSet] = None,
+        scope: Optional[tuple] = None,
+    ) -> list[list[MilvusSearchResult]]:
+        total = len(self.index)
+        if total == 0:
+            return [[] for _ in range(len(embeddings))]
+
+        # có exclusion/scope -> lấy dư rồi lọc, tăng gấp đôi khi chưa đủ (giống repo Milvus)
+        filtered = exclusion is not None or scope is not None
+        count = min(total, limit * 2 if filtered else limit)
+        while True:
+            matches = self.index.search(embeddings, count)
+
+            keys = np.atleast_2d(matches.keys)
+            scores = np.atleast_2d(self._to_score(matches.distances))
+            counts = np.atleast_1d(matches.counts) if hasattr(matches, 'counts') else np.array([keys.shape[1]])
+
+            out = []
+            exhausted = True
+            for row_keys, row_scores, n in zip(keys, scores, counts):
+                row_keys, row_scores = row_keys[:n].astype(np.int64), row_scores[:n]
+                if filtered:
+                    keep = np.ones(len(row_keys), dtype=bool)
+                    if exclusion is not None:
+                        keep &= exclusion.keep_mask(row_keys)
+                    if scope is not None:
+                        keep &= self.keyframe_meta.keys_in_scope(row_keys, *scope)
+                    row_keys, row_scores = row_keys[keep], row_scores[keep]
+                    if len(row_keys) < limit and n >= count and count < total:
+                        exhausted = False
+                out.append([
+                    MilvusSearchResult(id_=int(k), distance=float(sc))
+                    for k, sc in zip(row_keys[:limit], row_scores[:limit])
+                ])
+            if exhausted:
+                return out
+            count = min(total, count * 2)
+
+    def _search_reranked(
+        self,
+        embeddings: np.ndarray,
+        limit: int,
+        exclusion: Optional[ExclusionSet] = None,
+        scope: Optional[tuple] = None,
+    ) -> list[list[MilvusSearchResult]]:
+        if self.rerank_k <= 0:
+            return self._search(embeddings, limit, exclusion, scope)
+
+        rows = self._search(embeddings, max(limit, self.rerank_k), exclusion, scope)
+        return [
+            [MilvusSearchResult(id_=i, distance=score) for i, score in
+             rerank_hits(self.embedding_store, query, [int(h.id_) for h in hits], limit, self.metric_type)]
+            for query, hits in zip(embeddings, rows)
+        ]
+
+    def _scope(self, request) -> Optional[tuple]:
+        if not self.supports_video_filter or not (request.group_nums or request.video_nums):
+            return None
+        return (request.group_nums, request.video_nums)
+
+    async def search_by_embedding(
+        self,
+        request: MilvusSearchRequest
+    ):
+        query = np.asarray([request.embedding], dtype=np.float32)
+        exclusion = merge_exclusions(request.exclusion, request.exclude_ids)
+        rows = await self.executor.run(self._search_reranked, query, request.top_k, exclusion, self._scope(request))
+        return MilvusSearchResponse(results=rows[0], total_found=len(rows[0]))
+
+    async def search_by_embeddings(
+        self,
+        request: MilvusBatchSearchRequest
+    ) -> list[MilvusSearchResponse]:
+        queries = np.asarray(request.embeddings, dtype=np.float32)
+        exclusion = merge_exclusions(request.exclusion, request.exclude_ids)
+        rows = await self.executor.run(self._search_reranked, queries, request.top_k, exclusion, self._scope(request))
+        return [MilvusSearchResponse(results=r, total_found=len(r)) for r in rows]
+
+    async def search_similar(
+        self,
+        imgid: int,
+        top_k: int,
+        exclude_ids: Optional[list[int]] = None,
+        exclusion: Optional[ExclusionSet] = None,
+    ) -> MilvusSearchResponse:
+        if not self.index.contains(imgid):
+            return MilvusSearchResponse(results=[], total_found=0)
+
+        # vector trong index có thể đã lượng tử hoá -> ưu tiên bản float32 trong embedding store
+        stored = self.embedding_store.get(imgid) if self.embedding_store is not None else None
+        query_emb = np.asarray(stored if stored is not None else self.index.get(imgid), dtype=np.float32).reshape(1, -1)
+        excludes = merge_exclusions(exclusion, list(exclude_ids or []) + [imgid])
+        rows = await self.executor.run(self._search_reranked, query_emb, top_k, excludes)
+        return MilvusSearchResponse(results=rows[0], total_found=len(rows[0]))
+
+    def get_total(self):
+        return len(self.index)
+
+    def get_search_stats(self):
+        return self.executor.stats()
+
+    async def search_by_img_id(
+        self,
+        search_request: ImageSearchRequest,
+        exclude_ids: Optional[list[int]] = None,
+    ):
+        skip = (search_request.page - 1) * search_request.size
+        res = await self.search_similar(search_request.imgid, skip + search_request.size, exclude_ids)
+        results = res.results[skip:]
+        return MilvusSearchResponse(results=results, total_found=len(results))
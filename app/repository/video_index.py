@@ -0,0 +1,177 @@
+"""
+Video-level index for coarse-to-fine search: one mean-pooled, L2-normalized embedding per
+(group_num, video_num), plus the keyframe keys of every video. A query first ranks the videos
+(a single (V, dim) matrix product), then only the keyframes of the top videos are scored.
+Built by embedding_migration.py (or at startup from the embedding store + keyframe metadata)
+and saved as one .npz file.
+"""
+
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+from typing import Optional
+import numpy as np
+
+from common.executor import BoundedExecutor
+from common.exclusion import ExclusionSet
+from repository.embedding_store import EmbeddingStore, rerank_hits
+
+
+def l2_normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norms == 0, 1.0, norms)
+
+
+class VideoIndex:
+    def __init__(
+        self,
+        group_nums: np.ndarray,
+        video_nums: np.ndarray,
+        vectors: np.ndarray,
+        offsets: np.ndarray,
+        keys: np.ndarray,
+    ):
+        self.group_nums = np.asarray(group_nums, dtype=np.int32)
+        self.video_nums = np.asarray(video_nums, dtype=np.int32)
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        # keyframe của video i: keys[offsets[i]:offsets[i + 1]]
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.keys = np.asarray(keys, dtype=np.int64)
+
+        self.embedding_store: Optional[EmbeddingStore] = None
+        self.metric_type = 'COSINE'
+        self.executor: Optional[BoundedExecutor] = None
+
+    def __len__(self) -> int:
+        return len(self.group_nums)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def attach(self, embedding_store: Optional[EmbeddingStore], metric_type: str = 'COSINE', executor: Optional[BoundedExecutor] = None) -> 'VideoIndex':
+        """Keyframe vectors for the fine stage; without a store only the video ranking is available."""
+        self.embedding_store = embedding_store
+        self.metric_type = metric_type
+        self.executor = executor
+        return self
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        keys: np.ndarray,
+        group_nums: np.ndarray,
+        video_nums: np.ndarray,
+        batch_size: int = 10000,
+    ) -> 'VideoIndex':
+        """Mean-pool the normalized keyframe embeddings (row of `keys[i]` in `embeddings`) per video."""
+        keys = np.asarray(keys, dtype=np.int64)
+        group_nums = np.asarray(group_nums, dtype=np.int64)
+        video_nums = np.asarray(video_nums, dtype=np.int64)
+        valid = (keys >= 0) & (keys < embeddings.shape[0]) & (group_nums >= 0) & (video_nums >= 0)
+        keys, group_nums, video_nums = keys[valid], group_nums[valid], video_nums[valid]
+
+        order = np.lexsort((keys, video_nums, group_nums))
+        keys, group_nums, video_nums = keys[order], group_nums[order], video_nums[order]
+        if len(keys):
+            starts = np.flatnonzero(np.r_[True, (group_nums[1:] != group_nums[:-1]) | (video_nums[1:] != video_nums[:-1])])
+        else:
+            starts = np.empty(0, dtype=np.int64)
+        offsets = np.r_[starts, len(keys)]
+
+        # cộng dồn theo batch -> không cần nạp cả ma trận (có thể là memmap) vào RAM
+        sums = np.zeros((len(starts), embeddings.shape[1]), dtype=np.float64)
+        video_of_row = np.repeat(np.arange(len(starts)), np.diff(offsets))
+        for i in range(0, len(keys), batch_size):
+            batch = l2_normalize(np.asarray(embeddings[keys[i:i + batch_size]], dtype=np.float32))
+            np.add.at(sums, video_of_row[i:i + batch_size], batch)
+
+        return cls(
+            group_nums=group_nums[starts],
+            video_nums=video_nums[starts],
+            vectors=l2_normalize(sums.astype(np.float32)),
+            offsets=offsets,
+            keys=keys,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'VideoIndex':
+        with np.load(path) as data:
+            return cls(data['group_nums'], data['video_nums'], data['vectors'], data['offsets'], data['keys'])
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            group_nums=self.group_nums,
+            video_nums=self.video_nums,
+            vectors=self.vectors,
+            offsets=self.offsets,
+            keys=self.keys,
+        )
+        os.replace(tmp_path, path)
+
+    def search_videos(self, embedding, top_m: int) -> list[tuple[int, int, float]]:
+        """[(group_num, video_num, cosine score)] of the `top_m` closest videos, best first."""
+        if len(self) == 0 or top_m <= 0:
+            return []
+        q = l2_normalize(np.asarray(embedding, dtype=np.float32).reshape(-1))
+        scores = self.vectors @ q
+        top_m = min(top_m, len(scores))
+        top = np.argpartition(-scores, top_m - 1)[:top_m]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(self.group_nums[i]), int(self.video_nums[i]), float(scores[i])) for i in top]
+
+    def video_positions(self, videos: list[tuple[int, int]]) -> np.ndarray:
+        wanted = set(videos)
+        return np.asarray(
+            [i for i, gv in enumerate(zip(self.group_nums.tolist(), self.video_nums.tolist())) if gv in wanted],
+            dtype=np.int64,
+        )
+
+    def keys_of(self, videos: list[tuple[int, int]]) -> np.ndarray:
+        pos = self.video_positions(videos)
+        if not len(pos):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.keys[self.offsets[i]:self.offsets[i + 1]] for i in pos])
+
+    def _search_keyframes(
+        self,
+        embedding,
+        videos: list[tuple[int, int]],
+        top_k: int,
+        exclusion: Optional[ExclusionSet] = None,
+    ) -> list[tuple[int, float]]:
+        keys = self.keys_of(videos)
+        if exclusion is not None and len(keys):
+            keys = keys[exclusion.keep_mask(keys)]
+        return rerank_hits(self.embedding_store, embedding, keys.tolist(), top_k, self.metric_type)
+
+    async def search_keyframes(
+        self,
+        embedding,
+        videos: list[tuple[int, int]],
+        top_k: int,
+        exclusion: Optional[ExclusionSet] = None,
+    ) -> list[tuple[int, float]]:
+        """Exact search restricted to the keyframes of `videos`: [(key, score)], best first."""
+        if self.embedding_store is None:
+            raise ValueError("Keyframe search needs an embedding store")
+        if self.executor is None:
+            return self._search_keyframes(embedding, videos, top_k, exclusion)
+        return await self.executor.run(self._search_keyframes, embedding, videos, top_k, exclusion)
+
+    def stats(self) -> dict:
+        return {
+            'videos': len(self),
+            'keyframes': int(len(self.keys)),
+            'fine_search': 'exact' if self.embedding_store is not None else 'ann_filtered',
+        }
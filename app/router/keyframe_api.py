@@ -1,5 +1,5 @@
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, HTTPException, UploadFile, File
 from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.encoders import jsonable_encoder
 from pathlib import Path
@@ -7,11 +7,15 @@ from typing import Annotated
 
 from schema.request import (
     ImageSearchRequest,
-    UnifiedSearchRequest
+    UnifiedSearchRequest,
+    BatchSearchRequest,
+    ExclusionUpdateRequest
 )
 from controller.query_controller import QueryController
-from core.dependencies import get_query_controller
+from core.dependencies import get_query_controller, get_milvus_repository, get_keyframe_service, get_model_service, get_text_encoder, get_translate_service, get_service_factory, get_image_encoder, get_inference_settings, check_mongodb_health
 from core.logger import SimpleLogger
+from core.settings import InferenceSettings
+from PIL import Image, UnidentifiedImageError
 
 
 logger = SimpleLogger(__name__)
@@ -25,6 +29,48 @@ from core.view import templates
 
 PLACEHOLDER = Path(__file__).resolve().parents[1] / "static/images/404.jpg"
 
+@router.get('/health')
+async def health(
+    request: Request,
+    repository = Depends(get_milvus_repository),
+    keyframe_service = Depends(get_keyframe_service),
+    model_service = Depends(get_model_service),
+    text_encoder = Depends(get_text_encoder),
+    translate_service = Depends(get_translate_service),
+    service_factory = Depends(get_service_factory),
+    image_encoder = Depends(get_image_encoder),
+):
+    mongo_ok = await check_mongodb_health(request)
+    return {
+        'status': 'healthy' if mongo_ok else 'degraded',
+        'mongodb': mongo_ok,
+        'vector_search': repository.get_search_stats(),
+        'caches': {
+            'result_sets': keyframe_service.result_sets.stats(),
+            'exclusion_sessions': keyframe_service.exclusions.stats(),
+            'unified_queries': keyframe_service.query_cache.stats(),
+            'text_embeddings': model_service.embedding_cache.stats() if model_service.embedding_cache else None,
+        },
+        'text_encoder': text_encoder.stats(),
+        'inference': service_factory.get_inference_stats(),
+        'translation': translate_service.stats(),
+        'image_encoder': image_encoder.stats(),
+        'extra_models': {m.name: m.stats() for m in service_factory.get_extra_models()},
+        'video_index': {
+            **keyframe_service.video_index.stats(),
+            'coarse_top_videos': keyframe_service.coarse_top_videos,
+        } if keyframe_service.video_index is not None else None,
+        'data_version': keyframe_service.data_version.version,
+        'fts': keyframe_service.keyframe_mongo_repo.fts_backends,
+        'fts_indexes': {s: ix.stats() for s, ix in keyframe_service.keyframe_mongo_repo.fts_indexes.items()},
+        'ocr_trigram': keyframe_service.keyframe_mongo_repo.ocr_trigram.stats() if keyframe_service.keyframe_mongo_repo.ocr_trigram is not None else None,
+    }
+
+@router.delete('/cache')
+async def clear_caches(controller: QueryController = Depends(get_query_controller)):
+    # xoá thủ công sau khi nạp lại dữ liệu mà không qua migration script
+    return controller.clear_caches()
+
 @router.get('/get_img')
 async def get_img(fpath: str):
     p = Path(fpath)
@@ -64,4 +110,56 @@ async def unified_search_api(
     controller: QueryController = Depends(get_query_controller),
 ):
     results = await controller.unified_search(search_request)
-    return jsonable_encoder(results)
\ No newline at end of file
+    return jsonable_encoder(results)
+
+async def read_uploads(files: list[UploadFile], settings: InferenceSettings) -> list[bytes]:
+    if not files:
+        raise HTTPException(status_code=400, detail="No image uploaded")
+    if len(files) > settings.IMAGE_UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {settings.IMAGE_UPLOAD_MAX_FILES} images per query")
+    images = []
+    for f in files:
+        # đọc tối đa MAX_BYTES + 1 để phát hiện file quá lớn mà không nạp hết vào RAM
+        data = await f.read(settings.IMAGE_UPLOAD_MAX_BYTES + 1)
+        if len(data) > settings.IMAGE_UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"{f.filename} exceeds {settings.IMAGE_UPLOAD_MAX_BYTES} bytes")
+        if not data:
+            raise HTTPException(status_code=400, detail=f"{f.filename} is empty")
+        images.append(data)
+    return images
+
+@router.post('/search/image', name='keyframe_image_upload_search_api')
+async def image_upload_search_api(
+    search_request: Annotated[UnifiedSearchRequest, Depends()],
+    files: list[UploadFile] = File(..., description="Query images (multipart)"),
+    controller: QueryController = Depends(get_query_controller),
+    settings: InferenceSettings = Depends(get_inference_settings),
+):
+    if not controller.image_encoder.available:
+        raise HTTPException(status_code=503, detail="Image encoding is disabled (text-only encoder loaded)")
+    images = await read_uploads(files, settings)
+    try:
+        results = await controller.upload_image_search(images, search_request)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise HTTPException(status_code=400, detail=f"Unsupported image: {e}")
+    return jsonable_encoder(results)
+
+@router.post('/search/batch', name='keyframe_batch_search_api')
+async def batch_search_api(
+    search_request: BatchSearchRequest,
+    controller: QueryController = Depends(get_query_controller),
+):
+    results = await controller.batch_search(search_request)
+    return jsonable_encoder(results)
+
+@router.post('/exclusions/{session_id}')
+async def add_exclusions(session_id: str, body: ExclusionUpdateRequest, controller: QueryController = Depends(get_query_controller)):
+    return controller.add_exclusions(session_id, body)
+
+@router.post('/exclusions/{session_id}/remove')
+async def remove_exclusions(session_id: str, body: ExclusionUpdateRequest, controller: QueryController = Depends(get_query_controller)):
+    return controller.remove_exclusions(session_id, body)
+
+@router.delete('/exclusions/{session_id}')
+async def clear_exclusions(session_id: str, controller: QueryController = Depends(get_query_controller)):
+    return controller.clear_exclusions(session_id)
\ No newline at end of file
@@ -1,5 +1,9 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional
+from common.exclusion import ExclusionSet
+
+# top_k tối đa của một lần tìm vector (mỗi query)
+MAX_SEARCH_DEPTH = 5000
 
 class MongoSearchResult(BaseModel):
     key: int = Field(..., description="Keyframe key")
@@ -17,9 +21,25 @@ class MongoSearchRequest(BaseModel):
     size: int | None = None
 
 class MilvusSearchRequest(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     embedding: List[float] = Field(..., description="Query embedding vector")
-    top_k: int = Field(default=10, ge=1, le=5000, description="Number of top results to return")
+    top_k: int = Field(default=10, ge=1, le=MAX_SEARCH_DEPTH, description="Number of top results to return")
     exclude_ids: Optional[List[int]] = Field(default=None, description="IDs to exclude from search results")
+    exclusion: Optional[ExclusionSet] = Field(default=None, exclude=True, description="Server-side exclusion bitset (session)")
+    group_nums: Optional[List[int]] = Field(default=None, description="Restrict hits to these groups (pushed into the ANN call when supported)")
+    video_nums: Optional[List[int]] = Field(default=None, description="Restrict hits to these videos, paired with group_nums")
+
+
+class MilvusBatchSearchRequest(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    embeddings: List[List[float]] = Field(..., min_length=1, description="Query embedding vectors, searched in one round trip")
+    top_k: int = Field(default=10, ge=1, le=MAX_SEARCH_DEPTH, description="Number of top results to return per query")
+    exclude_ids: Optional[List[int]] = Field(default=None, description="IDs to exclude from every result list")
+    exclusion: Optional[ExclusionSet] = Field(default=None, exclude=True, description="Server-side exclusion bitset (session)")
+    group_nums: Optional[List[int]] = Field(default=None, description="Restrict hits to these groups (pushed into the ANN call when supported)")
+    video_nums: Optional[List[int]] = Field(default=None, description="Restrict hits to these videos, paired with group_nums")
 
 
 class MilvusSearchResult(BaseModel):
@@ -12,11 +12,36 @@ class ObjFilter(BaseModel):
 class BaseSearchRequest(BaseModel):
     """Base search request with common parameters"""
     size: int = Field(default=100, ge=1, le=500, description="Number of top results to return")
-    page: int = Field(default=1, description='Page number')
+    page: int = Field(default=1, ge=1, description='Page number')
+    cursor: str | None = Field(default=None, description='Opaque cursor returned by the first page; later pages are sliced from the cached result set')
+    exclusion_session: str | None = Field(default=None, max_length=128, description='Server-side exclusion set to apply (see /keyframe/exclusions)')
    
 class ImageSearchRequest(BaseSearchRequest):
     imgid: int
     
+class ExclusionUpdateRequest(BaseModel):
+    ids: List[int] = Field(default_factory=list, description="Keyframe ids to add to / remove from the session exclusion set")
+
+class BatchSearchRequest(BaseSearchRequest):
+    # nhiều cách diễn đạt cho cùng một sự kiện -> một lần gọi Milvus
+    queries: List[str] = Field(..., min_length=1, max_length=64)
+    exclude_ids: Optional[List[int]] = None
+
+    @field_validator("queries")
+    @classmethod
+    def strip_queries(cls, v):
+        v = [q.strip() for q in v if q and q.strip()]
+        if not v:
+            raise ValueError("queries must contain at least one non-empty string")
+        return v
+
+    @field_validator("exclude_ids", mode="before")
+    @classmethod
+    def ensure_list_defaults(cls, v):
+        if v is None or v is PydanticUndefined:
+            return []
+        return v
+
 class UnifiedSearchRequest(BaseSearchRequest):
     # vector text
     query: str | None = Field(None, min_length=1, max_length=1000)
@@ -24,6 +49,8 @@ class UnifiedSearchRequest(BaseSearchRequest):
     # full-text search trên Mongo (ASR/OCR)
     asr: str | None = None
     ocr: str | None = None
+    # OCR: 'fts' (full-text), 'fuzzy' (trigram gần đúng, chịu lỗi OCR), 'substring' (chuỗi con)
+    ocr_mode: Literal['fts', 'fuzzy', 'substring'] = 'fts'
 
     # object filters
     obj_filters: Optional[List[ObjFilter]] = None
@@ -37,6 +64,10 @@ class UnifiedSearchRequest(BaseSearchRequest):
     w_vec: float = 1.0     # weight vector ANN
     w_asr: float = 1.0     # weight FTS ASR
     w_ocr: float = 0.5     # weight FTS OCR
+    # trọng số model phụ (EXTRA_MODELS): ?model_weights=siglip:0.8,eva:0 ; không nêu -> weight mặc định của model
+    model_weights: Optional[List[str]] = None
+    # coarse-to-fine: chỉ tìm keyframe trong N video gần nhất; None -> COARSE_TOP_VIDEOS, 0 -> tắt
+    coarse_videos: Optional[int] = Field(None, ge=0, le=1000)
 
     # Cho phép nhận obj_filters từ query ?obj_filters=a:gte:2,b:eq:1
     @field_validator("obj_filters", mode="before")
@@ -64,6 +95,28 @@ class UnifiedSearchRequest(BaseSearchRequest):
             out.append({"name": name, "cmp": cmp_.lower(), "count": int(cnt)})
         return out
 
+    @field_validator("model_weights", mode="before")
+    @classmethod
+    def parse_model_weights(cls, v):
+        if v is None or v is PydanticUndefined:
+            return []
+        toks: list[str] = []
+        for s in (v if isinstance(v, (list, tuple)) else [v]):
+            toks += [t.strip() for t in str(s).split(",") if t.strip()]
+        for t in toks:
+            name, sep, weight = t.partition(":")
+            if not sep or not name:
+                raise ValueError(f"Invalid '{t}', expected name:weight")
+            float(weight)
+        return toks
+
+    def model_weight_map(self) -> dict[str, float]:
+        out: dict[str, float] = {}
+        for t in self.model_weights or []:
+            name, _, weight = t.partition(":")
+            out[name] = float(weight)
+        return out
+
     @field_validator("exclude_ids", "group_nums", "video_nums", mode="before")
     @classmethod
     def ensure_list_defaults(cls, v):
@@ -7,4 +7,9 @@ class KeyframeServiceReponse(BaseModel):
         
 class KeyframeDisplay(BaseModel):
     total_page: int
-    results: list[KeyframeServiceReponse]
\ No newline at end of file
+    results: list[KeyframeServiceReponse]
+    cursor: str | None = None
+
+class KeyframeBatchDisplay(BaseModel):
+    total_page: int
+    results: list[list[KeyframeServiceReponse]]  # một danh sách kết quả cho mỗi query
\ No newline at end of file
@@ -1,3 +1,6 @@
 from .model_service import ModelService
 from .search_service import KeyframeQueryService
 from .translator_service import TranslationService
+from .encode_batcher import TextEncodeBatcher
+from .image_encoder import ImageEncoder
+from .embedding_model import EmbeddingModel
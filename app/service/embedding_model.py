@@ -0,0 +1,52 @@
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+from typing import Any
+
+from common.executor import BoundedExecutor
+from common.repository import VectorBaseRepository
+from service.model_service import ModelService
+from service.encode_batcher import TextEncodeBatcher
+
+
+class EmbeddingModel:
+    """
+    An additional (CLIP model, vector collection) pair. Queries are encoded with its own model and
+    searched in its own index; the ranking is fused into unified search as an extra RRF signal.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model_service: ModelService,
+        text_encoder: TextEncodeBatcher,
+        vector_repo: VectorBaseRepository,
+        inference_executor: BoundedExecutor,
+        weight: float = 1.0,
+    ):
+        self.name = name
+        self.model_service = model_service
+        self.text_encoder = text_encoder
+        self.vector_repo = vector_repo
+        self.inference_executor = inference_executor
+        self.weight = weight
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'weight': self.weight,
+            'text_encoder': self.text_encoder.stats(),
+            'inference': self.inference_executor.stats(),
+            'text_embeddings': self.model_service.embedding_cache.stats() if self.model_service.embedding_cache else None,
+        }
+
+    def shutdown(self) -> None:
+        self.text_encoder.stop()
+        self.inference_executor.shutdown()
+        if self.model_service.embedding_cache is not None:
+            self.model_service.embedding_cache.close()
@@ -0,0 +1,179 @@
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+import asyncio
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional
+import numpy as np
+
+from service.model_service import ModelService
+
+# cận trên của các bucket histogram kích thước batch
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+async def run_inline(fn: Callable[..., Any], *args) -> Any:
+    return fn(*args)
+
+
+class TextEncodeBatcher:
+    """
+    Async front-end for ModelService: concurrent encode requests are collected for up to
+    `max_wait_ms` (or `max_batch` texts) and encoded in one forward pass, then each caller's
+    future is resolved. Texts in the in-memory cache never enter the queue; the disk tier is read
+    by the runner, off the event loop, before the forward pass.
+    """
+
+    def __init__(
+        self,
+        model_service: ModelService,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        runner: Optional[Callable[..., Awaitable[Any]]] = None,
+    ):
+        self.model_service = model_service
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        # runner(fn, *args): chỗ chạy forward pass (mặc định chạy trực tiếp)
+        self.runner = runner or run_inline
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+        self.histogram = {b: 0 for b in BATCH_SIZE_BUCKETS}
+        self.histogram_overflow = 0
+        self.total_wait_ms = 0.0
+        self.total_encode_ms = 0.0
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        return self._queue
+
+    async def embedding(self, query_text: str) -> np.ndarray:
+        """Return (1, ndim) np.ndarray, like ModelService.embedding."""
+        return await self.embeddings([query_text])
+
+    async def embeddings(self, query_texts: list[str]) -> np.ndarray:
+        """Return (n, ndim) np.ndarray, like ModelService.embeddings."""
+        # chỉ tra cache RAM trên event loop; tầng SQLite đọc cùng forward pass trong runner
+        cached = self.model_service.cached_embeddings(query_texts, disk=False)
+        missing = [i for i, v in enumerate(cached) if v is None]
+        if missing:
+            queue = self._ensure_worker()
+            loop = asyncio.get_running_loop()
+            futures = {}
+            for i in missing:
+                text = query_texts[i]
+                if text not in futures:
+                    futures[text] = loop.create_future()
+                    queue.put_nowait((text, futures[text], time.perf_counter()))
+            encoded = dict(zip(futures, await asyncio.gather(*futures.values())))
+            for i in missing:
+                cached[i] = encoded[query_texts[i]]
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    async def _collect(self, queue: asyncio.Queue) -> list[tuple]:
+        batch = [await queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            # lấy hết phần đang chờ sẵn, sau đó mới đợi thêm tới deadline
+            if not queue.empty():
+                batch.append(queue.get_nowait())
+                continue
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        queue = self._queue
+        batch: list[tuple] = []
+        try:
+            while True:
+                batch = await self._collect(queue)
+                await self._encode_batch(batch)
+                batch = []
+        finally:
+            # worker dừng (stop(), loop đóng) -> huỷ cả batch dở lẫn phần còn trong queue, không để caller treo
+            self._cancel_pending(queue, batch)
+
+    @staticmethod
+    def _cancel_pending(queue: asyncio.Queue, batch: Optional[list[tuple]] = None) -> None:
+        pending = list(batch or [])
+        while not queue.empty():
+            pending.append(queue.get_nowait())
+        for _, fut, _ in pending:
+            if not fut.done():
+                fut.cancel()
+
+    async def _encode_batch(self, batch: list[tuple]) -> None:
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        started = time.perf_counter()
+        try:
+            encoded = await self.runner(partial(self.model_service.embeddings, memory=False), texts)
+            by_text = dict(zip(texts, encoded))
+            if len(by_text) != len(texts):
+                raise RuntimeError(f"Encoder returned {len(encoded)} embeddings for {len(texts)} texts")
+        except Exception as e:
+            # lỗi chỉ làm hỏng batch này, worker vẫn chạy tiếp
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finished = time.perf_counter()
+
+        self.requests += len(batch)
+        for text, fut, enqueued in batch:
+            self.total_wait_ms += (started - enqueued) * 1000
+            if not fut.done():
+                fut.set_result(by_text[text])
+        self._record(len(texts), (finished - started) * 1000)
+
+    def _record(self, size: int, encode_ms: float) -> None:
+        self.batches += 1
+        self.items += size
+        self.total_encode_ms += encode_ms
+        for bound in BATCH_SIZE_BUCKETS:
+            if size <= bound:
+                self.histogram[bound] += 1
+                return
+        self.histogram_overflow += 1
+
+    def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        # task bị huỷ trước khi kịp chạy thì không vào finally của _run
+        if self._queue is not None:
+            self._cancel_pending(self._queue)
+
+    def stats(self) -> dict[str, Any]:
+        histogram = {f"<={b}": n for b, n in self.histogram.items()}
+        histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] = self.histogram_overflow
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "mean_queue_wait_ms": round(self.total_wait_ms / self.requests, 3) if self.requests else 0.0,
+            "mean_encode_ms": round(self.total_encode_ms / self.batches, 3) if self.batches else 0.0,
+            "batch_size_histogram": histogram,
+        }
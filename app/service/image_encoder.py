@@ -0,0 +1,76 @@
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+import asyncio
+import hashlib
+from typing import Any
+import numpy as np
+
+from common.executor import BoundedExecutor
+from service.model_service import ModelService
+
+
+class ImageEncoder:
+    """
+    Encode uploaded query images: decode + preprocess on one pool (in parallel), then one batched
+    encode_image on a separate inference pool, so image uploads queue behind each other and not
+    behind text queries.
+    """
+
+    def __init__(
+        self,
+        model_service: ModelService,
+        preprocess_executor: BoundedExecutor | None = None,
+        inference_executor: BoundedExecutor | None = None,
+        max_pixels: int | None = None,
+    ):
+        self.model_service = model_service
+        # giới hạn số pixel sau giải mã: file nhỏ vẫn có thể bung ra hàng trăm MB
+        self.max_pixels = max_pixels
+        self.preprocess_executor = preprocess_executor or BoundedExecutor(name="image-preprocess", max_workers=4)
+        self.inference_executor = inference_executor or BoundedExecutor(name="clip-image", max_workers=1)
+
+    @property
+    def available(self) -> bool:
+        # chỉ có text tower (TEXT_ENCODER_PATH) -> không encode được ảnh
+        return self.model_service.model is not None and self.model_service.preprocess is not None
+
+    @staticmethod
+    def digest(images: list[bytes]) -> str:
+        h = hashlib.sha1()
+        for data in images:
+            h.update(hashlib.sha1(data).digest())
+        return h.hexdigest()
+
+    async def embeddings(self, images: list[bytes]) -> np.ndarray:
+        """Return (n, ndim) np.ndarray, one row per image."""
+        pixels = await asyncio.gather(
+            *(self.preprocess_executor.run(self.model_service.preprocess_image, data, self.max_pixels) for data in images)
+        )
+        return await self.inference_executor.run(self.model_service.encode_images, list(pixels))
+
+    async def query_embedding(self, images: list[bytes]) -> np.ndarray:
+        """
+        Return (ndim,) query vector: the centroid of the L2-normalized image embeddings,
+        so several examples of the same scene act as one query.
+        """
+        embs = await self.embeddings(images)
+        embs = embs / np.maximum(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12)
+        return embs.mean(axis=0).astype(np.float32)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'available': self.available,
+            'preprocess': self.preprocess_executor.stats(),
+            'inference': self.inference_executor.stats(),
+        }
+
+    def shutdown(self):
+        self.preprocess_executor.shutdown()
+        self.inference_executor.shutdown()
@@ -1,5 +1,11 @@
+import io
 import torch
 import numpy as np
+from typing import Optional
+from PIL import Image, UnidentifiedImageError
+
+from common.embedding_cache import TextEmbeddingCache
+from service.text_encoder import TorchTextEncoder
 
 
 class ModelService:
@@ -8,22 +14,89 @@ class ModelService:
         model ,
         preprocess ,
         tokenizer ,
-        device: str='cuda'
+        device: str='cuda',
+        embedding_cache: Optional[TextEmbeddingCache] = None,
+        text_encoder = None
         ):
         self.model = model
         self.device = 'mps' if torch.backends.mps.is_available() else 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model = model.to(self.device)
+        if model is not None:
+            self.model = model.to(self.device)
+            self.model.eval()
         self.preprocess = preprocess
         self.tokenizer = tokenizer
-        self.model.eval()
+        self.embedding_cache = embedding_cache
+        # text tower: artifact đã export (TorchScript/ONNX, CPU) hoặc model open_clip đầy đủ
+        self.text_encoder = text_encoder or TorchTextEncoder(self.model, self.device)
     
     def embedding(self, query_text: str) -> np.ndarray:
         """
         Return (1, ndim 1024) torch.Tensor
         """
+        return self.embeddings([query_text])
+
+    def embeddings(self, query_texts: list[str], memory: bool = True) -> np.ndarray:
+        """
+        Encode many texts in one forward pass. Return (n, ndim) np.ndarray
+        Texts already in the embedding cache are not re-encoded.
+        memory=False: the caller already checked the in-memory tier, only look up the disk tier.
+        """
+        if self.embedding_cache is None:
+            return self._encode(query_texts)
+
+        cached = self.cached_embeddings(query_texts, memory=memory)
+        missing = [i for i, v in enumerate(cached) if v is None]
+        if missing:
+            # mỗi text chỉ encode một lần dù lặp lại trong cùng batch
+            texts = list(dict.fromkeys(query_texts[i] for i in missing))
+            by_text = dict(zip(texts, self.encode(texts)))
+            for i in missing:
+                cached[i] = by_text[query_texts[i]]
+        return np.stack(cached).astype(np.float32, copy=False)
+
+    def cached_embeddings(self, query_texts: list[str], memory: bool = True, disk: bool = True) -> list[Optional[np.ndarray]]:
+        """Cached embedding of each text, None where it still has to be encoded (or looked up on disk)."""
+        if self.embedding_cache is None:
+            return [None] * len(query_texts)
+        return self.embedding_cache.get_many(query_texts, memory=memory, disk=disk)
+
+    def encode(self, query_texts: list[str]) -> np.ndarray:
+        """Encode without a cache lookup and store the result. Return (n, ndim) np.ndarray"""
+        encoded = self._encode(query_texts)
+        if self.embedding_cache is not None:
+            self.embedding_cache.set_many(query_texts, encoded)
+        return encoded
+
+    def preprocess_image(self, data: bytes, max_pixels: Optional[int] = None) -> torch.Tensor:
+        """
+        Decode an uploaded image and apply the CLIP preprocessing. Return (3, H, W) torch.Tensor.
+        Images larger than max_pixels (after JPEG draft downscaling) raise Image.DecompressionBombError;
+        truncated or corrupt files raise UnidentifiedImageError.
+        """
+        with Image.open(io.BytesIO(data)) as img:
+            # JPEG: giải mã thẳng ở độ phân giải nhỏ hơn, CLIP chỉ cần vài trăm pixel
+            img.draft('RGB', (1024, 1024))
+            if max_pixels and img.size[0] * img.size[1] > max_pixels:
+                raise Image.DecompressionBombError(
+                    f"{img.size[0]}x{img.size[1]} image exceeds {max_pixels} pixels"
+                )
+            try:
+                rgb = img.convert('RGB')
+            except OSError as e:
+                # file bị cắt / hỏng: PIL chỉ phát hiện lúc giải mã, không phải lúc open
+                raise UnidentifiedImageError(f"cannot decode image: {e}") from e
+            return self.preprocess(rgb)
+
+    def encode_images(self, pixels: list[torch.Tensor]) -> np.ndarray:
+        """
+        Encode preprocessed images in one forward pass. Return (n, ndim) np.ndarray
+        """
         with torch.no_grad():
-            text_tokens = self.tokenizer([query_text]).to(self.device)
-            query_embedding = self.model.encode_text(text_tokens).cpu().detach().numpy().astype(np.float32) # (1, 1024)
-        return query_embedding
+            batch = torch.stack(pixels).to(self.device)
+            return self.model.encode_image(batch).cpu().numpy().astype(np.float32)
+
+    def _encode(self, query_texts: list[str]) -> np.ndarray:
+        text_tokens = self.tokenizer(query_texts)
+        return self.text_encoder.encode(text_tokens) # (n, 1024)
 
             
\ No newline at end of file
@@ -1,6 +1,10 @@
 import os
 import sys
+import asyncio
 import math
+import json
+import hashlib
+import secrets
 ROOT_DIR = os.path.abspath(
     os.path.join(
         os.path.dirname(__file__), '../'
@@ -8,28 +12,79 @@ ROOT_DIR = os.path.abspath(
 )
 sys.path.insert(0, ROOT_DIR)
 
-from repository.milvus import KeyframeVectorRepository
-from repository.milvus import MilvusSearchRequest
+from common.repository import VectorBaseRepository
+from repository.milvus import MilvusSearchRequest, MilvusBatchSearchRequest
 from repository.mongo import KeyframeRepository
-from schema.interface import MongoSearchResult, MongoSearchRequest
-from schema.response import KeyframeServiceReponse
-from schema.request import ImageSearchRequest, UnifiedSearchRequest
+from repository.keyframe_meta import KeyframeMetaTable
+from repository.video_index import VideoIndex
+from schema.interface import MongoSearchResult, MongoSearchRequest, MAX_SEARCH_DEPTH
+from schema.response import KeyframeServiceReponse, KeyframeDisplay
+from common.cache import LRUCache
+from common.exclusion import ExclusionStore, merge_exclusions
+from common.data_version import DataVersionWatcher
+from common.embedding_cache import normalize_query_text
+from service.embedding_model import EmbeddingModel
+import numpy as np
+from typing import Callable
+from schema.request import ImageSearchRequest, UnifiedSearchRequest, BatchSearchRequest
 
 def rrf(ranks: dict[int, int], k: int = 60) -> dict[int, float]:
     # Reciprocal Rank Fusion
     return {i: 1.0 / (k + r) for i, r in ranks.items()}
 
+def in_video_scope(group_num: int, video_num: int, group_nums: list[int] | None, video_nums: list[int] | None) -> bool:
+    # cùng ngữ nghĩa với video_filter() bên Mongo: cặp (g, -1) = cả group g
+    if group_nums and video_nums:
+        return any(g == group_num and (v == -1 or v == video_num) for g, v in zip(group_nums, video_nums))
+    if group_nums:
+        return group_num in group_nums
+    if video_nums:
+        return video_num in video_nums
+    return True
+
+def normalize_text(text: str | None) -> str | None:
+    # cùng quy tắc với cache embedding (chỉ gộp khoảng trắng): tokenizer của một số model phân biệt hoa/thường
+    if not text:
+        return None
+    return normalize_query_text(text) or None
+
 class KeyframeQueryService:
     def __init__(
             self, 
-            keyframe_vector_repo: KeyframeVectorRepository,
+            keyframe_vector_repo: VectorBaseRepository,
             keyframe_mongo_repo: KeyframeRepository,
-            data_folder: str  
+            data_folder: str,
+            result_set_cache: LRUCache | None = None,
+            result_set_max_hits: int = 2000,
+            exclusion_store: ExclusionStore | None = None,
+            keyframe_meta: KeyframeMetaTable | None = None,
+            query_cache: LRUCache | None = None,
+            data_version_path: str | None = None,
+            extra_models: list[EmbeddingModel] | None = None,
+            video_index: VideoIndex | None = None,
+            coarse_top_videos: int = 0,
+            reload_hooks: list[Callable[[], None]] | None = None
         ):
 
         self.keyframe_vector_repo = keyframe_vector_repo
         self.keyframe_mongo_repo= keyframe_mongo_repo
         self.data_folder = data_folder
+        # cursor -> (fingerprint của request, ranking đầy đủ); các trang sau chỉ cắt ranking
+        self.result_sets: LRUCache[tuple[str, list[int]]] = result_set_cache or LRUCache("result_sets", maxsize=256, ttl=900)
+        self.result_set_max_hits = result_set_max_hits
+        self.exclusions = exclusion_store or ExclusionStore()
+        # bảng key -> (group, video, keyframe) trong RAM; None -> tra Mongo như cũ
+        self.keyframe_meta = keyframe_meta
+        # query_key(req) -> ranking đầy đủ; dùng lại cho cùng truy vấn dù khác trang/cursor
+        self.query_cache: LRUCache[list[int]] = query_cache or LRUCache("unified_queries", maxsize=512, ttl=1800)
+        # index nạp từ file lúc khởi động (BM25, ...) -> migration ghi lại thì nạp lại, rồi mới bỏ cache
+        self.reload_hooks = list(reload_hooks or [])
+        self.data_version = DataVersionWatcher(data_version_path, self.on_data_version_change)
+        # các cặp (model, collection) phụ -> thêm tín hiệu RRF trong unified search
+        self.extra_models = {m.name: m for m in extra_models or []}
+        # coarse-to-fine: xếp hạng video trước, chỉ tìm keyframe trong top video
+        self.video_index = video_index
+        self.coarse_top_videos = coarse_top_videos
 
     def get_total(self):
         return self.keyframe_vector_repo.get_total()
@@ -40,22 +95,158 @@ class KeyframeQueryService:
         ) -> tuple[int, str]:
             return model.key, os.path.join(self.data_folder, f'Keyframes_L{model.group_num:02d}', f'L{model.group_num:02d}_V{model.video_num:03d}', f'{model.keyframe_num:03d}.jpg')
         
-    async def get_keyframes(self, req: MongoSearchRequest) -> list[KeyframeServiceReponse]:
+    async def get_keyframes(self, req: MongoSearchRequest) -> list[MongoSearchResult]:
+        if self.keyframe_meta is not None:
+            return self.keyframe_meta.get_keyframe(req)
         results = await self.keyframe_mongo_repo.get_keyframe(req)
         return results
 
-    async def image_search(self, search_request: ImageSearchRequest) -> list[KeyframeServiceReponse]:
-        search_results = await self.keyframe_vector_repo.search_by_img_id(search_request)
-        
-        sorted_results = sorted(
-            search_results.results, key=lambda r: r.distance, reverse=True
-        )
+    async def get_keyframes_by_keys(self, keys: list[int]) -> list[MongoSearchResult]:
+        if self.keyframe_meta is not None:
+            return self.keyframe_meta.get_keyframes_by_keys(keys)
+        return await self.keyframe_mongo_repo.get_keyframes_by_keys(keys)
+
+    async def filter_keys_by_video(self, keys: list[int], group_nums: list[int] | None, video_nums: list[int] | None) -> list[int]:
+        if self.keyframe_meta is not None:
+            return self.keyframe_meta.filter_keys(keys, group_nums, video_nums)
+        return await self.keyframe_mongo_repo.filter_keys_by_video(keys, group_nums, video_nums)
+
+    async def key_ids_in_time_ranges(self, ranges: list[tuple[int, int, int, int]], per_range_limit: int) -> list[int]:
+        if self.keyframe_meta is not None:
+            return self.keyframe_meta.key_ids_in_time_ranges(ranges, per_range_limit)
+        return await self.keyframe_mongo_repo.key_ids_in_time_ranges(ranges, per_range_limit)
+
+    def exclusion_version(self, req) -> int | None:
+        # stamp thay đổi mỗi lần session thêm/bớt id
+        exclusion = self.exclusions.get(req.exclusion_session)
+        return exclusion.version if exclusion is not None and len(exclusion) else None
+
+    def fingerprint(self, req) -> str:
+        # mọi tham số trừ phân trang -> cursor chỉ dùng lại được cho đúng truy vấn đã tạo ra nó;
+        # session exclusion đổi -> ranking cũ không còn đúng
+        payload = req.model_dump_json(exclude={'page', 'size', 'cursor'})
+        payload = f"{payload}\x00{self.exclusion_version(req)}"
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def invalidate_caches(self) -> None:
+        self.result_sets.clear()
+        self.query_cache.clear()
+
+    def on_data_version_change(self) -> None:
+        for hook in self.reload_hooks:
+            hook()
+        self.invalidate_caches()
 
-        sorted_ids = [result.id_ for result in sorted_results]
+    def model_weights(self, req: UnifiedSearchRequest) -> dict[str, float]:
+        """Trọng số hiệu lực của từng model phụ (request ghi đè mặc định, tên lạ bị bỏ qua)."""
+        overrides = req.model_weight_map()
+        return {name: overrides.get(name, m.weight) for name, m in self.extra_models.items()}
 
-        keyframes = await self.get_keyframes(MongoSearchRequest(keys=sorted_ids))
+    def coarse_videos(self, req: UnifiedSearchRequest) -> int:
+        """Số video của bước coarse cho request này (0 = tìm trên toàn bộ keyframe)."""
+        if self.video_index is None or req.group_nums or req.video_nums:
+            # đã giới hạn phạm vi video thì bước coarse không còn tác dụng
+            return 0
+        return self.coarse_top_videos if req.coarse_videos is None else req.coarse_videos
 
-        return list(map(lambda pair: KeyframeServiceReponse(id=pair[0], path=pair[1]), map(self.convert_model_to_path, keyframes)))
+    async def rank_videos(self, text_emb: list[float], top_m: int) -> list[tuple[int, int, float]]:
+        """[(group_num, video_num, score)] của top_m video gần query nhất; [] khi không có video index."""
+        if self.video_index is None:
+            return []
+        return self.video_index.search_videos(text_emb, top_m)
+
+    def unified_depth(self, req: UnifiedSearchRequest) -> int:
+        # độ sâu cố định cho cả result set, không nhân theo số trang
+        return min(MAX_SEARCH_DEPTH, max(req.size * req.oversample, self.result_set_max_hits))
+
+    def query_key(self, req: UnifiedSearchRequest, key_extra: str | None = None) -> str:
+        """
+        Khoá chuẩn hoá của một unified search: hai request cho cùng ranking -> cùng khoá
+        (thứ tự filter, hoa/thường, khoảng trắng không quan trọng; page/size/cursor bị bỏ qua).
+        """
+        if req.group_nums and req.video_nums:
+            scope = sorted(set(zip(req.group_nums, req.video_nums)))
+        else:
+            scope = [sorted(set(req.group_nums or [])), sorted(set(req.video_nums or []))]
+        payload = {
+            'query': normalize_text(req.query),
+            'asr': normalize_text(req.asr),
+            'ocr': normalize_text(req.ocr),
+            'ocr_mode': req.ocr_mode if req.ocr else None,
+            'obj_filters': sorted({(f.name, f.cmp, f.count) for f in req.obj_filters or []}),
+            'exclude_ids': sorted(set(req.exclude_ids or [])),
+            'scope': scope,
+            'weights': [req.w_vec, req.w_asr, req.w_ocr],
+            'model_weights': self.model_weights(req) if req.query else None,
+            'depth': self.unified_depth(req),
+            'coarse_videos': self.coarse_videos(req) if req.query or key_extra else 0,
+            'exclusion': self.exclusion_version(req),
+            # truy vấn không nằm trong request (vd. digest ảnh upload)
+            'extra': key_extra,
+        }
+        return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    async def cached_unified_search(self, req: UnifiedSearchRequest, key_extra: str | None = None) -> KeyframeDisplay | None:
+        """
+        Trả trang từ cache (cursor hoặc truy vấn đã chuẩn hoá) mà không cần dịch/encode; None nếu miss.
+        """
+        ranked = self.lookup_result_set(req)
+        if ranked is not None:
+            return await self.get_result_page(req.cursor, ranked, req.page, req.size)
+        ranked = self.query_cache.get(self.query_key(req, key_extra))
+        if ranked is None:
+            return None
+        cursor = self.store_result_set(req, ranked)
+        return await self.get_result_page(cursor, ranked, req.page, req.size)
+
+    def lookup_result_set(self, req) -> list[int] | None:
+        self.data_version.check()
+        if not req.cursor:
+            return None
+        entry = self.result_sets.get(req.cursor)
+        if entry is None or entry[0] != self.fingerprint(req):
+            return None
+        return entry[1]
+
+    def store_result_set(self, req, ranked: list[int]) -> str:
+        cursor = secrets.token_urlsafe(16)
+        self.result_sets.set(cursor, (self.fingerprint(req), ranked))
+        return cursor
+
+    async def resolve_keys(self, keys: list[int]) -> list[KeyframeServiceReponse]:
+        """
+        Tra metadata của một trang key, giữ nguyên thứ tự truyền vào.
+        """
+        keyframes = await self.get_keyframes_by_keys(keys)
+        by_key = {kf.key: kf for kf in keyframes}
+        res = []
+        for k in keys:
+            if k in by_key:
+                id_, path = self.convert_model_to_path(by_key[k])
+                res.append(KeyframeServiceReponse(id=id_, path=path))
+        return res
+
+    async def get_result_page(self, cursor: str, ranked: list[int], page: int, size: int) -> KeyframeDisplay:
+        skip = (max(1, page) - 1) * size
+        items = await self.resolve_keys(ranked[skip:skip + size])
+        return KeyframeDisplay(total_page=math.ceil(len(ranked) / size), results=items, cursor=cursor)
+
+    async def image_search(self, search_request: ImageSearchRequest) -> KeyframeDisplay:
+        ranked = self.lookup_result_set(search_request)
+        cursor = search_request.cursor
+        if ranked is None:
+            search_results = await self.keyframe_vector_repo.search_similar(
+                search_request.imgid,
+                top_k=self.result_set_max_hits,
+                exclusion=self.exclusions.get(search_request.exclusion_session)
+            )
+            sorted_results = sorted(
+                search_results.results, key=lambda r: r.distance, reverse=True
+            )
+            ranked = [int(result.id_) for result in sorted_results]
+            cursor = self.store_result_set(search_request, ranked)
+
+        return await self.get_result_page(cursor, ranked, search_request.page, search_request.size)
 
     async def get_neighbors(self, imgid: int, k: int):
         range_search = [imgid + i for i in range(-k, k + 1)]
@@ -63,26 +254,123 @@ class KeyframeQueryService:
         results = [r for r in results if r.video_num == results[k].video_num and r.group_num == results[k].group_num]
         return list(map(lambda pair: KeyframeServiceReponse(id=pair[0], path=pair[1]), map(self.convert_model_to_path, results)))
     
-    async def unified_search(self, text_emb: list[float] | None, req: UnifiedSearchRequest):
+    async def batch_search(self, text_embs: list[list[float]], req: BatchSearchRequest) -> list[list[KeyframeServiceReponse]]:
+        """
+        Một lần gọi Milvus cho tất cả embedding, một lần tra Mongo cho trang hiện tại của mọi danh sách.
+        """
+        skip = (req.page - 1) * req.size
+        # trang nằm ngoài độ sâu tối đa -> danh sách rỗng thay vì lỗi validate (500)
+        top_k = min(skip + req.size, MAX_SEARCH_DEPTH)
+        if skip >= top_k:
+            return [[] for _ in text_embs]
+        vec_req = MilvusBatchSearchRequest(
+            embeddings=text_embs,
+            top_k=top_k,
+            exclude_ids=req.exclude_ids or [],
+            exclusion=self.exclusions.get(req.exclusion_session)
+        )
+        responses = await self.keyframe_vector_repo.search_by_embeddings(vec_req)
+
+        page_ids: list[list[int]] = []
+        for res in responses:
+            sorted_res = sorted(res.results, key=lambda r: r.distance, reverse=True)
+            page_ids.append([int(r.id_) for r in sorted_res[skip:skip + req.size]])
+
+        all_ids = {i for ids in page_ids for i in ids}
+        keyframes = await self.get_keyframes_by_keys(list(all_ids))
+        by_key = {kf.key: kf for kf in keyframes}
+
+        results = []
+        for ids in page_ids:
+            items = []
+            for i in ids:
+                if i in by_key:
+                    id_, path = self.convert_model_to_path(by_key[i])
+                    items.append(KeyframeServiceReponse(id=id_, path=path))
+            results.append(items)
+        return results
+
+    async def vector_ranking(
+        self,
+        repo: VectorBaseRepository,
+        emb: list[float],
+        req: UnifiedSearchRequest,
+        videos: list[tuple[int, int]] | None = None
+    ) -> list[int]:
+        """videos: phạm vi từ bước coarse (None -> phạm vi group/video của request)."""
+        group_nums, video_nums = req.group_nums, req.video_nums
+        if videos and repo.supports_video_filter:
+            group_nums, video_nums = [g for g, _ in videos], [v for _, v in videos]
+        vec_req = MilvusSearchRequest(
+            embedding=emb,
+            top_k=self.unified_depth(req),
+            exclude_ids=req.exclude_ids or [],
+            exclusion=self.exclusions.get(req.exclusion_session),
+            # lọc group/video ngay trong ANN để top_n không bị lãng phí cho video ngoài phạm vi
+            group_nums=group_nums,
+            video_nums=video_nums
+        )
+        res = await repo.search_by_embedding(vec_req)
+        # sắp theo distance phù hợp metric (giữ nguyên thứ tự từ Milvus cũng OK)
+        sorted_res = sorted(res.results, key=lambda r: r.distance, reverse=True)
+        return [int(r.id_) for r in sorted_res]
+
+    async def fine_ranking(self, emb: list[float], req: UnifiedSearchRequest, videos: list[tuple[int, int]]) -> list[int]:
+        """Bước fine: chấm chính xác mọi keyframe của các video đã chọn (không cần ANN)."""
+        exclusion = merge_exclusions(self.exclusions.get(req.exclusion_session), req.exclude_ids)
+        hits = await self.video_index.search_keyframes(emb, videos, self.unified_depth(req), exclusion)
+        return [i for i, _ in hits]
+
+    async def unified_search(
+        self,
+        text_emb: list[float] | None,
+        req: UnifiedSearchRequest,
+        key_extra: str | None = None,
+        extra_embs: dict[str, list[float]] | None = None
+    ) -> KeyframeDisplay:
+        """
+        Tính ranking hợp nhất một lần, lưu vào result set cache và trả trang req.page kèm cursor.
+        Các trang sau (cùng cursor) đi qua lookup_result_set + get_result_page.
+        extra_embs: tên model phụ -> embedding của query bằng model đó; mỗi model là một tín hiệu RRF.
+        """
+        weights = self.model_weights(req)
+        extra_embs = {name: emb for name, emb in (extra_embs or {}).items() if weights.get(name, 0.0) > 0}
+        if text_emb is None and not extra_embs and not (req.asr or req.ocr or req.obj_filters):
+            # không có tín hiệu xếp hạng -> duyệt keyframe theo group/video, phân trang ở Mongo
+            keyframes = await self.get_keyframes(MongoSearchRequest(group_nums=req.group_nums, video_nums=req.video_nums, page=req.page, size=req.size))
+            items = [KeyframeServiceReponse(id=id_, path=path) for id_, path in map(self.convert_model_to_path, keyframes)]
+            return KeyframeDisplay(total_page=math.ceil(self.get_total() / req.size), results=items)
+
         cand_ids: set[int] = set()
         scores_vec: dict[int, float] = {}
         scores_asr: dict[int, float] = {}
         scores_ocr: dict[int, float] = {}
+        scores_extra: list[tuple[float, dict[int, float]]] = []
 
-        # 1) Vector ANN (nếu có query)
+        # 1) Vector ANN (nếu có query): collection chính + collection của từng model phụ, chạy song song
+        searches = []
         if text_emb is not None:
-            top_n = max(req.size * req.page * req.oversample, req.size * req.oversample)
-            vec_req = MilvusSearchRequest(embedding=text_emb, top_k=top_n, exclude_ids=req.exclude_ids or [])
-            res = await self.keyframe_vector_repo.search_by_embedding(vec_req)
-            # sắp theo distance phù hợp metric (giữ nguyên thứ tự từ Milvus cũng OK)
-            sorted_res = sorted(res.results, key=lambda r: r.distance, reverse=True)
-            vec_ids = [int(r.id_) for r in sorted_res]
+            searches.append((req.w_vec, self.keyframe_vector_repo, text_emb))
+        for name, emb in extra_embs.items():
+            searches.append((weights[name], self.extra_models[name].vector_repo, emb))
+        videos = None
+        top_m = self.coarse_videos(req)
+        if text_emb is not None and top_m > 0:
+            videos = [(g, v) for g, v, _ in await self.rank_videos(text_emb, top_m)]
 
+        def ranking(repo: VectorBaseRepository, emb: list[float]):
+            if videos and repo is self.keyframe_vector_repo and self.video_index.embedding_store is not None:
+                return self.fine_ranking(emb, req, videos)
+            return self.vector_ranking(repo, emb, req, videos)
+        rankings = await asyncio.gather(*(ranking(repo, emb) for _, repo, emb in searches))
+        for (weight, _, _), vec_ids in zip(searches, rankings):
             cand_ids.update(vec_ids)
-
             # rank→RRF score
             ranks = {i: r for r, i in enumerate(vec_ids, start=1)}
-            scores_vec = rrf(ranks)
+            scores_extra.append((weight, rrf(ranks)))
+        if text_emb is not None:
+            # tín hiệu của model chính giữ trọng số w_vec
+            scores_vec = scores_extra.pop(0)[1]
 
         # 2) FTS ASR (SpeechCaption.text) → time ranges → keyframe ids
         if req.asr:
@@ -92,8 +380,10 @@ class KeyframeQueryService:
                 # Convert seconds to keyframe_num range (fps = 30)
                 kfs = int(s.get("start", 0) * 30)
                 kfe = int(math.ceil(s.get("end", 0) * 30))
-                ranges.append((int(s["group_num"]), int(s["video_num"]), kfs, kfe))
-            asr_ids = await self.keyframe_mongo_repo.key_ids_in_time_ranges(ranges, per_range_limit=10)
+                g, v = int(s["group_num"]), int(s["video_num"])
+                if in_video_scope(g, v, req.group_nums, req.video_nums):
+                    ranges.append((g, v, kfs, kfe))
+            asr_ids = await self.key_ids_in_time_ranges(ranges, per_range_limit=10)
             cand_ids.update(asr_ids)
             # rank by appearance order (RRF later combines with other signals)
             ranks = {i: r for r, i in enumerate(asr_ids, start=1)}
@@ -101,7 +391,11 @@ class KeyframeQueryService:
 
         # 3) FTS OCR (Keyframe.ocr via fts_ids)
         if req.ocr:
-            ocr_pairs = await self.keyframe_mongo_repo.fts_search("ocr", req.ocr, return_type='ids', limit=5000)
+            ocr_pairs = None
+            if req.ocr_mode != 'fts':
+                ocr_pairs = await self.keyframe_mongo_repo.ocr_trigram_search(req.ocr, limit=5000, substring=req.ocr_mode == 'substring')
+            if ocr_pairs is None:
+                ocr_pairs = await self.keyframe_mongo_repo.fts_search("ocr", req.ocr, return_type='ids', limit=5000)
             ocr_ids = [i for i, _ in ocr_pairs]
             cand_ids.update(ocr_ids)
             ranks = {i: r for r, i in enumerate(ocr_ids, start=1)}
@@ -113,19 +407,28 @@ class KeyframeQueryService:
                 req.w_vec * scores_vec.get(i, 0.0)
                 + req.w_asr * scores_asr.get(i, 0.0)
                 + req.w_ocr * scores_ocr.get(i, 0.0)
+                + sum(w * s.get(i, 0.0) for w, s in scores_extra)
             )
         ranked = []
         
         if cand_ids:
             ranked = sorted(cand_ids, key=lambda i: (score_of(i), i), reverse=True)
 
+        # ứng viên từ ASR/OCR cũng phải tôn trọng exclusion (lọc vector hoá bằng bitset)
+        exclusion = merge_exclusions(self.exclusions.get(req.exclusion_session), req.exclude_ids)
+        if exclusion is not None and ranked:
+            arr = np.asarray(ranked, dtype=np.int64)
+            ranked = arr[exclusion.keep_mask(arr)].tolist()
+
         if req.obj_filters:
             ranked = await self.keyframe_mongo_repo.filter_by_objects_list(ranked, req.obj_filters)
-            
-        keyframes = await self.get_keyframes(MongoSearchRequest(keys=ranked, group_nums=req.group_nums, video_nums=req.video_nums, page=req.page, size=req.size))
 
-        res = []
-        for kf in keyframes:
-            id_, path = self.convert_model_to_path(kf)
-            res.append(KeyframeServiceReponse(id=id_, path=path))
-        return res
\ No newline at end of file
+        # ASR đã lọc theo range; vector đã lọc trong ANN nếu backend hỗ trợ -> chỉ cần Mongo khi còn ứng viên OCR/object
+        vector_prefiltered = all(repo.supports_video_filter for _, repo, _ in searches)
+        if (req.group_nums or req.video_nums) and not (vector_prefiltered and not req.ocr and not req.obj_filters):
+            ranked = await self.filter_keys_by_video(ranked, req.group_nums, req.video_nums)
+
+        # key_extra (vd. digest ảnh upload) phân biệt các truy vấn không nằm trong request
+        self.query_cache.set(self.query_key(req, key_extra), ranked)
+        cursor = self.store_result_set(req, ranked)
+        return await self.get_result_page(cursor, ranked, req.page, req.size)
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Memory-mapped CLIP weights shared by all uvicorn workers.
+
+The open_clip model is built once on the `meta` device (no allocation, no random init) and its
+parameters/buffers are assigned straight from a snapshot opened with torch.load(mmap=True).
+Tensors stay backed by the file's page cache (MAP_PRIVATE, copy-on-write), so N workers hold one
+copy of the weights and a cold start does not re-read or re-initialize them.
+"""
+
+import fcntl
+import json
+import os
+from typing import Any
+import torch
+import open_clip
+
+
+def snapshot_meta_path(path: str) -> str:
+    return f"{path}.json"
+
+
+def snapshot_matches(path: str, model_name: str, pretrained: str) -> bool:
+    """True if `path` holds a complete snapshot of model_name/pretrained."""
+    if not (os.path.exists(path) and os.path.exists(snapshot_meta_path(path))):
+        return False
+    try:
+        with open(snapshot_meta_path(path)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (meta.get('model_name'), meta.get('pretrained')) == (model_name, pretrained)
+
+
+def export_shared_weights(model: torch.nn.Module, path: str, model_name: str, pretrained: str) -> bool:
+    """
+    Write every parameter and buffer of `model` (plus preprocessing config) to `path`, atomically.
+    Run from the launcher or a migration, not from workers. Concurrent exporters serialize on
+    `{path}.lock`; returns False if a snapshot of the same model is already there (a snapshot of
+    another model is replaced).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if snapshot_matches(path, model_name, pretrained):
+            return False
+
+        visual = getattr(model, 'visual', None)
+        meta = {
+            'model_name': model_name,
+            'pretrained': pretrained,
+            'image_size': getattr(visual, 'image_size', None),
+            'image_mean': list(getattr(visual, 'image_mean', None) or []) or None,
+            'image_std': list(getattr(visual, 'image_std', None) or []) or None,
+        }
+        # meta trước, snapshot sau: thấy snapshot thì meta chắc chắn đã có
+        tmp_meta = f"{snapshot_meta_path(path)}.{os.getpid()}.tmp"
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_meta, snapshot_meta_path(path))
+
+        tensors = {name: t.detach().cpu().contiguous() for name, t in model.named_parameters()}
+        tensors.update({name: t.detach().cpu().contiguous() for name, t in model.named_buffers()})
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save(tensors, tmp_path)
+        os.replace(tmp_path, path)
+        return True
+
+
+def _assign(model: torch.nn.Module, name: str, tensor: torch.Tensor) -> None:
+    module_path, _, leaf = name.rpartition('.')
+    module = model.get_submodule(module_path) if module_path else model
+    if leaf in module._parameters:
+        module._parameters[leaf] = torch.nn.Parameter(tensor, requires_grad=False)
+    elif leaf in module._buffers:
+        module._buffers[leaf] = tensor
+    else:
+        raise KeyError(f"Unexpected tensor in weights snapshot: {name}")
+
+
+def load_shared_model(path: str, model_name: str, pretrained: str) -> tuple[torch.nn.Module, Any]:
+    """Return (model, preprocess) with weights memory-mapped from a snapshot written by export_shared_weights."""
+    with open(snapshot_meta_path(path)) as f:
+        meta: dict[str, Any] = json.load(f)
+    if (meta.get('model_name'), meta.get('pretrained')) != (model_name, pretrained):
+        raise ValueError(
+            f"Weights snapshot {path} is {meta.get('model_name')}/{meta.get('pretrained')}, "
+            f"expected {model_name}/{pretrained}"
+        )
+
+    with torch.device('meta'):
+        model = open_clip.create_model(model_name, force_quick_gelu=True)
+
+    tensors = torch.load(path, mmap=True, weights_only=True, map_location='cpu')
+    for name, tensor in tensors.items():
+        _assign(model, name, tensor)
+
+    missing = [n for n, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if missing:
+        raise ValueError(f"Weights snapshot {path} is missing tensors: {missing[:5]}")
+
+    image_size = meta.get('image_size') or model.visual.image_size
+    if isinstance(image_size, list):
+        image_size = tuple(image_size)
+    preprocess = open_clip.image_transform(
+        image_size,
+        is_train=False,
+        mean=meta.get('image_mean'),
+        std=meta.get('image_std'),
+    )
+    return model.eval(), preprocess
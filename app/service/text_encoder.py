@@ -0,0 +1,123 @@
+"""
+Text-tower runtimes for ModelService. Query time only needs CLIP's text encoder, so it can be served
+from an exported artifact (TorchScript or ONNX, optionally int8) instead of the full open_clip model.
+Artifacts are built by migration/export_text_encoder.py.
+"""
+
+import json
+import os
+from typing import Any, Optional
+import numpy as np
+import torch
+
+
+class TextEncoderModule(torch.nn.Module):
+    """Only the text tower of an open_clip model: tokens (n, ctx) -> embeddings (n, dim)."""
+
+    def __init__(self, clip_model):
+        super().__init__()
+        self.clip_model = clip_model
+
+    def forward(self, tokens: torch.Tensor) -> torch.Tensor:
+        return self.clip_model.encode_text(tokens)
+
+
+class TorchTextEncoder:
+    def __init__(self, model, device: str = 'cpu'):
+        self.device = device
+        self.model = model.to(device).eval()
+
+    def encode(self, tokens: torch.Tensor) -> np.ndarray:
+        with torch.no_grad():
+            return self.model.encode_text(tokens.to(self.device)).cpu().numpy().astype(np.float32)
+
+
+class TorchScriptTextEncoder:
+    def __init__(self, path: str):
+        self.path = path
+        self.module = torch.jit.load(path, map_location='cpu').eval()
+        self.device = 'cpu'
+
+    def encode(self, tokens: torch.Tensor) -> np.ndarray:
+        with torch.inference_mode():
+            return self.module(tokens.cpu()).numpy().astype(np.float32)
+
+
+class OnnxTextEncoder:
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("onnxruntime is required to serve an .onnx text encoder (pip install onnxruntime)") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.device = 'cpu'
+
+    def encode(self, tokens: torch.Tensor) -> np.ndarray:
+        feed = {self.input_name: tokens.cpu().numpy().astype(np.int64)}
+        return np.asarray(self.session.run(None, feed)[0], dtype=np.float32)
+
+
+def artifact_meta_path(path: str) -> str:
+    return f"{path}.json"
+
+
+def read_artifact_meta(path: str) -> dict[str, Any]:
+    meta_path = artifact_meta_path(path)
+    if not os.path.exists(meta_path):
+        raise FileNotFoundError(f"Text encoder metadata not found: {meta_path} (re-run migration/export_text_encoder.py)")
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def text_encoder_identity(path: Optional[str]) -> str:
+    """Identity of the runtime serving text vectors, for embedding cache keys."""
+    if not path:
+        return 'open_clip'
+    meta = read_artifact_meta(path)
+    precision = 'int8' if meta.get('int8') else 'fp32'
+    return f"{os.path.abspath(path)}:{meta.get('format')}:{precision}"
+
+
+def load_text_encoder(path: str, model_name: str, pretrained: str, num_threads: Optional[int] = None):
+    """
+    Open an exported text encoder. Refuses artifacts without metadata, artifacts that failed the
+    export parity check, and artifacts built from another checkpoint, since their vectors would not
+    match the image embeddings in the index.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Text encoder artifact not found: {path}")
+
+    meta = read_artifact_meta(path)
+    if (meta.get('model_name'), meta.get('pretrained')) != (model_name, pretrained):
+        raise ValueError(
+            f"Text encoder {path} was exported from {meta.get('model_name')}/{meta.get('pretrained')}, "
+            f"expected {model_name}/{pretrained}"
+        )
+    required = meta.get('required_min_cosine')
+    if not meta.get('passed', True) or (required is not None and meta.get('min_cosine', 0.0) < required):
+        raise ValueError(
+            f"Text encoder {path} failed its parity check (min cosine {meta.get('min_cosine')}, "
+            f"required {required})"
+        )
+
+    if path.endswith('.onnx'):
+        return OnnxTextEncoder(path, num_threads=num_threads)
+    return TorchScriptTextEncoder(path)
+
+
+def parity_report(reference: np.ndarray, candidate: np.ndarray) -> dict[str, float]:
+    """Row-wise cosine similarity between two (n, dim) embedding matrices."""
+    ref = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    cand = candidate / np.maximum(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12)
+    cos = np.sum(ref * cand, axis=1)
+    return {
+        'min_cosine': float(cos.min()),
+        'mean_cosine': float(cos.mean()),
+    }
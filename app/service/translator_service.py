@@ -1,12 +1,264 @@
+import os
+import sys
+ROOT_DIR = os.path.abspath(
+    os.path.join(
+        os.path.dirname(__file__), '../'
+    )
+)
+sys.path.insert(0, ROOT_DIR)
+
+import asyncio
+import hashlib
+import importlib
+import json
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Optional
 from deep_translator import GoogleTranslator
+from langdetect import DetectorFactory, LangDetectException, detect_langs
+
+from common.cache import LRUCache
+from common.disk_cache import SqliteKV
+from common.executor import BoundedExecutor
+from core.logger import SimpleLogger
+
+logger = SimpleLogger(__name__)
+
+# langdetect mặc định không tất định
+DetectorFactory.seed = 0
+
+
+class TranslationBackend(ABC):
+    """A translator: (text, target language) -> translated text. Called from a worker thread."""
+
+    name: str = "base"
+
+    @property
+    def cache_id(self) -> str:
+        """Identifies the translations this backend produces; part of the cache key (override when they depend on data)."""
+        return self.name
+
+    @abstractmethod
+    def translate(self, text: str, target: str) -> str:
+        ...
+
+
+class GoogleTranslateBackend(TranslationBackend):
+    name = "google"
 
-class TranslationService:
     def __init__(self):
-        self.translator = GoogleTranslator()
+        # GoogleTranslator giữ state theo instance -> mỗi thread một instance
+        self._local = threading.local()
+
+    def translate(self, text: str, target: str) -> str:
+        translator = getattr(self._local, 'translator', None)
+        if translator is None or translator.target != target:
+            translator = self._local.translator = GoogleTranslator(source='auto', target=target)
+        return translator.translate(text)
+
+
+class DictionaryBackend(TranslationBackend):
+    """
+    Offline phrase dictionary (JSON {"source phrase": "translation"}), greedy longest match;
+    words not in the dictionary are kept as-is.
+    """
+
+    name = "dictionary"
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        entries = json.loads(raw.decode('utf-8'))
+        # sửa từ điển -> bản dịch cũ trong cache (kể cả SQLite) không còn dùng được
+        self.version = hashlib.sha1(raw).hexdigest()[:16]
+        self.phrases = {k.lower().strip(): v for k, v in entries.items() if k.strip()}
+        self.max_words = max((len(k.split()) for k in self.phrases), default=1)
+
+    def translate(self, text: str, target: str) -> str:
+        words = text.split()
+        out, i = [], 0
+        while i < len(words):
+            for n in range(min(self.max_words, len(words) - i), 0, -1):
+                phrase = " ".join(words[i:i + n]).lower()
+                if phrase in self.phrases:
+                    out.append(self.phrases[phrase])
+                    i += n
+                    break
+            else:
+                out.append(words[i])
+                i += 1
+        return " ".join(out)
+
+    @property
+    def cache_id(self) -> str:
+        return f"{self.name}:{self.version}"
+
+
+class IdentityBackend(TranslationBackend):
+    """No-op translator (offline deployments, tests)."""
+
+    name = "identity"
+
+    def translate(self, text: str, target: str) -> str:
+        return text
+
+
+def load_backend(spec: str, dictionary_path: Optional[str] = None) -> TranslationBackend:
+    """
+    'google' | 'dictionary' | 'identity' | 'package.module:ClassName' (a TranslationBackend
+    subclass with a no-argument constructor, e.g. a local translation model).
+    """
+    if spec == "google":
+        return GoogleTranslateBackend()
+    if spec == "dictionary":
+        if not dictionary_path:
+            raise ValueError("TRANSLATION_DICTIONARY_PATH must be set for the dictionary backend")
+        return DictionaryBackend(dictionary_path)
+    if spec == "identity":
+        return IdentityBackend()
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown translation backend: {spec}")
+    backend = getattr(importlib.import_module(module_name), class_name)()
+    if not isinstance(backend, TranslationBackend):
+        raise TypeError(f"{spec} is not a TranslationBackend")
+    return backend
+
+
+def detect_language(text: str, min_prob: float = 0.8) -> Optional[str]:
+    """Best-guess ISO 639-1 code, or None when langdetect is not confident."""
+    try:
+        langs = detect_langs(text)
+    except LangDetectException:
+        return None
+    if not langs or langs[0].prob < min_prob:
+        return None
+    return langs[0].lang
+
+
+class TranslationService:
+    """
+    Query translation in front of CLIP: skips text already in the target language, caches
+    translations (LRU + optional SQLite), and runs the backend off the event loop with a timeout.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[TranslationBackend] = None,
+        executor: BoundedExecutor | None = None,
+        timeout: float = 5.0,
+        target: str = 'en',
+        skip_langs: Optional[list[str]] = None,
+        cache_size: int = 4096,
+        cache_path: Optional[str] = None,
+    ):
+        self.backend = backend or GoogleTranslateBackend()
+        # HTTP call chặn -> chạy trên pool riêng, không chiếm event loop
+        self.executor = executor or BoundedExecutor(name="translate", max_workers=4)
+        self.timeout = timeout
+        self.target = target
+        self.skip_langs = set(skip_langs or [target])
+
+        self.memory: LRUCache[str] = LRUCache("translations", maxsize=cache_size)
+        self.disk = SqliteKV(cache_path, "translations") if cache_path else None
+
+        # counter được cộng từ các thread của pool
+        self._stats_lock = threading.Lock()
+        self.skipped = 0
+        self.disk_hits = 0
+        self.backend_calls = 0
+        self.failures = 0
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
 
     def preprocessing(self, text):
-        return text.lower()
+        return re.sub(r'\s+', ' ', text).strip().lower()
+
+    def needs_translation(self, text: str) -> bool:
+        if not text:
+            return False
+        # chỉ ASCII và langdetect chắc là ngôn ngữ đích -> bỏ qua round trip
+        if not text.isascii():
+            return True
+        return detect_language(text) not in self.skip_langs
+
+    def cache_key(self, text: str) -> str:
+        raw = f"{self.backend.cache_id}\x00{self.target}\x00{text}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _translate_uncached(self, text: str, key: str) -> str:
+        """Disk cache, then language check, then backend; the result is kept in the RAM cache."""
+        if self.disk is not None:
+            blob = self.disk.get_many([key]).get(key)
+            if blob is not None:
+                self._count('disk_hits')
+                translated = blob.decode('utf-8')
+                self.memory.set(key, translated)
+                return translated
+
+        if not self.needs_translation(text):
+            self._count('skipped')
+            # nhớ cả kết quả "không cần dịch" để lần sau khỏi chạy langdetect
+            self.memory.set(key, text)
+            return text
+
+        self._count('backend_calls')
+        translated = self.backend.translate(text, self.target)
+        self.memory.set(key, translated)
+        if self.disk is not None:
+            self.disk.set_many([(key, translated.encode('utf-8'))])
+        return translated
 
     def translate(self, text):
+        """Blocking translate (cache + language check + backend)."""
         text = self.preprocessing(text)
-        return self.translator.translate(text)
+        key = self.cache_key(text)
+        cached = self.memory.get(key)
+        if cached is not None:
+            return cached
+        return self._translate_uncached(text, key)
+
+    async def atranslate(self, text: str) -> str:
+        """
+        Non-blocking translate. On timeout/error fall back to the untranslated text
+        so a slow translation backend degrades quality instead of stalling the request.
+        """
+        text = self.preprocessing(text)
+        key = self.cache_key(text)
+        # bỏ qua pool khi đã có trong cache RAM (langdetect + dịch đều tốn thời gian)
+        cached = self.memory.get(key)
+        if cached is not None:
+            return cached
+        try:
+            return await asyncio.wait_for(self.executor.run(self._translate_uncached, text, key), self.timeout)
+        except Exception as e:
+            self._count('failures')
+            logger.warning(f"Translation failed ({type(e).__name__}: {e}), using original text")
+            return text
+
+    async def atranslate_many(self, texts: list[str]) -> list[str]:
+        return list(await asyncio.gather(*(self.atranslate(t) for t in texts)))
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            counters = {
+                "skipped": self.skipped,
+                "backend_calls": self.backend_calls,
+                "failures": self.failures,
+                "disk_hits": self.disk_hits,
+            }
+        return {
+            "backend": self.backend.cache_id,
+            "target": self.target,
+            **counters,
+            "cache": self.memory.stats(),
+            "executor": self.executor.stats(),
+        }
+
+    def shutdown(self):
+        self.executor.shutdown()
+        if self.disk is not None:
+            self.disk.close()
@@ -219,7 +219,8 @@ function add_paging(page) {
         a.textContent = String(i);
         if (i === cur_index) a.classList.add('active');
         a.addEventListener('click', () => {
-            doSearch({ page: i });
+            // đổi trang -> dùng lại result set đã tính trên server
+            doSearch({ page: i, cursor: data['cursor'] || null });
         });
 
         const wrap = document.createElement('div');
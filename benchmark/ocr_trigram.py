@@ -0,0 +1,130 @@
+"""
+OCR substring / fuzzy lookup: trigram index vs. the $regex collection scan used by fts_search.
+
+Queries are substrings of real OCR strings, optionally corrupted (diacritics dropped, characters
+replaced) to imitate noisy OCR. Recall is measured against the keyframes the regex scan finds for the
+clean query, so it shows what the index keeps on exact substrings and what it recovers on noisy ones.
+
+    python benchmark/ocr_trigram.py --queries 200 --noise 0 0.1 0.2 --threshold 0.5
+"""
+import argparse
+import asyncio
+import re
+import time
+
+import numpy as np
+
+import sys
+import os
+ROOT_FOLDER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')
+)
+sys.path.insert(0, ROOT_FOLDER)
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.settings import MongoDBSettings, FullTextSettings
+from app.repository.trigram_index import TrigramIndex, normalize_ocr
+from app.repository.bm25_index import fold_diacritics
+
+
+async def sample_queries(col, n: int, min_len: int, max_len: int, rng: np.random.Generator) -> list[str]:
+    """Substrings of OCR strings from randomly sampled keyframes (raw text, as stored in MongoDB)."""
+    docs = await col.aggregate([
+        {"$match": {"ocr": {"$exists": True, "$nin": ["", None, []]}}},
+        {"$sample": {"size": n * 2}},
+        {"$project": {"_id": 0, "ocr": 1}},
+    ]).to_list(length=None)
+    queries = []
+    for d in docs:
+        text = " ".join(d["ocr"]) if isinstance(d["ocr"], list) else str(d["ocr"])
+        text = re.sub(r'\s+', ' ', text).strip()
+        if len(text) < min_len:
+            continue
+        length = int(rng.integers(min_len, min(max_len, len(text)) + 1))
+        start = int(rng.integers(0, len(text) - length + 1))
+        query = text[start:start + length].strip()
+        if len(normalize_ocr(query)) >= min_len:
+            queries.append(query)
+        if len(queries) >= n:
+            break
+    return queries
+
+
+def corrupt(query: str, rate: float, rng: np.random.Generator) -> str:
+    if rate <= 0:
+        return query
+    chars = list(fold_diacritics(query) if rng.random() < 0.5 else query)
+    for i in range(len(chars)):
+        if chars[i] != ' ' and rng.random() < rate:
+            chars[i] = chr(int(rng.integers(ord('a'), ord('z') + 1)))
+    return ''.join(chars)
+
+
+async def regex_scan(col, query: str, limit: int) -> tuple[set[int], float]:
+    t0 = time.perf_counter()
+    docs = await col.find(
+        {"ocr": {"$regex": re.escape(query), "$options": "i"}}, {"_id": 0, "key": 1}
+    ).limit(limit).to_list(length=None)
+    return {int(d["key"]) for d in docs}, (time.perf_counter() - t0) * 1000
+
+
+def percentiles(latencies: list[float]) -> str:
+    return f"p50={np.percentile(latencies, 50):.2f}ms  p95={np.percentile(latencies, 95):.2f}ms"
+
+
+async def main(args):
+    index_dir = args.index_dir or FullTextSettings().FTS_INDEX_DIR
+    index = TrigramIndex.load(os.path.join(index_dir, 'ocr_trigram'))
+    rng = np.random.default_rng(args.seed)
+
+    setting = MongoDBSettings()
+    client = AsyncIOMotorClient(
+        host=setting.MONGO_HOST,
+        port=setting.MONGO_PORT,
+        username=setting.MONGO_USER,
+        password=setting.MONGO_PASSWORD,
+    )
+    col = client[setting.MONGO_DB]["keyframes"]
+    queries = await sample_queries(col, args.queries, args.min_len, args.max_len, rng)
+    total = await col.count_documents({})
+    print(f"{total} keyframes in MongoDB, {len(index)} with OCR in the index, {len(queries)} queries")
+
+    # ground truth: regex (không phân biệt hoa/thường) trên query sạch; index còn khớp cả bản không dấu
+    truth, regex_lat = [], []
+    for q in queries:
+        keys, ms = await regex_scan(col, q, args.limit)
+        truth.append(keys)
+        regex_lat.append(ms)
+    print(f"regex scan                 {percentiles(regex_lat)}")
+
+    for rate in args.noise:
+        noisy = [corrupt(q, rate, rng) for q in queries]
+        for mode in ('substring', 'fuzzy'):
+            if mode == 'substring' and rate > 0:
+                continue
+            lat, recalls = [], []
+            for q, gt in zip(noisy, truth):
+                t0 = time.perf_counter()
+                hits = index.search(q, args.limit, args.threshold, substring=mode == 'substring')
+                lat.append((time.perf_counter() - t0) * 1000)
+                if gt:
+                    recalls.append(len({k for k, _ in hits} & gt) / len(gt))
+            recall = float(np.mean(recalls)) if recalls else 0.0
+            print(f"trigram {mode:<9} noise={rate:<4} recall={recall:.4f}  {percentiles(lat)}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the OCR trigram index against a $regex scan.")
+    parser.add_argument("--index_dir", type=str, default=None, help="FTS index directory (default: FTS_INDEX_DIR).")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--min_len", type=int, default=4)
+    parser.add_argument("--max_len", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--noise", type=float, nargs="+", default=[0.0, 0.1, 0.2],
+                        help="Per-character corruption rates for the fuzzy runs.")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,76 @@
+"""
+Latency and accuracy of exported text encoders against the float32 open_clip text tower (CPU).
+
+    python benchmark/text_encoder.py --artifacts indexes/text_encoder.onnx indexes/text_encoder.pt --batch_sizes 1 8 32
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+import open_clip
+
+ROOT_FOLDER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')
+)
+sys.path.insert(0, ROOT_FOLDER)
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'app'))
+
+from app.service.text_encoder import TorchTextEncoder, load_text_encoder, parity_report
+from migration.export_text_encoder import load_texts
+
+
+def time_encoder(encoder, tokens: torch.Tensor, batch_size: int, iters: int, warmup: int = 3) -> dict[str, float]:
+    batch = tokens[:batch_size]
+    if len(batch) < batch_size:
+        batch = tokens.repeat((batch_size + len(tokens) - 1) // len(tokens), 1)[:batch_size]
+    for _ in range(warmup):
+        encoder.encode(batch)
+    times = []
+    for _ in range(iters):
+        start = time.perf_counter()
+        encoder.encode(batch)
+        times.append((time.perf_counter() - start) * 1000)
+    times = np.asarray(times)
+    return {
+        'p50_ms': float(np.percentile(times, 50)),
+        'p95_ms': float(np.percentile(times, 95)),
+        'per_text_ms': float(np.percentile(times, 50)) / batch_size,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark exported CLIP text encoders.")
+    parser.add_argument("--artifacts", nargs="*", default=[], help="Exported .onnx / .pt files.")
+    parser.add_argument("--batch_sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--iters", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=None, help="torch / onnxruntime intra-op threads.")
+    parser.add_argument("--model_name", type=str, default=os.getenv("MODEL_NAME"))
+    parser.add_argument("--pretrained", type=str, default=os.getenv("PRETRAINED"))
+    parser.add_argument("--texts_file", type=str, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    model, _, _ = open_clip.create_model_and_transforms(args.model_name, pretrained=args.pretrained, force_quick_gelu=True)
+    tokenizer = open_clip.get_tokenizer(args.model_name)
+    tokens = tokenizer(load_texts(args.texts_file))
+
+    encoders = {'torch-fp32': TorchTextEncoder(model, 'cpu')}
+    for path in args.artifacts:
+        encoders[os.path.basename(path)] = load_text_encoder(path, args.model_name, args.pretrained, num_threads=args.threads)
+
+    reference = encoders['torch-fp32'].encode(tokens)
+    baseline: dict[int, float] = {}
+    print(f"{'encoder':<28}{'batch':>6}{'p50 ms':>10}{'p95 ms':>10}{'ms/text':>10}{'speedup':>9}{'min cos':>10}")
+    for name, encoder in encoders.items():
+        parity = parity_report(reference, encoder.encode(tokens))
+        for bs in args.batch_sizes:
+            t = time_encoder(encoder, tokens, bs, args.iters)
+            baseline.setdefault(bs, t['p50_ms'])
+            speedup = baseline[bs] / t['p50_ms'] if t['p50_ms'] else 0.0
+            print(f"{name:<28}{bs:>6}{t['p50_ms']:>10.2f}{t['p95_ms']:>10.2f}{t['per_text_ms']:>10.2f}"
+                  f"{speedup:>8.2f}x{parity['min_cosine']:>10.5f}")
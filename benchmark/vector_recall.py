@@ -0,0 +1,114 @@
+"""
+Recall@k / latency of the configured vector index against exact search.
+
+Ground truth is brute-force search over the full-precision embedding store with METRIC_TYPE (cosine, IP
+or L2), so this measures what a compressed index (IVF_SQ8, IVF_PQ, HNSW, BIN_*, usearch f16/i8) loses, with and without re-ranking.
+
+    python benchmark/vector_recall.py --queries 200 --top_k 100 --rerank_k 0 400 1000
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+import sys
+import os
+ROOT_FOLDER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')
+)
+sys.path.insert(0, ROOT_FOLDER)
+
+from app.core.settings import KeyFrameIndexMilvusSetting, IndexPathSettings
+from app.repository.embedding_store import EmbeddingStore
+from app.schema.interface import MilvusSearchRequest
+
+
+def exact_top_k(store: EmbeddingStore, queries: np.ndarray, top_k: int, metric_type: str, chunk: int = 100_000) -> np.ndarray:
+    q = queries.astype(np.float32)
+    if metric_type == 'COSINE':
+        q = q / np.linalg.norm(q, axis=1, keepdims=True)
+
+    best_scores = np.full((len(q), 0), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(q), 0), dtype=np.int64)
+    for start in range(0, len(store), chunk):
+        block = np.asarray(store.matrix[start:start + chunk], dtype=np.float32)
+        if metric_type == 'COSINE':
+            block = block / np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+        scores = q @ block.T
+        if metric_type == 'L2':
+            # -||q - b||^2 bỏ hằng số ||q||^2 theo từng query: lớn hơn = gần hơn
+            scores = 2 * scores - np.sum(block * block, axis=1)
+        ids = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+        all_scores = np.concatenate([best_scores, scores], axis=1)
+        all_ids = np.concatenate([best_ids, ids], axis=1)
+        k = min(top_k, all_scores.shape[1])
+        part = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(all_scores, part, axis=1)
+        best_ids = np.take_along_axis(all_ids, part, axis=1)
+    return best_ids
+
+
+def build_repository(store: EmbeddingStore, rerank_k: int):
+    milvus_setting = KeyFrameIndexMilvusSetting()
+    index_setting = IndexPathSettings()
+    if index_setting.VECTOR_BACKEND == 'usearch':
+        from app.repository.usearch_index import KeyframeUsearchRepository
+        return KeyframeUsearchRepository(
+            index_path=index_setting.USEARCH_INDEX_PATH,
+            metric_type=milvus_setting.METRIC_TYPE,
+            embedding_store=store,
+            rerank_k=rerank_k,
+        )
+
+    from pymilvus import connections, Collection
+    from app.repository.milvus import KeyframeVectorRepository, MAX_TOPK
+    if rerank_k > MAX_TOPK:
+        print(f"rerank_k={rerank_k} exceeds Milvus' max topk, using {MAX_TOPK}")
+        rerank_k = MAX_TOPK
+    if not connections.has_connection("default"):
+        connections.connect(alias="default", host=milvus_setting.HOST, port=milvus_setting.PORT)
+    return KeyframeVectorRepository(
+        collection=Collection(milvus_setting.COLLECTION_NAME, using="default"),
+        search_params={"metric_type": milvus_setting.METRIC_TYPE, "params": milvus_setting.SEARCH_PARAMS},
+        embedding_store=store,
+        rerank_k=rerank_k,
+    )
+
+
+async def evaluate(repo, queries: np.ndarray, truth: np.ndarray, top_k: int) -> tuple[float, float, float]:
+    recalls, latencies = [], []
+    for q, gt in zip(queries, truth):
+        t0 = time.perf_counter()
+        res = await repo.search_by_embedding(MilvusSearchRequest(embedding=q.tolist(), top_k=top_k))
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found = {int(r.id_) for r in res.results}
+        recalls.append(len(found & set(gt.tolist())) / len(gt))
+    return float(np.mean(recalls)), float(np.percentile(latencies, 50)), float(np.percentile(latencies, 95))
+
+
+async def main(args):
+    index_setting = IndexPathSettings()
+    store = EmbeddingStore(args.store_path or index_setting.EMBEDDING_STORE_PATH)
+    metric_type = KeyFrameIndexMilvusSetting().METRIC_TYPE
+
+    rng = np.random.default_rng(args.seed)
+    ids = rng.choice(len(store), size=min(args.queries, len(store)), replace=False)
+    queries = store.get_many(ids.tolist())
+    truth = exact_top_k(store, queries, args.top_k, metric_type)
+
+    print(f"{len(store)} vectors, {len(queries)} queries, recall@{args.top_k}")
+    for rerank_k in args.rerank_k:
+        repo = build_repository(store, rerank_k)
+        recall, p50, p95 = await evaluate(repo, queries, truth, args.top_k)
+        print(f"rerank_k={rerank_k:<6} recall={recall:.4f}  p50={p50:.2f}ms  p95={p95:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure ANN recall against exact search.")
+    parser.add_argument("--store_path", type=str, default=None, help="Embedding store .npy (default: EMBEDDING_STORE_PATH).")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top_k", type=int, default=100)
+    parser.add_argument("--rerank_k", type=int, nargs="+", default=[0])
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -1,5 +1,98 @@
+"""
+Multi-worker launcher.
+
+    python main.py --workers 4 --port 8000
+
+With SHARED_WEIGHTS_PATH set, the CLIP weights snapshot is written once here (before any worker
+starts) and every worker memory-maps it, so RAM does not grow with the worker count. Torch threads
+are split across workers unless TORCH_NUM_THREADS is set explicitly. Relative path settings
+(indexes, caches, data folder) are resolved against the directory the launcher is started from,
+like the migrations that write them.
+"""
+import argparse
+import os
+import sys
+
+ROOT_FOLDER = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(ROOT_FOLDER, 'app')
+sys.path.insert(0, ROOT_FOLDER)
+sys.path.insert(0, APP_DIR)
+
+
+# setting đường dẫn: mọi field *_PATH / *_DIR / *_FOLDER của các class settings
+PATH_SUFFIXES = ('_PATH', '_DIR', '_FOLDER')
+
+
+def absolutize_path_settings() -> None:
+    """
+    Workers run after os.chdir(APP_DIR), while migrations write indexes relative to the directory the
+    launcher is started from. Resolve every relative path setting here and hand it to the workers
+    through the environment (load_dotenv does not override variables that are already set).
+    """
+    from pydantic_settings import BaseSettings
+    import app.core.settings as settings_module
+
+    for cls in vars(settings_module).values():
+        if not (isinstance(cls, type) and issubclass(cls, BaseSettings)) or cls is BaseSettings:
+            continue
+        for name, field in cls.model_fields.items():
+            if not name.endswith(PATH_SUFFIXES):
+                continue
+            value = os.environ.get(name, field.default)
+            if isinstance(value, str) and value and not os.path.isabs(value):
+                os.environ[name] = os.path.abspath(value)
+
+
+def preload_shared_weights(path: str, model_name: str, pretrained: str) -> None:
+    from app.service.shared_weights import snapshot_matches, export_shared_weights
+    if snapshot_matches(path, model_name, pretrained):
+        return
+    import open_clip
+
+    print(f"Writing shared weights snapshot for {model_name}/{pretrained} to {path}")
+    model, _, _ = open_clip.create_model_and_transforms(model_name, pretrained=pretrained, force_quick_gelu=True)
+    export_shared_weights(model, path, model_name, pretrained)
+
+
 def main():
-    print("Hello from hcmai2025-baseline!")
+    parser = argparse.ArgumentParser(description="Run the keyframe search API with several worker processes.")
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4))
+    parser.add_argument("--log_level", type=str, default="info")
+    args = parser.parse_args()
+
+    # worker chạy sau os.chdir(APP_DIR): đường dẫn tương đối phải tuyệt đối hoá trước
+    absolutize_path_settings()
+    from app.core.settings import InferenceSettings, AppSettings
+    inference_settings = InferenceSettings()
+
+    if inference_settings.SHARED_WEIGHTS_PATH and not inference_settings.TEXT_ENCODER_PATH:
+        app_settings = AppSettings()
+        preload_shared_weights(
+            inference_settings.SHARED_WEIGHTS_PATH,
+            app_settings.MODEL_NAME,
+            app_settings.PRETRAINED,
+        )
+    elif args.workers > 1 and not inference_settings.TEXT_ENCODER_PATH:
+        print("Warning: SHARED_WEIGHTS_PATH is not set, every worker loads its own copy of the model.")
+
+    if not inference_settings.TORCH_NUM_THREADS:
+        # chia core cho các worker, tránh oversubscription
+        os.environ["TORCH_NUM_THREADS"] = str(max(1, (os.cpu_count() or 1) // args.workers))
+
+    import uvicorn
+
+    # app/main.py mount static/templates theo đường dẫn tương đối
+    os.chdir(APP_DIR)
+    uvicorn.run(
+        "main:app",
+        app_dir=APP_DIR,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+    )
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ from pymilvus import Collection, connections, FieldSchema, CollectionSchema, Dat
 from typing import Optional
 from tqdm import tqdm
 import argparse
+import json
 
 import sys
 import os
@@ -14,7 +15,73 @@ sys.path.insert(0, ROOT_FOLDER)
 
 
 
-from app.core.settings import KeyFrameIndexMilvusSetting
+from app.core.settings import KeyFrameIndexMilvusSetting, IndexPathSettings, CacheSettings
+from app.common.data_version import bump_data_version
+from app.repository.embedding_store import EmbeddingStore
+from app.repository.video_index import VideoIndex
+from app.repository.usearch_index import USEARCH_METRICS
+
+
+# build params mặc định cho các index nén; override bằng INDEX_PARAMS
+DEFAULT_INDEX_PARAMS = {
+    "FLAT": {},
+    "IVF_FLAT": {"nlist": 1024},
+    "IVF_SQ8": {"nlist": 1024},
+    "IVF_PQ": {"nlist": 1024, "m": 16, "nbits": 8},
+    "HNSW": {"M": 16, "efConstruction": 200},
+    "BIN_FLAT": {},
+    "BIN_IVF_FLAT": {"nlist": 1024},
+}
+
+
+def is_binary_index(index_type: str) -> bool:
+    return index_type.startswith("BIN_")
+
+
+def binarize(embeddings: np.ndarray) -> list[bytes]:
+    # sign quantization: 1 bit / chiều, dim phải chia hết cho 8
+    return [row.tobytes() for row in np.packbits(embeddings > 0, axis=1)]
+
+
+def load_id_map(id_map_path: str, num_vectors: int) -> dict[str, np.ndarray]:
+    """
+    clip_idmap.json ({key: "Lxx_Vyyy_zzzzzz"}, cùng file với keyframe_migration.py)
+    -> các cột scalar group_num / video_num / keyframe_num theo id (hàng i = id i).
+    """
+    with open(id_map_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    columns = {name: np.full(num_vectors, -1, dtype=np.int64) for name in ("group_num", "video_num", "keyframe_num")}
+    for key, value in data.items():
+        idx = int(key)
+        if not 0 <= idx < num_vectors:
+            continue
+        group, video, keyframe = value.split('_')
+        columns["group_num"][idx] = int(group[1:])
+        columns["video_num"][idx] = int(video[1:])
+        columns["keyframe_num"][idx] = int(keyframe)
+    return columns
+
+
+def load_embeddings(embedding_file_path: str) -> np.ndarray:
+    print(f"Loading embeddings from {embedding_file_path}")
+    if embedding_file_path.endswith('.npy'):
+        # output của image_embedding_migration.py --export (hàng i = key i)
+        embeddings = np.load(embedding_file_path, mmap_mode='r')
+        print(f"Loaded {embeddings.shape[0]} embeddings with dimension {embeddings.shape[1]}")
+        return embeddings
+    device = 'mps' if torch.backends.mps.is_available() else 'cuda' if torch.cuda.is_available() else 'cpu'
+    embeddings = torch.load(embedding_file_path, weights_only=False, map_location=device)
+    
+    if isinstance(embeddings, torch.Tensor):
+        embeddings = embeddings.cpu().numpy()
+    
+    if embeddings.ndim == 1:
+        embeddings = embeddings.reshape(1, -1)
+
+    num_vectors, embedding_dim = embeddings.shape
+    print(f"Loaded {num_vectors} embeddings with dimension {embedding_dim}")
+    return embeddings
 
 
 class MilvusEmbeddingInjector:
@@ -56,11 +123,20 @@ class MilvusEmbeddingInjector:
         
     
     
-    def create_collection(self, embedding_dim: int, index_params: Optional[dict] = None):
+    def create_collection(self, embedding_dim: int, index_params: Optional[dict] = None, with_scalars: bool = False):
+        index_type = self.setting.INDEX_TYPE
+        vector_dtype = DataType.BINARY_VECTOR if is_binary_index(index_type) else DataType.FLOAT_VECTOR
         fields = [
             FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
-            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=embedding_dim)
+            FieldSchema(name="embedding", dtype=vector_dtype, dim=embedding_dim)
         ]
+        if with_scalars:
+            # group_num là partition key: filter theo group chỉ quét partition tương ứng
+            fields += [
+                FieldSchema(name="group_num", dtype=DataType.INT64, is_partition_key=True),
+                FieldSchema(name="video_num", dtype=DataType.INT64),
+                FieldSchema(name="keyframe_num", dtype=DataType.INT64),
+            ]
         
         schema = CollectionSchema(fields, f"Collection for {self.collection_name} embeddings")
         
@@ -69,12 +145,17 @@ class MilvusEmbeddingInjector:
         
         if index_params is None:
             index_params = {
-                "metric_type": self.setting.METRIC_TYPE,
-                "index_type": self.setting.INDEX_TYPE,
+                "metric_type": "HAMMING" if is_binary_index(index_type) else self.setting.METRIC_TYPE,
+                "index_type": index_type,
+                "params": self.setting.INDEX_PARAMS or DEFAULT_INDEX_PARAMS.get(index_type, {}),
             }
         
         collection.create_index("embedding", index_params)
-        print("Created index for embedding field")
+        print(f"Created {index_type} index for embedding field with params {index_params['params']}")
+
+        if with_scalars:
+            collection.create_index("video_num", {"index_type": "INVERTED"})
+            print("Created scalar index for video_num")
         
         return collection
     
@@ -82,19 +163,11 @@ class MilvusEmbeddingInjector:
         self, 
         embedding_file_path: str, 
         batch_size: int = 10000,
+        id_map_path: Optional[str] = None,
     ):
-        print(f"Loading embeddings from {embedding_file_path}")
-        device = 'mps' if torch.backends.mps.is_available() else 'cuda' if torch.cuda.is_available() else 'cpu'
-        embeddings = torch.load(embedding_file_path, weights_only=False, map_location=device)
-        
-        if isinstance(embeddings, torch.Tensor):
-            embeddings = embeddings.cpu().numpy()
-        
-        if embeddings.ndim == 1:
-            embeddings = embeddings.reshape(1, -1)
-        
+        embeddings = load_embeddings(embedding_file_path)
         num_vectors, embedding_dim = embeddings.shape
-        print(f"Loaded {num_vectors} embeddings with dimension {embedding_dim}")
+        scalars = load_id_map(id_map_path, num_vectors) if id_map_path else None
         
     
         
@@ -102,7 +175,7 @@ class MilvusEmbeddingInjector:
             print(f"Dropping existing collection '{self.collection_name}' before creation...")
             utility.drop_collection(self.collection_name, using=self.alias)
 
-        collection = self.create_collection(embedding_dim)
+        collection = self.create_collection(embedding_dim, with_scalars=scalars is not None)
      
       
         
@@ -110,10 +183,15 @@ class MilvusEmbeddingInjector:
         
         for i in tqdm(range(0, num_vectors, batch_size), desc="Inserting batches"):
             end_idx = min(i + batch_size, num_vectors)
-            batch_embeddings = embeddings[i:end_idx].tolist()
+            if is_binary_index(self.setting.INDEX_TYPE):
+                batch_embeddings = binarize(embeddings[i:end_idx])
+            else:
+                batch_embeddings = embeddings[i:end_idx].tolist()
 
             batch_ids = list(range(i, end_idx))
             entities = [batch_ids, batch_embeddings]
+            if scalars is not None:
+                entities += [scalars[name][i:end_idx].tolist() for name in ("group_num", "video_num", "keyframe_num")]
             collection.insert(entities)
         
         collection.flush()
@@ -138,9 +216,37 @@ class MilvusEmbeddingInjector:
             print("Disconnected from Milvus")
 
 
+class UsearchEmbeddingInjector:
+    """
+    Build a usearch index file for the in-process vector backend (VECTOR_BACKEND=usearch).
+    Keys are the same row ids used for the Milvus collection.
+    """
+    def __init__(self, setting: KeyFrameIndexMilvusSetting, index_path: str, dtype: str = 'f32'):
+        self.setting = setting
+        self.index_path = index_path
+        self.dtype = dtype  # f16 / i8: usearch lượng tử hoá khi add
+
+    def inject_embeddings(self, embedding_file_path: str, batch_size: int = 10000):
+        from usearch.index import Index
+
+        embeddings = load_embeddings(embedding_file_path).astype(np.float32)
+        num_vectors, embedding_dim = embeddings.shape
+
+        index = Index(ndim=embedding_dim, metric=USEARCH_METRICS[self.setting.METRIC_TYPE], dtype=self.dtype)
+        for i in tqdm(range(0, num_vectors, batch_size), desc="Indexing batches"):
+            end_idx = min(i + batch_size, num_vectors)
+            index.add(np.arange(i, end_idx, dtype=np.uint64), embeddings[i:end_idx])
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        index.save(self.index_path)
+        print(f"Saved usearch index with {len(index)} vectors to {self.index_path}")
+        return index
+
+
 def inject_embeddings_simple(
     embedding_file_path: str,
-    setting: KeyFrameIndexMilvusSetting
+    setting: KeyFrameIndexMilvusSetting,
+    id_map_path: Optional[str] = None
 ):
     injector = MilvusEmbeddingInjector(
         setting=setting,
@@ -152,7 +258,8 @@ def inject_embeddings_simple(
 
     injector.inject_embeddings(
         embedding_file_path=embedding_file_path,
-        batch_size=setting.BATCH_SIZE
+        batch_size=setting.BATCH_SIZE,
+        id_map_path=id_map_path
     )
     count = injector.get_collection_info()
     print(f"Successfully injected embeddings! Total entities: {count}")
@@ -165,10 +272,53 @@ if __name__ == "__main__":
     parser.add_argument(
         "--file_path", type=str, help="Path to embedding pt."
     )
+    parser.add_argument(
+        "--id_map", type=str, default=os.getenv("ID2INDEX_PATH"),
+        help="clip_idmap.json; stores group_num/video_num/keyframe_num as Milvus scalar fields for filtered search."
+    )
+    parser.add_argument(
+        "--backend", type=str, choices=["milvus", "usearch"], default=None,
+        help="Vector backend to build (default: VECTOR_BACKEND setting)."
+    )
     args = parser.parse_args()
 
     setting =  KeyFrameIndexMilvusSetting()
-    inject_embeddings_simple(
-        embedding_file_path=args.file_path,
-        setting=setting
-    )
\ No newline at end of file
+    index_setting = IndexPathSettings()
+    backend = args.backend or index_setting.VECTOR_BACKEND
+
+    if (is_binary_index(setting.INDEX_TYPE) or setting.RERANK_K > 0) and not index_setting.EMBEDDING_STORE_PATH:
+        print("Warning: binary indexes and RERANK_K need EMBEDDING_STORE_PATH for full-precision re-ranking.")
+
+    if index_setting.EMBEDDING_STORE_PATH:
+        # ma trận embedding đầy đủ dạng memmap cho lookup O(1) theo id (search_by_img_id)
+        EmbeddingStore.write(index_setting.EMBEDDING_STORE_PATH, load_embeddings(args.file_path))
+        print(f"Wrote embedding store to {index_setting.EMBEDDING_STORE_PATH}")
+
+    if index_setting.VIDEO_INDEX_PATH:
+        if args.id_map and os.path.exists(args.id_map):
+            # embedding trung bình theo video cho coarse-to-fine search
+            embeddings = load_embeddings(args.file_path)
+            columns = load_id_map(args.id_map, embeddings.shape[0])
+            video_index = VideoIndex.build(embeddings, np.arange(embeddings.shape[0]), columns["group_num"], columns["video_num"])
+            video_index.save(index_setting.VIDEO_INDEX_PATH)
+            print(f"Wrote video index ({len(video_index)} videos) to {index_setting.VIDEO_INDEX_PATH}")
+        else:
+            print("Warning: VIDEO_INDEX_PATH needs --id_map (keyframe -> video mapping); video index not built.")
+
+    if backend == "usearch":
+        if not index_setting.USEARCH_INDEX_PATH:
+            print("USEARCH_INDEX_PATH is not set.")
+            sys.exit(1)
+        UsearchEmbeddingInjector(setting, index_setting.USEARCH_INDEX_PATH, index_setting.USEARCH_DTYPE).inject_embeddings(
+            embedding_file_path=args.file_path,
+            batch_size=setting.BATCH_SIZE
+        )
+    else:
+        inject_embeddings_simple(
+            embedding_file_path=args.file_path,
+            setting=setting,
+            id_map_path=args.id_map if args.id_map and os.path.exists(args.id_map) else None
+        )
+
+    # server đang chạy sẽ bỏ các kết quả đã cache trên dữ liệu cũ
+    bump_data_version(CacheSettings().DATA_VERSION_PATH)
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Export CLIP's text tower to a CPU serving artifact (TorchScript or ONNX, optionally dynamic int8),
+check cosine parity against the float32 torch model, and write <artifact>.json with the result.
+An artifact below --min_cosine is deleted; the server refuses artifacts without a passing <artifact>.json.
+
+    python migration/export_text_encoder.py --format onnx --output indexes/text_encoder.onnx --int8
+    TEXT_ENCODER_PATH=indexes/text_encoder.onnx  # then serve from it
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import torch
+import open_clip
+
+ROOT_FOLDER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')
+)
+sys.path.insert(0, ROOT_FOLDER)
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'app'))
+
+from app.service.text_encoder import (
+    TextEncoderModule,
+    TorchTextEncoder,
+    TorchScriptTextEncoder,
+    OnnxTextEncoder,
+    artifact_meta_path,
+    parity_report,
+)
+
+PARITY_TEXTS = [
+    "a person walking in the park",
+    "sunset over the mountains",
+    "a news anchor reading the news in a studio",
+    "a red car driving on a highway at night",
+    "children playing football on a field",
+    "a close-up of a bowl of noodles",
+    "firefighters putting out a fire",
+    "a crowded market with many people",
+    "an aerial view of a city with tall buildings",
+    "a boat on a river surrounded by trees",
+    "a man giving a speech at a podium",
+    "a woman holding a microphone interviewing someone",
+    "traffic jam with motorbikes",
+    "a dog running on the beach",
+    "a map shown on a television screen",
+    "two people shaking hands",
+]
+
+
+def load_texts(path: str | None) -> list[str]:
+    if not path:
+        return PARITY_TEXTS
+    with open(path, encoding='utf-8') as f:
+        texts = [line.strip() for line in f if line.strip()]
+    return texts or PARITY_TEXTS
+
+
+def export_torchscript(module: torch.nn.Module, sample: torch.Tensor, output: str, int8: bool) -> None:
+    if int8:
+        module = torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+    with torch.no_grad():
+        traced = torch.jit.trace(module, sample, check_trace=False)
+    traced = torch.jit.freeze(traced.eval())
+    torch.jit.save(traced, output)
+
+
+def export_onnx(module: torch.nn.Module, sample: torch.Tensor, output: str, int8: bool, opset: int) -> None:
+    fp32_path = f"{output}.fp32.onnx" if int8 else output
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            (sample,),
+            fp32_path,
+            input_names=['tokens'],
+            output_names=['embeddings'],
+            dynamic_axes={'tokens': {0: 'batch'}, 'embeddings': {0: 'batch'}},
+            opset_version=opset,
+        )
+    if int8:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, output, weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the CLIP text encoder for CPU serving.")
+    parser.add_argument("--format", choices=["onnx", "torchscript"], default="onnx")
+    parser.add_argument("--output", type=str, required=True, help="Artifact path (.onnx or .pt).")
+    parser.add_argument("--int8", action="store_true", help="Dynamic int8 quantization of Linear layers.")
+    parser.add_argument("--model_name", type=str, default=os.getenv("MODEL_NAME"))
+    parser.add_argument("--pretrained", type=str, default=os.getenv("PRETRAINED"))
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--texts_file", type=str, default=None, help="Parity prompts, one per line (e.g. real query logs).")
+    parser.add_argument("--min_cosine", type=float, default=0.99, help="Fail if any parity prompt falls below this.")
+    args = parser.parse_args()
+
+    if not args.model_name or not args.pretrained:
+        print("MODEL_NAME / PRETRAINED are not set.")
+        sys.exit(1)
+    if args.format == "onnx" and not args.output.endswith(".onnx"):
+        print("ONNX artifacts must end with .onnx")
+        sys.exit(1)
+
+    model, _, _ = open_clip.create_model_and_transforms(args.model_name, pretrained=args.pretrained, force_quick_gelu=True)
+    model = model.eval().to('cpu')
+    tokenizer = open_clip.get_tokenizer(args.model_name)
+    tokens = tokenizer(load_texts(args.texts_file))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    module = TextEncoderModule(model).eval()
+    if args.format == "onnx":
+        export_onnx(module, tokens[:2], args.output, args.int8, args.opset)
+        exported = OnnxTextEncoder(args.output)
+    else:
+        export_torchscript(module, tokens[:2], args.output, args.int8)
+        exported = TorchScriptTextEncoder(args.output)
+
+    reference = TorchTextEncoder(model, 'cpu').encode(tokens)
+    parity = parity_report(reference, exported.encode(tokens))
+    print(f"Parity vs torch float32 over {len(tokens)} prompts: "
+          f"min cosine {parity['min_cosine']:.5f}, mean cosine {parity['mean_cosine']:.5f}")
+
+    if parity['min_cosine'] < args.min_cosine:
+        # không để lại artifact hỏng cho TEXT_ENCODER_PATH trỏ tới
+        for path in (args.output, artifact_meta_path(args.output)):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"Parity below --min_cosine {args.min_cosine}; removed {args.output}.")
+        sys.exit(1)
+
+    meta = {
+        "model_name": args.model_name,
+        "pretrained": args.pretrained,
+        "format": args.format,
+        "int8": args.int8,
+        "dim": int(reference.shape[1]),
+        **parity,
+        "required_min_cosine": args.min_cosine,
+        "passed": True,
+    }
+    with open(artifact_meta_path(args.output), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output) / 2**20:.1f} MiB)")
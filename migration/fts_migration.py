@@ -0,0 +1,93 @@
+"""
+Build the in-process BM25 indexes (FTS_INDEX_DIR/asr, FTS_INDEX_DIR/ocr) and the OCR trigram index
+(FTS_INDEX_DIR/ocr_trigram) from the speech captions and keyframe OCR text in MongoDB.
+Run after keyframe_migration.py (which calls it when FTS_INDEX_DIR is set):
+
+    python migration/fts_migration.py --index_dir indexes/fts
+"""
+import sys
+import os
+ROOT_FOLDER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')
+)
+sys.path.insert(0, ROOT_FOLDER)
+
+import argparse
+import asyncio
+import numpy as np
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.settings import MongoDBSettings, FullTextSettings, CacheSettings
+from app.common.data_version import bump_data_version
+from app.models.keyframe import Keyframe
+from app.models.speech_caption import SpeechCaption
+from app.repository.bm25_index import BM25Index, ASR_DOC_DTYPE, OCR_DOC_DTYPE
+from app.repository.trigram_index import TrigramIndex
+
+
+def ocr_text(value) -> str:
+    # ocr có thể là chuỗi hoặc list dòng chữ
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value if v)
+    return str(value or "")
+
+
+async def build_fts_indexes(index_dir: str, fold: bool = True, k1: float = 1.2, b: float = 0.75) -> None:
+    captions = await SpeechCaption.get_pymongo_collection().find(
+        {}, {"_id": 0, "group_num": 1, "video_num": 1, "start": 1, "end": 1, "text": 1}
+    ).to_list(length=None)
+    asr_info = np.array(
+        [(int(c["group_num"]), int(c["video_num"]), float(c["start"]), float(c["end"])) for c in captions],
+        dtype=ASR_DOC_DTYPE,
+    )
+    asr = BM25Index.build((c.get("text", "") for c in captions), asr_info, fold=fold, k1=k1, b=b)
+    asr.save(os.path.join(index_dir, 'asr'))
+    print(f"Wrote ASR BM25 index ({len(asr)} captions, {asr.meta['num_terms']} terms)")
+
+    keyframes = await Keyframe.get_pymongo_collection().find(
+        {"ocr": {"$exists": True, "$nin": ["", None, []]}}, {"_id": 0, "key": 1, "ocr": 1}
+    ).to_list(length=None)
+    if not keyframes:
+        print("No keyframe OCR text found, OCR index not built")
+        return
+    ocr_info = np.array([(int(k["key"]),) for k in keyframes], dtype=OCR_DOC_DTYPE)
+    ocr = BM25Index.build((ocr_text(k["ocr"]) for k in keyframes), ocr_info, fold=fold, k1=k1, b=b)
+    ocr.save(os.path.join(index_dir, 'ocr'))
+    print(f"Wrote OCR BM25 index ({len(ocr)} keyframes, {ocr.meta['num_terms']} terms)")
+
+    trigram = TrigramIndex.build((int(k["key"]) for k in keyframes), (ocr_text(k["ocr"]) for k in keyframes), fold=fold)
+    trigram.save(os.path.join(index_dir, 'ocr_trigram'))
+    print(f"Wrote OCR trigram index ({len(trigram)} keyframes, {trigram.meta['num_trigrams']} trigrams)")
+
+
+async def main(args):
+    setting = MongoDBSettings()
+    client = AsyncIOMotorClient(
+        host=setting.MONGO_HOST,
+        port=setting.MONGO_PORT,
+        username=setting.MONGO_USER,
+        password=setting.MONGO_PASSWORD,
+    )
+    await init_beanie(database=client[setting.MONGO_DB], document_models=[Keyframe, SpeechCaption])
+    await build_fts_indexes(args.index_dir, fold=args.fold, k1=args.k1, b=args.b)
+    # server đang chạy sẽ bỏ các kết quả đã cache trên dữ liệu cũ
+    bump_data_version(CacheSettings().DATA_VERSION_PATH)
+
+
+if __name__ == "__main__":
+    fts_setting = FullTextSettings()
+    parser = argparse.ArgumentParser(description="Build BM25 full-text indexes for ASR and OCR.")
+    parser.add_argument("--index_dir", type=str, default=fts_setting.FTS_INDEX_DIR)
+    parser.add_argument("--fold", action=argparse.BooleanOptionalAction, default=fts_setting.FTS_FOLD_DIACRITICS,
+                        help="Fold Vietnamese diacritics (query 'ha noi' matches 'Hà Nội').")
+    parser.add_argument("--k1", type=float, default=fts_setting.FTS_BM25_K1)
+    parser.add_argument("--b", type=float, default=fts_setting.FTS_BM25_B)
+    args = parser.parse_args()
+
+    if not args.index_dir:
+        print("Set --index_dir or FTS_INDEX_DIR.")
+        sys.exit(1)
+
+    asyncio.run(main(args))
@@ -0,0 +1,245 @@
+"""
+Compute CLIP image embeddings for every keyframe under DATA_FOLDER
+(Keyframes_Lxx/Lxx_Vyyy/zzz.jpg, the layout used by KeyframeQueryService.convert_model_to_path).
+
+Vectors are written as fixed-size chunks (chunk_xxxxx.npy + chunk_xxxxx.keys.npy) next to a
+manifest.json. Each chunk and the manifest are replaced atomically, so an interrupted run resumes
+from the last finished chunk, and re-running after adding a video folder only encodes the new frames.
+
+    python migration/image_embedding_migration.py --output_dir indexes/image_embeddings --export indexes/keyframe_embeddings.npy
+    python migration/embedding_migration.py --file_path indexes/keyframe_embeddings.npy
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import torch
+import open_clip
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+from tqdm import tqdm
+
+ROOT_FOLDER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')
+)
+sys.path.insert(0, ROOT_FOLDER)
+
+from app.repository.embedding_store import EmbeddingStore
+
+FRAME_PATTERN = re.compile(r'Keyframes_L(\d+)[/\\]L(\d+)_V(\d+)[/\\](\d+)\.jpg$')
+MANIFEST = 'manifest.json'
+
+
+def frame_name(group_num: int, video_num: int, keyframe_num: int) -> str:
+    # cùng định dạng value trong clip_idmap.json
+    return f"L{group_num:02d}_V{video_num:03d}_{keyframe_num:03d}"
+
+
+def scan_frames(data_folder: str) -> list[tuple[str, str]]:
+    """[(frame name, image path)] for every keyframe image, sorted by (group, video, keyframe)."""
+    frames = []
+    for root, _, files in os.walk(data_folder):
+        for fname in files:
+            path = os.path.join(root, fname)
+            m = FRAME_PATTERN.search(os.path.relpath(path, data_folder))
+            if m:
+                group_num, _, video_num, keyframe_num = map(int, m.groups())
+                frames.append(((group_num, video_num, keyframe_num), path))
+    frames.sort()
+    return [(frame_name(*gvk), path) for gvk, path in frames]
+
+
+def assign_keys(frames: list[tuple[str, str]], id_map_path: str | None) -> dict[str, int]:
+    """
+    Frame name -> key. Existing keys from clip_idmap.json are kept (they are the ids in Mongo/Milvus);
+    new frames get ids after the current maximum and the id map is rewritten.
+    """
+    id_map: dict[str, str] = {}
+    if id_map_path and os.path.exists(id_map_path):
+        with open(id_map_path, encoding='utf-8') as f:
+            id_map = json.load(f)
+
+    keys = {name: int(key) for key, name in id_map.items()}
+    next_key = max(keys.values(), default=-1) + 1
+    added = 0
+    for name, _ in frames:
+        if name not in keys:
+            keys[name] = next_key
+            id_map[str(next_key)] = name
+            next_key += 1
+            added += 1
+
+    if added and id_map_path:
+        tmp_path = f"{id_map_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(id_map, f, ensure_ascii=False)
+        os.replace(tmp_path, id_map_path)
+        print(f"Added {added} new keyframes to {id_map_path}")
+    return keys
+
+
+class ChunkedEmbeddingWriter:
+    def __init__(self, output_dir: str, model_name: str, pretrained: str, restart: bool = False, force_quick_gelu: bool = True):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest_path = os.path.join(output_dir, MANIFEST)
+
+        manifest = None
+        if os.path.exists(self.manifest_path) and not restart:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            # manifest cũ (chưa ghi force_quick_gelu) luôn encode với QuickGELU
+            encoded_with = (manifest['model_name'], manifest['pretrained'], manifest.get('force_quick_gelu', True))
+            if encoded_with != (model_name, pretrained, force_quick_gelu):
+                raise ValueError(
+                    f"{output_dir} holds {manifest['model_name']}/{manifest['pretrained']} embeddings "
+                    f"(force_quick_gelu={encoded_with[2]}); use --restart to recompute with "
+                    f"{model_name}/{pretrained} (force_quick_gelu={force_quick_gelu})"
+                )
+        self.manifest = manifest or {
+            'model_name': model_name,
+            'pretrained': pretrained,
+            'force_quick_gelu': force_quick_gelu,
+            'dim': None,
+            'chunks': [],
+        }
+
+    def done_keys(self) -> set[int]:
+        done = set()
+        for chunk in self.manifest['chunks']:
+            done.update(np.load(os.path.join(self.output_dir, chunk['keys'])).tolist())
+        return done
+
+    def write_chunk(self, keys: np.ndarray, vectors: np.ndarray) -> None:
+        idx = len(self.manifest['chunks'])
+        vec_file, key_file = f"chunk_{idx:05d}.npy", f"chunk_{idx:05d}.keys.npy"
+        for fname, arr in ((vec_file, vectors.astype(np.float32)), (key_file, keys.astype(np.int64))):
+            tmp_path = os.path.join(self.output_dir, f"{fname}.tmp.npy")
+            np.save(tmp_path, arr)
+            os.replace(tmp_path, os.path.join(self.output_dir, fname))
+
+        self.manifest['dim'] = int(vectors.shape[1])
+        self.manifest['chunks'].append({'vectors': vec_file, 'keys': key_file, 'count': int(len(keys))})
+        # manifest ghi sau cùng: chunk chỉ "tồn tại" khi đã có trong manifest
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def export(self, path: str) -> None:
+        """
+        Assemble all chunks into one (max_key + 1, dim) matrix, row i = key i. Fails if a key below
+        max_key was never encoded: the row would be a zero vector, invalid under COSINE.
+        """
+        chunks = self.manifest['chunks']
+        if not chunks:
+            raise ValueError("No embeddings to export")
+        max_key = max(int(np.load(os.path.join(self.output_dir, c['keys'])).max()) for c in chunks)
+        matrix = np.zeros((max_key + 1, self.manifest['dim']), dtype=np.float32)
+        filled = np.zeros(max_key + 1, dtype=bool)
+        for c in chunks:
+            keys = np.load(os.path.join(self.output_dir, c['keys']))
+            matrix[keys] = np.load(os.path.join(self.output_dir, c['vectors']), mmap_mode='r')
+            filled[keys] = True
+        gaps = np.flatnonzero(~filled)
+        if len(gaps):
+            raise ValueError(
+                f"{len(gaps)} keys in 0..{max_key} have no embedding (e.g. {gaps[:10].tolist()}); "
+                f"their images are missing under DATA_FOLDER. Restore the images or remove the keys from the id map."
+            )
+        EmbeddingStore.write(path, matrix)
+
+
+class KeyframeImageDataset(Dataset):
+    def __init__(self, items: list[tuple[int, str]], preprocess):
+        self.items = items
+        self.preprocess = preprocess
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, i):
+        key, path = self.items[i]
+        with Image.open(path) as img:
+            return key, self.preprocess(img.convert('RGB'))
+
+
+def encode_frames(
+    writer: ChunkedEmbeddingWriter,
+    items: list[tuple[int, str]],
+    model,
+    preprocess,
+    batch_size: int,
+    chunk_size: int,
+    num_workers: int,
+    device: str,
+) -> None:
+    loader = DataLoader(
+        KeyframeImageDataset(items, preprocess),
+        batch_size=batch_size,
+        num_workers=num_workers,
+        pin_memory=device == 'cuda',
+    )
+    pending_keys, pending_vecs, pending = [], [], 0
+    autocast = torch.autocast(device_type='cuda', dtype=torch.float16) if device == 'cuda' else contextlib.nullcontext()
+    with torch.no_grad(), autocast:
+        for keys, pixels in tqdm(loader, desc='Encoding keyframes', total=len(loader)):
+            vecs = model.encode_image(pixels.to(device, non_blocking=True)).float().cpu().numpy()
+            pending_keys.append(keys.numpy())
+            pending_vecs.append(vecs)
+            pending += len(vecs)
+            if pending >= chunk_size:
+                writer.write_chunk(np.concatenate(pending_keys), np.concatenate(pending_vecs))
+                pending_keys, pending_vecs, pending = [], [], 0
+    if pending:
+        writer.write_chunk(np.concatenate(pending_keys), np.concatenate(pending_vecs))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute CLIP embeddings for keyframe images (resumable).")
+    parser.add_argument("--data_folder", type=str, default=os.getenv("DATA_FOLDER"))
+    parser.add_argument("--output_dir", type=str, required=True, help="Chunk + manifest directory.")
+    parser.add_argument("--id_map", type=str, default=os.getenv("ID2INDEX_PATH"),
+                        help="clip_idmap.json; existing keys are kept, new frames are appended.")
+    parser.add_argument("--model_name", type=str, default=os.getenv("MODEL_NAME"))
+    parser.add_argument("--pretrained", type=str, default=os.getenv("PRETRAINED"))
+    parser.add_argument("--force_quick_gelu", action=argparse.BooleanOptionalAction, default=True,
+                        help="QuickGELU activations (OpenAI checkpoints); --no-force_quick_gelu for SigLIP etc.")
+    parser.add_argument("--batch_size", type=int, default=256)
+    parser.add_argument("--chunk_size", type=int, default=8192, help="Vectors per chunk file (resume granularity).")
+    parser.add_argument("--num_workers", type=int, default=min(8, os.cpu_count() or 1), help="Image decode workers.")
+    parser.add_argument("--export", type=str, default=None, help="Write the full matrix (row i = key i) to this .npy.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the existing manifest.")
+    args = parser.parse_args()
+
+    if not args.data_folder or not os.path.isdir(args.data_folder):
+        print(f"Data folder {args.data_folder} does not exist.")
+        sys.exit(1)
+
+    frames = scan_frames(args.data_folder)
+    keys = assign_keys(frames, args.id_map)
+    writer = ChunkedEmbeddingWriter(
+        args.output_dir, args.model_name, args.pretrained, restart=args.restart, force_quick_gelu=args.force_quick_gelu
+    )
+
+    done = writer.done_keys()
+    todo = [(keys[name], path) for name, path in frames if keys[name] not in done]
+    print(f"{len(frames)} keyframes found, {len(done)} already encoded, {len(todo)} to encode")
+
+    if todo:
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        model, _, preprocess = open_clip.create_model_and_transforms(args.model_name, pretrained=args.pretrained, force_quick_gelu=args.force_quick_gelu)
+        model = model.to(device).eval()
+        encode_frames(writer, todo, model, preprocess, args.batch_size, args.chunk_size, args.num_workers, device)
+
+    if args.export:
+        try:
+            writer.export(args.export)
+        except ValueError as e:
+            print(f"Not exported: {e}")
+            sys.exit(1)
+        print(f"Exported embeddings to {args.export}")
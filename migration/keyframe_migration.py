@@ -17,9 +17,12 @@ import argparse
 import string
 
 
-from app.core.settings import MongoDBSettings
+from app.core.settings import MongoDBSettings, IndexPathSettings, CacheSettings, FullTextSettings
+from app.common.data_version import bump_data_version
 from app.models.keyframe import Keyframe, ObjectCount
 from app.models.speech_caption import SpeechCaption
+from app.repository.keyframe_meta import KeyframeMetaTable
+from migration.fts_migration import build_fts_indexes
 
 SETTING = MongoDBSettings()
 
@@ -79,6 +82,11 @@ async def migrate_keyframes(file_path, object_folder):
     await Keyframe.insert_many(keyframes)
     print(f"Inserted {len(keyframes)} keyframes into the database.")
 
+    meta_path = IndexPathSettings().KEYFRAME_META_PATH
+    if meta_path:
+        KeyframeMetaTable.from_records(kf.model_dump() for kf in keyframes).save(meta_path)
+        print(f"Wrote keyframe metadata snapshot to {meta_path}")
+
 def preprocess_text(text: str) -> str:
     # return text.translate(str.maketrans('', '', string.punctuation)).lower()
     return text.lower()
@@ -111,6 +119,16 @@ async def main(args):
     await init_db()
     await migrate_keyframes(args.file_path, args.object_folder)
     await migrate_speech_captions(args.caption_folder)
+    fts_setting = FullTextSettings()
+    if fts_setting.FTS_INDEX_DIR:
+        await build_fts_indexes(
+            fts_setting.FTS_INDEX_DIR,
+            fold=fts_setting.FTS_FOLD_DIACRITICS,
+            k1=fts_setting.FTS_BM25_K1,
+            b=fts_setting.FTS_BM25_B
+        )
+    # server đang chạy sẽ bỏ các kết quả đã cache trên dữ liệu cũ
+    bump_data_version(CacheSettings().DATA_VERSION_PATH)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Migrate keyframes to MongoDB.")
@@ -0,0 +1,102 @@
+import math
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from repository.bm25_index import BM25Index, OCR_DOC_DTYPE, tokenize
+
+WORDS = [f"w{i}" for i in range(40)]
+
+
+def make_corpus(n_docs: int = 600, seed: int = 0) -> list[str]:
+    # tần suất kiểu Zipf: vài term rất phổ biến (idf thấp) + đuôi dài term hiếm -> MaxScore có cái để cắt
+    rng = np.random.default_rng(seed)
+    p = 1.0 / np.arange(1, len(WORDS) + 1)
+    p /= p.sum()
+    return [" ".join(rng.choice(WORDS, size=int(rng.integers(1, 15)), p=p)) for _ in range(n_docs)]
+
+
+def build(texts: list[str]) -> BM25Index:
+    doc_info = np.array([(i,) for i in range(len(texts))], dtype=OCR_DOC_DTYPE)
+    return BM25Index.build(texts, doc_info)
+
+
+def full_scan(index: BM25Index, text: str) -> dict[int, float]:
+    # chấm mọi doc (không cắt tỉa), cộng term theo cùng thứ tự với search() -> điểm float32 trùng khớp
+    term_ids = sorted({index.vocab[t] for t in tokenize(text, index.fold) if t in index.vocab})
+    term_ids.sort(key=lambda t: float(index.max_impact[t]))
+    docs = np.arange(len(index), dtype=np.int32)
+    scores = index._score([index._postings(t) for t in term_ids], docs)
+    return {int(d): float(s) for d, s in zip(docs, scores) if s > 0}
+
+
+def reference_bm25(texts: list[str], text: str, k1: float = 1.2, b: float = 0.75) -> dict[int, float]:
+    # công thức BM25 viết thẳng, không qua posting list
+    docs = [Counter(tokenize(t)) for t in texts]
+    lengths = [sum(d.values()) for d in docs]
+    avgdl = sum(lengths) / len(lengths)
+    scores: dict[int, float] = {}
+    for term in set(tokenize(text)):
+        df = sum(1 for d in docs if term in d)
+        if not df:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        for i, d in enumerate(docs):
+            tf = d.get(term, 0)
+            if tf:
+                norm = k1 * (1 - b + b * lengths[i] / avgdl)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+
+def test_maxscore_matches_full_scan():
+    texts = make_corpus()
+    index = build(texts)
+    queries = ["w0 w1", "w0 w1 w2 w3", "w0 w35", "w39", "w2 w2 w17 w0", "w5 w12 w20 w30 w38"]
+    for query in queries:
+        scores = full_scan(index, query)
+        best = sorted(scores.values(), reverse=True)
+        for limit in (1, 5, 20, 100, 1000):
+            hits = index.search(query, limit)
+            # cùng dãy điểm top-k; doc trùng điểm ở biên có thể khác nhau nên so điểm từng doc
+            assert [s for _, s in hits] == best[:limit], (query, limit)
+            assert all(scores[d] == s for d, s in hits), (query, limit)
+            assert len({d for d, _ in hits}) == len(hits)
+
+
+def test_scores_follow_bm25():
+    texts = make_corpus(200, seed=1)
+    index = build(texts)
+    expected = reference_bm25(texts, "w0 w3 w21")
+    hits = index.search("w0 w3 w21", 10)
+    assert len(hits) == 10
+    for doc, score in hits:
+        assert math.isclose(score, expected[doc], rel_tol=1e-4)
+    # không doc nào ngoài kết quả có điểm cao hơn doc cuối cùng
+    kth = hits[-1][1]
+    assert sum(1 for s in expected.values() if s > kth * (1 + 1e-4)) < 10
+
+
+def test_diacritics_folding_and_unknown_terms():
+    index = build(["Hà Nội mùa thu", "thành phố Hồ Chí Minh", "hà nội hà nội"])
+    hits = index.search("ha noi", 10)
+    assert [d for d, _ in hits] == [2, 0]
+    assert index.search("đà lạt", 10) == []
+    assert index.search("", 10) == []
+    assert index.search("ha noi", 0) == []
+    assert index.search_keys("HỒ CHÍ MINH", 1)[0][0] == 1
+
+
+def test_save_and_load_round_trip(tmp_path):
+    texts = make_corpus(100, seed=2)
+    index = build(texts)
+    path = str(tmp_path / 'ocr')
+    index.save(path)
+    assert BM25Index.exists(path)
+    loaded = BM25Index.load(path)
+    assert len(loaded) == len(index)
+    assert loaded.search("w0 w7", 10) == index.search("w0 w7", 10)
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from common.exclusion import DENSE_ID_LIMIT, ExclusionSet, ExclusionStore, merge_exclusions
+
+
+def test_add_remove_and_mask():
+    excl = ExclusionSet([3, 5, 5, -1])
+    assert len(excl) == 2
+    assert 3 in excl and 5 in excl and 4 not in excl
+    mask = excl.keep_mask(np.array([1, 3, 5, 7, 10_000]))
+    assert mask.tolist() == [True, False, False, True, True]
+
+    version = excl.version
+    assert excl.remove([3, 99]) == 1
+    assert excl.version != version
+    assert excl.to_list() == [5]
+
+
+def test_union_does_not_modify_session_set():
+    session = ExclusionSet([1, 2])
+    merged = session.union([7])
+    assert sorted(merged.to_list()) == [1, 2, 7]
+    assert session.to_list() == [1, 2]
+    assert merge_exclusions(None, None) is None
+    assert merge_exclusions(ExclusionSet(), [4]).to_list() == [4]
+    assert merge_exclusions(session, None) is session
+
+
+def test_out_of_range_ids_stay_sparse():
+    huge = 100_000_000_000
+    excl = ExclusionSet([2, huge])
+    # bitset không phình theo id lớn nhất
+    assert excl.bits.size <= DENSE_ID_LIMIT
+    assert len(excl) == 2
+    assert huge in excl
+    assert excl.keep_mask(np.array([2, 3, huge, huge + 1])).tolist() == [False, True, False, True]
+
+    merged = excl.union([DENSE_ID_LIMIT + 5])
+    assert merged.bits.size <= DENSE_ID_LIMIT
+    assert len(merged) == 3
+    assert excl.remove([huge]) == 1
+    assert huge not in excl
+
+
+def test_store_reads_do_not_count_as_cache_lookups():
+    store = ExclusionStore(max_sessions=4)
+    store.add('s', [1, 2])
+    assert len(store.get('s')) == 2
+    assert store.get('missing') is None
+    stats = store.stats()
+    assert stats['hits'] == 0 and stats['misses'] == 0
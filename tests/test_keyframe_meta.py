@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from repository.keyframe_meta import KeyframeMetaTable
+
+
+def make_table() -> KeyframeMetaTable:
+    # L01_V001: keyframe 0..9 (key 0..9), L01_V002: 0..4 (key 10..14), L02_V001: 0..2 (key 20..22)
+    records = (
+        [{'key': kf, 'group_num': 1, 'video_num': 1, 'keyframe_num': kf} for kf in range(10)]
+        + [{'key': 10 + kf, 'group_num': 1, 'video_num': 2, 'keyframe_num': kf} for kf in range(5)]
+        + [{'key': 20 + kf, 'group_num': 2, 'video_num': 1, 'keyframe_num': kf} for kf in range(3)]
+    )
+    # thứ tự chèn không theo (group, video, keyframe)
+    return KeyframeMetaTable.from_records(records[::-1])
+
+
+def test_range_bounds_are_inclusive():
+    table = make_table()
+    assert table.key_ids_in_time_ranges([(1, 1, 2, 5)]) == [2, 3, 4, 5]
+    assert table.key_ids_in_time_ranges([(1, 2, 4, 4)]) == [14]
+
+
+def test_range_stays_inside_its_video():
+    table = make_table()
+    # keyframe_num vượt cuối video không lấn sang video / group kế tiếp
+    assert table.key_ids_in_time_ranges([(1, 1, 8, 100)]) == [8, 9]
+    assert table.key_ids_in_time_ranges([(1, 2, 0, 1 << 30)]) == [10, 11, 12, 13, 14]
+    assert table.key_ids_in_time_ranges([(1, 3, 0, 100), (3, 1, 0, 100)]) == []
+    assert table.key_ids_in_time_ranges([(1, 1, 6, 5)]) == []
+
+
+def test_overlapping_ranges_are_deduplicated_in_order():
+    table = make_table()
+    ranges = [(2, 1, 0, 0), (1, 1, 0, 2), (1, 1, 1, 3)]
+    assert table.key_ids_in_time_ranges(ranges) == [20, 0, 1, 2, 3]
+
+
+def test_per_range_limit_keeps_evenly_spaced_keyframes():
+    table = make_table()
+    assert table.key_ids_in_time_ranges([(1, 1, 0, 9)], per_range_limit=3) == [0, 4, 9]
+    assert table.key_ids_in_time_ranges([(1, 1, 0, 9)], per_range_limit=1) == [0]
+    assert table.key_ids_in_time_ranges([(1, 1, 0, 9), (1, 2, 0, 4)], per_range_limit=2) == [0, 9, 10, 14]
+
+
+def test_no_ranges():
+    assert make_table().key_ids_in_time_ranges([]) == []
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from controller.query_controller import QueryController
+from repository.milvus import MilvusSearchResponse, MilvusSearchResult
+from schema.interface import MongoSearchResult
+from schema.request import UnifiedSearchRequest
+from service.search_service import KeyframeQueryService
+
+
+class FakeVectorRepo:
+    supports_video_filter = False
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_total(self):
+        return 10
+
+    async def search_by_embedding(self, request):
+        self.calls += 1
+        return MilvusSearchResponse(
+            results=[MilvusSearchResult(id_=i, distance=1.0 - i / 10) for i in range(10)],
+            total_found=10,
+        )
+
+
+class FakeMongoRepo:
+    async def get_keyframes_by_keys(self, keys):
+        return [MongoSearchResult(key=k, group_num=1, video_num=1, keyframe_num=k) for k in keys]
+
+
+class FakeTranslator:
+    async def atranslate(self, text):
+        return text
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.calls = 0
+
+    async def embedding(self, text):
+        self.calls += 1
+        return np.ones((1, 4), dtype=np.float32)
+
+
+def test_repeated_query_is_served_from_query_cache():
+    vector_repo = FakeVectorRepo()
+    encoder = FakeEncoder()
+    service = KeyframeQueryService(vector_repo, FakeMongoRepo(), data_folder='data')
+    controller = QueryController(
+        object_classes_path=None,
+        model_service=None,
+        keyframe_service=service,
+        translate_service=FakeTranslator(),
+        text_encoder=encoder,
+        image_encoder=object(),
+    )
+
+    async def run():
+        first = await controller.unified_search(UnifiedSearchRequest(query='a red car', size=5))
+        # chỉ khác khoảng trắng, không cursor -> vẫn cùng query_key
+        second = await controller.unified_search(UnifiedSearchRequest(query='  a red   car ', size=5))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert encoder.calls == 1
+    assert vector_repo.calls == 1
+    assert [r.id for r in second.results] == [r.id for r in first.results]
+    assert service.query_cache.stats()['hits'] == 1
@@ -0,0 +1,72 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from repository.trigram_index import TrigramIndex
+
+DOCS = {
+    100: "Hà Nội mùa thu",
+    101: "HA  NOI 2024",
+    102: "thanh pho ho chi minh",
+    103: "bcd abc",
+    104: "TV",
+}
+
+
+def build() -> TrigramIndex:
+    return TrigramIndex.build(DOCS.keys(), DOCS.values())
+
+
+def test_accepts_needs_three_characters():
+    index = build()
+    assert not index.accepts("")
+    assert not index.accepts("TV")
+    # "Hà " -> "ha" sau khi chuẩn hoá: vẫn chỉ 2 ký tự
+    assert not index.accepts(" Hà ")
+    assert index.accepts("abc")
+    assert index.accepts("Hà Nội")
+
+
+def test_short_query_returns_nothing():
+    index = build()
+    assert index.search("TV", 10) == []
+    assert index.search("TV", 10, substring=True) == []
+
+
+def test_fuzzy_search_folds_case_and_diacritics():
+    index = build()
+    hits = index.search("ha noi", 10)
+    # cùng điểm 1.0 -> OCR ngắn hơn đứng trước
+    assert hits == [(101, 1.0), (100, 1.0)]
+    assert index.search("HÀ NỘI", 10) == hits
+    assert index.search("ha noi", 1) == [(101, 1.0)]
+    assert index.search("ha noi", 0) == []
+
+
+def test_fuzzy_search_tolerates_misread_characters():
+    index = build()
+    # "ha nol": 3/4 trigram khớp
+    hits = index.search("ha nol", 10, threshold=0.5)
+    assert sorted(k for k, _ in hits) == [100, 101]
+    assert all(s == 0.75 for _, s in hits)
+    assert index.search("ha nol", 10, threshold=0.9) == []
+
+
+def test_substring_requires_exact_containment():
+    index = build()
+    assert index.search("noi mua", 10, substring=True) == [(100, 1.0)]
+    # doc 103 có đủ trigram "abc", "bcd" nhưng không chứa chuỗi "abcd"
+    assert index.search("abcd", 10) == [(103, 1.0)]
+    assert index.search("abcd", 10, substring=True) == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build()
+    path = str(tmp_path / 'ocr_trigram')
+    index.save(path)
+    assert TrigramIndex.exists(path)
+    loaded = TrigramIndex.load(path)
+    assert len(loaded) == len(DOCS)
+    assert loaded.doc_text(0) == "ha noi mua thu"
+    assert loaded.search("noi mua", 10, substring=True) == index.search("noi mua", 10, substring=True)
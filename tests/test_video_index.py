@@ -0,0 +1,85 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from common.exclusion import ExclusionSet
+from repository.embedding_store import EmbeddingStore
+from repository.video_index import VideoIndex
+
+E = np.eye(4, dtype=np.float32)
+
+
+def make_embeddings() -> np.ndarray:
+    # hàng i = key i; video (1, 1) = {0, 1}, (1, 2) = {2, 3, 4}, (2, 1) = {5}, key 6 không có metadata
+    return np.stack([E[0], 2 * E[0], E[1], E[1] + 0.5 * E[0], 3 * E[1], E[2], E[3]]).astype(np.float32)
+
+
+def build_index() -> VideoIndex:
+    # thứ tự đầu vào bị xáo -> build phải tự gom theo (group, video)
+    keys = np.array([6, 5, 4, 3, 2, 1, 0])
+    group_nums = np.array([-1, 2, 1, 1, 1, 1, 1])
+    video_nums = np.array([1, 1, 2, 2, 2, 1, 1])
+    return VideoIndex.build(make_embeddings(), keys, group_nums, video_nums, batch_size=2)
+
+
+def test_build_groups_keyframes_per_video():
+    index = build_index()
+    assert len(index) == 3
+    assert list(zip(index.group_nums.tolist(), index.video_nums.tolist())) == [(1, 1), (1, 2), (2, 1)]
+    assert index.keys_of([(1, 2)]).tolist() == [2, 3, 4]
+    assert index.keys_of([(2, 1), (1, 1)]).tolist() == [0, 1, 5]
+    assert index.keys_of([(9, 9)]).tolist() == []
+    # key không có group/video bị bỏ
+    assert len(index.keys) == 6
+
+    # trung bình các vector đã chuẩn hoá, không phụ thuộc độ lớn từng keyframe
+    np.testing.assert_allclose(np.linalg.norm(index.vectors, axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_allclose(index.vectors[0], E[0], atol=1e-6)
+    np.testing.assert_allclose(index.vectors[2], E[2], atol=1e-6)
+
+
+def test_search_videos_ranks_by_similarity():
+    index = build_index()
+    top = index.search_videos(E[1] + 0.1 * E[0], 2)
+    assert [(g, v) for g, v, _ in top] == [(1, 2), (1, 1)]
+    assert top[0][2] > top[1][2]
+    assert len(index.search_videos(E[1], 10)) == 3
+    assert index.search_videos(E[1], 0) == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build_index()
+    path = str(tmp_path / 'video_index.npz')
+    index.save(path)
+    loaded = VideoIndex.load(path)
+    assert len(loaded) == len(index)
+    np.testing.assert_array_equal(loaded.keys, index.keys)
+    np.testing.assert_array_equal(loaded.offsets, index.offsets)
+    np.testing.assert_allclose(loaded.vectors, index.vectors)
+
+
+def test_search_keyframes_only_scores_selected_videos(tmp_path):
+    path = str(tmp_path / 'embeddings.npy')
+    EmbeddingStore.write(path, make_embeddings())
+    index = build_index().attach(EmbeddingStore(path), 'COSINE')
+
+    hits = asyncio.run(index.search_keyframes(E[0], [(1, 2)], 10))
+    # key 0, 1 (video khác) giống query hơn nhưng không được chấm
+    assert [k for k, _ in hits][0] == 3
+    assert sorted(k for k, _ in hits) == [2, 3, 4]
+
+    hits = asyncio.run(index.search_keyframes(E[0], [(1, 2)], 10, ExclusionSet([3])))
+    assert sorted(k for k, _ in hits) == [2, 4]
+
+    hits = asyncio.run(index.search_keyframes(E[0], [(1, 1), (1, 2)], 2))
+    assert sorted(k for k, _ in hits) == [0, 1]
+
+
+def test_search_keyframes_needs_embedding_store():
+    with pytest.raises(ValueError):
+        asyncio.run(build_index().search_keyframes(E[0], [(1, 1)], 5))